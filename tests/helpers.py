@@ -142,3 +142,61 @@ def dump_resource_change(change):
         return f"Transfer: {change.urn}, from {change.from_owner} to {change.to_owner}"
     else:
         return f"Unknown change: {change}"
+
+
+class FakeCursor:
+    def __init__(self, session):
+        self.session = session
+        self.sfqid = None
+        self._results = []
+
+    def _run(self, sql):
+        if sql.startswith("USE ROLE"):
+            self.session.role = sql.split(" ", 2)[-1]
+        result = self.session.results.get(sql, [])
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def execute(self, sql, num_statements=None):
+        self.session.requests.append(sql)
+        statements = sql.split(";\n") if num_statements else [sql]
+        self._results = []
+        for statement in statements:
+            self.session.executed.append(statement)
+            self._results.append(self._run(statement))
+
+    def nextset(self):
+        self._results.pop(0)
+        return self if self._results else None
+
+    def fetchall(self):
+        return self._results[0]
+
+    def fetchmany(self, size):
+        rows, self._results[0] = self._results[0][:size], self._results[0][size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """
+    Stands in for a SnowflakeConnection. `results` maps SQL text to the rows it returns, or to an exception to raise.
+    `executed` records every statement and `requests` every round trip.
+    """
+
+    def __init__(self, role="SYSADMIN", results=None):
+        self.user = "TITAN"
+        self.role = role
+        self.results = results or {}
+        self.executed = []
+        self.requests = []
+        self.closed = False
+
+    def cursor(self, *args):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
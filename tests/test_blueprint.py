@@ -8,9 +8,13 @@ from titan import var
 from titan.blueprint import (
     Blueprint,
     CreateResource,
+    UpdateResource,
     _merge_pointers,
+    _sql_commands_by_role,
+    batch_sql_commands,
     compile_plan_to_sql,
     dump_plan,
+    schedule_changes_by_role,
 )
 from titan.blueprint_config import BlueprintConfig
 from titan.enums import AccountEdition, BlueprintScope, ResourceType, RunMode
@@ -437,6 +441,22 @@ def test_blueprint_ownership_sorting(session_ctx, remote_state):
     assert sql[7] == "GRANT OWNERSHIP ON WAREHOUSE WH TO ROLE SOME_ROLE COPY CURRENT GRANTS"
 
 
+def test_update_started_task_suspends_it_first(session_ctx):
+    before = res.Task(name="TASK", database="DB", schema="SCH", as_="SELECT 1", state="STARTED").to_dict()
+    change = UpdateResource(
+        urn=parse_URN("urn::ABCD123:task/DB.SCH.TASK"),
+        resource_cls=res.Task,
+        before=before,
+        after={**before, "comment": "new"},
+        delta={"comment": "new"},
+    )
+    assert compile_plan_to_sql(session_ctx, [change])[2:] == [
+        "ALTER TASK DB.SCH.TASK SUSPEND",
+        "ALTER TASK DB.SCH.TASK SET COMMENT = $$new$$",
+        "ALTER TASK DB.SCH.TASK RESUME",
+    ]
+
+
 def test_blueprint_dump_plan_create(session_ctx, remote_state):
     blueprint = Blueprint(resources=[res.Role("role1")])
     manifest = blueprint.generate_manifest(session_ctx)
@@ -875,3 +895,69 @@ def test_blueprint_plan_scope_stubbing(session_ctx):
     manifest = blueprint.generate_manifest(session_ctx)
     plan = blueprint._plan(remote_state, manifest)
     assert len(plan) == 2
+
+
+def test_batch_sql_commands():
+    sql_commands = [
+        "USE SECONDARY ROLES ALL",
+        "USE ROLE SYSADMIN",
+        "CREATE DATABASE DB",
+        "GRANT OWNERSHIP ON DATABASE DB TO ROLE SOMEROLE COPY CURRENT GRANTS",
+        "USE ROLE SECURITYADMIN",
+        "GRANT USAGE ON DATABASE DB TO ROLE R1",
+        "GRANT USAGE ON DATABASE DB TO ROLE R2",
+        "USE ROLE SYSADMIN",
+        "DROP WAREHOUSE WH",
+    ]
+    assert batch_sql_commands(sql_commands) == [
+        ["USE SECONDARY ROLES ALL", "USE ROLE SYSADMIN", "CREATE DATABASE DB"],
+        ["GRANT OWNERSHIP ON DATABASE DB TO ROLE SOMEROLE COPY CURRENT GRANTS"],
+        [
+            "USE ROLE SECURITYADMIN",
+            "GRANT USAGE ON DATABASE DB TO ROLE R1",
+            "GRANT USAGE ON DATABASE DB TO ROLE R2",
+            "USE ROLE SYSADMIN",
+            "DROP WAREHOUSE WH",
+        ],
+    ]
+
+
+def test_sql_commands_by_role():
+    sql_commands = [
+        "USE SECONDARY ROLES ALL",
+        "USE ROLE SYSADMIN",
+        "CREATE DATABASE DB",
+        "USE ROLE SECURITYADMIN",
+        "CREATE ROLE R1",
+        "USE ROLE SECURITYADMIN",
+        "GRANT USAGE ON DATABASE DB TO ROLE R1",
+        "USE ROLE SYSADMIN",
+        "DROP WAREHOUSE WH",
+    ]
+    assert _sql_commands_by_role(sql_commands, ResourceName("SYSADMIN")) == [
+        ("SYSADMIN", ["USE SECONDARY ROLES ALL", "USE ROLE SYSADMIN", "CREATE DATABASE DB"]),
+        (
+            "SECURITYADMIN",
+            [
+                "USE ROLE SECURITYADMIN",
+                "CREATE ROLE R1",
+                "USE ROLE SECURITYADMIN",
+                "GRANT USAGE ON DATABASE DB TO ROLE R1",
+            ],
+        ),
+        ("SYSADMIN", ["USE ROLE SYSADMIN", "DROP WAREHOUSE WH"]),
+    ]
+
+
+def test_schedule_changes_by_role():
+    change_commands = [
+        ["USE ROLE SYSADMIN", "CREATE DATABASE DB1"],
+        ["USE ROLE SECURITYADMIN", "GRANT USAGE ON DATABASE DB1 TO ROLE R1"],
+        ["USE ROLE SYSADMIN", "CREATE DATABASE DB2"],
+        ["USE ROLE SECURITYADMIN", "GRANT USAGE ON DATABASE DB2 TO ROLE R1"],
+        ["USE ROLE SYSADMIN", "CREATE WAREHOUSE WH"],
+    ]
+    dependencies = [set(), {0}, set(), {2}, set()]
+    order, switches_saved = schedule_changes_by_role(change_commands, dependencies)
+    assert order == [0, 2, 4, 1, 3]
+    assert switches_saved == 3
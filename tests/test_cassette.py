@@ -0,0 +1,66 @@
+import pytest
+from snowflake.connector.errors import ProgrammingError
+
+from titan.cassette import (
+    Cassette,
+    CassetteMissError,
+    RecordingSession,
+    ReplaySession,
+    record_session,
+    replay_session,
+)
+from titan.client import DOES_NOT_EXIST_ERR, execute, execute_batch, execute_stream, reset_cache
+
+from tests.helpers import FakeSession
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    reset_cache()
+    yield
+    reset_cache()
+
+
+def test_replay_serves_recorded_responses(tmp_path):
+    path = str(tmp_path / "account.cassette")
+    live = FakeSession(
+        results={
+            "SHOW ROLES": [{"name": "R1"}, {"name": "R2"}],
+            "SHOW USERS": [{"name": "U1"}],
+            "DESC ROLE R3": ProgrammingError("missing", errno=DOES_NOT_EXIST_ERR),
+        }
+    )
+    with record_session(live, path) as session:
+        execute(session, "SHOW ROLES")
+        execute_batch(session, ["SHOW USERS", "SHOW DATABASES"])
+        assert execute(session, "DESC ROLE R3", empty_response_codes=[DOES_NOT_EXIST_ERR]) == []
+        execute(session, "USE ROLE ACCOUNTADMIN")
+
+    session = replay_session(path)
+    assert (session.user, session.role) == ("TITAN", "SYSADMIN")
+    assert execute_batch(session, ["SHOW ROLES", "SHOW USERS"]) == [[{"name": "R1"}, {"name": "R2"}], [{"name": "U1"}]]
+    assert list(execute_stream(session, "SHOW ROLES", batch_size=1)) == [{"name": "R1"}, {"name": "R2"}]
+    assert execute(session, "SHOW DATABASES") == []
+    with pytest.raises(ProgrammingError) as err:
+        execute(session, "DESC ROLE R3")
+    assert err.value.errno == DOES_NOT_EXIST_ERR
+    with pytest.raises(CassetteMissError):
+        execute(session, "SHOW WAREHOUSES")
+
+    execute(session, "USE ROLE ACCOUNTADMIN")
+    assert session.role == "ACCOUNTADMIN"
+    assert session.session_factory().role == "SYSADMIN"
+
+
+def test_replay_serves_repeated_queries_in_order():
+    live = FakeSession(results={"SHOW ROLES": [{"name": "R1"}]})
+    cassette = Cassette()
+    session = RecordingSession(live, cassette)
+    execute(session, "SHOW ROLES")
+    live.results["SHOW ROLES"] = [{"name": "R1"}, {"name": "R2"}]
+    execute(session, "SHOW ROLES")
+
+    session = ReplaySession(cassette)
+    assert [len(execute(session, "SHOW ROLES")) for _ in range(3)] == [1, 2, 2]
+    cassette.rewind()
+    assert len(execute(session, "SHOW ROLES")) == 1
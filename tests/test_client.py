@@ -0,0 +1,202 @@
+import pickle
+import threading
+import time
+
+import pytest
+from snowflake.connector.errors import ProgrammingError
+
+from titan import client
+from titan.client import (
+    ConcurrencyGovernor,
+    ExecutionCache,
+    execute,
+    execute_batch,
+    execute_stream,
+    governed,
+    reset_cache,
+)
+
+from tests.helpers import FakeSession
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    reset_cache()
+    yield
+    reset_cache()
+
+
+def test_execute_batch_sends_one_request():
+    session = FakeSession(results={"SHOW ROLES": [{"name": "R1"}], "SHOW USERS": [{"name": "U1"}]})
+    results = execute_batch(session, ["SHOW ROLES;", "SHOW WAREHOUSES", "SHOW USERS"])
+    assert results == [[{"name": "R1"}], [], [{"name": "U1"}]]
+    assert session.requests == ["SHOW ROLES;\nSHOW WAREHOUSES;\nSHOW USERS"]
+
+
+def test_execute_batch_uses_and_fills_cache():
+    session = FakeSession(results={"SHOW ROLES": [{"name": "R1"}]})
+    execute(session, "SHOW ROLES", cacheable=True)
+    results = execute_batch(session, ["SHOW ROLES", "SHOW USERS", "SHOW DATABASES"], cacheable=True)
+    assert results == [[{"name": "R1"}], [], []]
+    assert session.requests == ["SHOW ROLES", "SHOW USERS;\nSHOW DATABASES"]
+    assert set(client.cache_snapshot()["SYSADMIN"]) == {"SHOW ROLES", "SHOW USERS", "SHOW DATABASES"}
+
+    assert execute_batch(session, ["SHOW USERS", "SHOW DATABASES"], cacheable=True) == [[], []]
+    assert len(session.requests) == 2
+
+
+def test_execute_batch_raises_on_error():
+    session = FakeSession(results={"DROP ROLE R1": ProgrammingError("boom", errno=2003)})
+    with pytest.raises(ProgrammingError) as err:
+        execute_batch(session, ["USE ROLE SYSADMIN", "DROP ROLE R1", "DROP ROLE R2"])
+    assert err.value.errno == 2003
+
+
+def test_execute_batch_runs_repeated_statements():
+    session = FakeSession()
+    statements = ["GRANT USAGE ON DATABASE DB TO ROLE R1", "REVOKE USAGE ON DATABASE DB FROM ROLE R1"]
+    results = execute_batch(session, statements + statements[:1])
+    assert len(results) == 3
+    assert session.executed == statements + statements[:1]
+
+
+def test_execution_cache_evicts_least_recently_used():
+    cache = ExecutionCache(max_rows=3)
+    cache.put("SYSADMIN", "SHOW ROLES", [{"name": "R1"}, {"name": "R2"}])
+    cache.put("SYSADMIN", "SHOW USERS", [{"name": "U1"}])
+    assert cache.get("SYSADMIN", "SHOW ROLES") is not None
+    cache.put("SYSADMIN", "SHOW DATABASES", [{"name": "DB"}])
+
+    assert cache.get("SYSADMIN", "SHOW USERS") is None
+    assert cache.get("SYSADMIN", "SHOW DATABASES") == [{"name": "DB"}]
+    assert cache.stats() == {"entries": 2, "rows": 3, "hits": 2, "misses": 1, "evictions": 1}
+
+
+def test_execution_cache_keeps_newest_result_over_budget():
+    reset_cache(max_rows=3)
+    rows = [{"name": f"T{i}"} for i in range(4)]
+    session = FakeSession(results={"SHOW ROLES": [{"name": "R1"}], "SHOW TABLES IN ACCOUNT": rows})
+    execute(session, "SHOW ROLES", cacheable=True)
+    tables = execute(session, "SHOW TABLES IN ACCOUNT", cacheable=True)
+    builds = []
+
+    def _build(rows):
+        builds.append(rows)
+        return {row["name"]: row for row in rows}
+
+    for _ in range(3):
+        assert execute(session, "SHOW TABLES IN ACCOUNT", cacheable=True) == rows
+        client.index_result(tables, "by_name", _build)
+    assert session.executed == ["SHOW ROLES", "SHOW TABLES IN ACCOUNT"]
+    assert len(builds) == 1
+    assert client.cache_stats()["entries"] == 1
+
+
+def test_execution_cache_evicts_indexes_with_results():
+    reset_cache(max_rows=1)
+    session = FakeSession(results={"SHOW ROLES": [{"name": "R1"}], "SHOW USERS": [{"name": "U1"}]})
+    roles = execute(session, "SHOW ROLES", cacheable=True)
+    builds = []
+
+    def _build(rows):
+        builds.append(rows)
+        return {row["name"]: row for row in rows}
+
+    assert client.index_result(roles, "by_name", _build) is client.index_result(roles, "by_name", _build)
+    assert len(builds) == 1
+
+    execute(session, "SHOW USERS", cacheable=True)
+    assert client.cache_stats()["evictions"] == 1
+    client.index_result(roles, "by_name", _build)
+    assert len(builds) == 2
+
+
+def test_execute_stream_fetches_in_batches():
+    rows = [{"name": f"T{i}"} for i in range(5)]
+    session = FakeSession(
+        results={"SHOW TABLES IN ACCOUNT": rows, "SHOW GRANTS TO ROLE R": ProgrammingError(errno=2003)}
+    )
+    stream = execute_stream(session, "SHOW TABLES IN ACCOUNT", batch_size=2)
+    assert next(stream) == {"name": "T0"}
+    assert list(stream) == rows[1:]
+    assert client.cache_snapshot() == {}
+
+    assert list(execute_stream(session, "SHOW GRANTS TO ROLE R", empty_response_codes=[2003])) == []
+    with pytest.raises(ProgrammingError):
+        list(execute_stream(session, "SHOW GRANTS TO ROLE R"))
+
+
+def test_cached_results_are_compacted():
+    rows = [{"name": "R1", "owner": "SYSADMIN"}, {"name": "R2", "owner": "SECURITYADMIN"}]
+    session = FakeSession(results={"SHOW ROLES": rows})
+    result = execute(session, "SHOW ROLES", cacheable=True)
+    assert execute(session, "SHOW ROLES", cacheable=True) is result
+    assert result == rows
+    assert result[1]["owner"] == "SECURITYADMIN"
+    assert result[0].get("comment") is None
+    assert result[0]._columns is result[1]._columns
+    assert pickle.loads(pickle.dumps(result)) == rows
+
+
+def test_governor_backs_off_on_throttling_and_recovers():
+    governor = ConcurrencyGovernor(max_concurrency=8)
+    session = FakeSession(results={"SHOW ROLES": ProgrammingError("timeout", errno=client.STATEMENT_TIMEOUT_ERR)})
+    with governed(governor):
+        with pytest.raises(ProgrammingError):
+            execute(session, "SHOW ROLES")
+    assert governor.limit == 4
+    assert governor.stats()["throttled"] == 1
+
+    for _ in range(20):
+        with governor.slot():
+            pass
+    assert 4 < governor.limit <= 8
+
+
+def test_governor_compares_latency_within_query_template(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(client.time, "monotonic", lambda: clock[0])
+    governor = ConcurrencyGovernor(max_concurrency=8)
+
+    def _query(template, latency):
+        with governor.slot(template):
+            clock[0] += latency
+
+    for _ in range(5):
+        _query("SHOW ROLES LIKE ?", 0.1)
+    _query("SHOW TABLES IN ACCOUNT", 30.0)
+    assert governor.stats()["decreases"] == 0
+    _query("SHOW ROLES LIKE ?", 5.0)
+    assert governor.stats()["decreases"] == 1
+
+
+def test_governor_limits_in_flight_queries():
+    governor = ConcurrencyGovernor(max_concurrency=2)
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def _query():
+        with governor.slot():
+            with lock:
+                in_flight.append(1)
+                peak.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.pop()
+
+    threads = [threading.Thread(target=_query) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
+
+
+def test_governor_caps_query_rate():
+    governor = ConcurrencyGovernor(max_concurrency=4, max_qps=100)
+    start = time.monotonic()
+    for _ in range(6):
+        with governor.slot():
+            pass
+    assert time.monotonic() - start >= 0.05
@@ -0,0 +1,424 @@
+import pytest
+from snowflake.connector.errors import ProgrammingError
+
+from titan import client, data_provider
+from titan import resources as res
+from titan.client import execute, reset_cache
+from titan.enums import AccountEdition
+from titan.identifiers import parse_URN
+from titan.resource_name import ResourceName
+
+from tests.helpers import FakeSession
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    reset_cache()
+    yield
+    reset_cache()
+
+
+def test_plan_prefetch_groups_by_type_and_container():
+    urns = [
+        parse_URN("urn::ABCD123:role/ROLE_A"),
+        parse_URN("urn::ABCD123:role/ROLE_B"),
+        parse_URN("urn::ABCD123:schema/DB1.SCH1"),
+        parse_URN("urn::ABCD123:schema/DB1.SCH2"),
+        parse_URN("urn::ABCD123:view/DB1.SCH1.V1"),
+        parse_URN("urn::ABCD123:view/DB1.SCH1.V2"),
+        parse_URN("urn::ABCD123:view/DB2.SCH1.V1"),
+        parse_URN("urn::ABCD123:view/DB2.SCH2.V1"),
+        parse_URN("urn::ABCD123:table/DB1.SCH1.T1"),
+    ]
+    assert data_provider.plan_prefetch(urns) == [
+        "SHOW ROLES IN ACCOUNT",
+        "SHOW SCHEMAS IN DATABASE DB1",
+        "SHOW VIEWS IN SCHEMA DB1.SCH1",
+        "SHOW VIEWS IN DATABASE DB2",
+        "SHOW TABLES IN SCHEMA DB1.SCH1",
+    ]
+
+
+def test_fetch_table_outside_plan_looks_table_up_by_name():
+    like_sql = "SHOW TABLES LIKE 't1' IN SCHEMA DB.PUBLIC"
+    row = {
+        "name": "t1",
+        "database_name": "DB",
+        "schema_name": "PUBLIC",
+        "kind": "TABLE",
+        "owner": "SYSADMIN",
+        "owner_role_type": "ROLE",
+        "comment": "",
+        "cluster_by": "",
+        "enable_schema_evolution": "N",
+        "change_tracking": "OFF",
+    }
+    session = FakeSession(results={like_sql: [row, {**row, "name": "T1"}]})
+    table = data_provider.fetch_table(session, parse_URN('urn::ABCD123:table/DB.PUBLIC."t1"').fqn)
+    assert table["name"] == '"t1"'
+    assert "SHOW TABLES IN ACCOUNT" not in session.executed
+    assert session.executed[0] == like_sql
+
+
+def test_show_resources_reads_from_prefetched_container():
+    rows = [
+        {"name": "V1", "database_name": "DB2", "schema_name": "SCH1"},
+        {"name": "V1", "database_name": "DB2", "schema_name": "SCH2"},
+    ]
+    session = FakeSession(results={"SHOW DATABASES IN ACCOUNT": [{"name": "DB2"}], "SHOW VIEWS IN DATABASE DB2": rows})
+    urns = [parse_URN("urn::ABCD123:view/DB2.SCH1.V1"), parse_URN("urn::ABCD123:view/DB2.SCH2.V1")]
+    data_provider.prefetch(session, data_provider.plan_prefetch(urns))
+
+    for urn, row in zip(urns, rows):
+        assert data_provider._show_resources(session, "VIEWS", urn.fqn) == [row]
+    assert session.executed == ["SHOW DATABASES IN ACCOUNT", "SHOW VIEWS IN DATABASE DB2"]
+
+    reset_cache()
+    assert data_provider._prefetched_sql("VIEWS", urns[0].fqn) is None
+
+
+def test_show_resources_confirms_missing_object_in_large_prefetched_result():
+    rows = [{"name": f"V{index}", "database_name": "DB", "schema_name": "PUBLIC"} for index in range(1000)]
+    like_sql = "SHOW VIEWS LIKE 'MISSING' IN SCHEMA DB.PUBLIC"
+    session = FakeSession(
+        results={
+            "SHOW DATABASES IN ACCOUNT": [{"name": "DB"}],
+            "SHOW VIEWS IN DATABASE DB": rows,
+            like_sql: [{"name": "MISSING", "database_name": "DB", "schema_name": "PUBLIC"}],
+        }
+    )
+    urns = [parse_URN("urn::ABCD123:view/DB.PUBLIC.V1"), parse_URN("urn::ABCD123:view/DB.SCH1.V1")]
+    data_provider.prefetch(session, data_provider.plan_prefetch(urns))
+
+    assert data_provider._show_resources(session, "VIEWS", urns[0].fqn) == [rows[1]]
+    assert like_sql not in session.executed
+    missing = parse_URN("urn::ABCD123:view/DB.PUBLIC.MISSING")
+    assert data_provider._show_resources(session, "VIEWS", missing.fqn) == [
+        {"name": "MISSING", "database_name": "DB", "schema_name": "PUBLIC"}
+    ]
+    assert session.executed[-1] == like_sql
+
+
+def test_lookup_matches_filter_result():
+    rows = [
+        {"name": "T1", "database_name": "DB", "schema_name": "PUBLIC", "kind": "TABLE"},
+        {"name": "t1", "database_name": "DB", "schema_name": "PUBLIC", "kind": "TABLE"},
+        {"name": "My Table", "database_name": "my db", "schema_name": "PUBLIC", "kind": "TRANSIENT"},
+    ]
+    needles = [
+        {"name": "t1", "database_name": "db", "schema_name": "public"},
+        {"name": '"t1"', "database_name": "DB", "schema_name": "PUBLIC"},
+        {"name": '"T1"', "database_name": "DB", "schema_name": None},
+        {"name": '"My Table"', "database_name": ResourceName('"my db"'), "schema_name": "PUBLIC"},
+        {"name": "My Table", "database_name": '"my db"'},
+        {"name": "T1", "kind": "TRANSIENT"},
+    ]
+    for needle in needles:
+        assert data_provider._lookup(rows, **needle) == data_provider._filter_result(rows, **needle)
+
+
+def test_lookup_builds_index_once_per_result():
+    session = FakeSession(results={"SHOW TABLES IN ACCOUNT": [{"name": "T1"}, {"name": "T2"}]})
+    result = execute(session, "SHOW TABLES IN ACCOUNT", cacheable=True)
+    assert data_provider._lookup(result, name="t2") == [{"name": "T2"}]
+    index = client.index_result(result, ("name",), lambda rows: {})
+    assert data_provider._lookup(result, name="T1") == [{"name": "T1"}]
+    assert client.index_result(result, ("name",), lambda rows: {}) is index
+    assert ("T1",) in index
+
+
+def _info_schema_column(schema, table, name, data_type="TEXT"):
+    return {
+        "TABLE_SCHEMA": schema,
+        "TABLE_NAME": table,
+        "COLUMN_NAME": name,
+        "DATA_TYPE": data_type,
+        "NUMERIC_PRECISION": 38,
+        "NUMERIC_SCALE": 0,
+        "CHARACTER_MAXIMUM_LENGTH": 16,
+        "DATETIME_PRECISION": 9,
+        "COLLATION_NAME": None,
+        "COLUMN_DEFAULT": None,
+        "IS_NULLABLE": "YES",
+        "COMMENT": None,
+    }
+
+
+def test_fetch_columns_for_table_queries_database_once():
+    sql = (
+        "SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, DATA_TYPE, NUMERIC_PRECISION, NUMERIC_SCALE, "
+        "CHARACTER_MAXIMUM_LENGTH, DATETIME_PRECISION, COLLATION_NAME, COLUMN_DEFAULT, IS_NULLABLE, COMMENT "
+        "FROM DB.INFORMATION_SCHEMA.COLUMNS ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION"
+    )
+    session = FakeSession(
+        results={
+            sql: [
+                _info_schema_column("PUBLIC", "T1", "ID", "NUMBER"),
+                _info_schema_column("PUBLIC", "T1", "NAME"),
+                _info_schema_column("PUBLIC", "T1", "CREATED_AT", "TIMESTAMP_TZ"),
+                _info_schema_column("PUBLIC", "t2", "ID"),
+            ],
+            "DESC TABLE DB.PUBLIC.T2": [
+                {"name": "ID", "type": "NUMBER(38,0)", "kind": "COLUMN", "null?": "Y", "default": None, "comment": ""}
+            ],
+        }
+    )
+    t1 = data_provider._fetch_columns_for_table(session, parse_URN("urn::ABCD123:table/DB.PUBLIC.T1").fqn)
+    t2 = data_provider._fetch_columns_for_table(session, parse_URN('urn::ABCD123:table/DB.PUBLIC."t2"').fqn)
+    created_since = data_provider._fetch_columns_for_table(session, parse_URN("urn::ABCD123:table/DB.PUBLIC.T2").fqn)
+
+    assert [(col["name"], col["data_type"]) for col in t1] == [
+        ("ID", "NUMBER(38,0)"),
+        ("NAME", "VARCHAR(16)"),
+        ("CREATED_AT", "TIMESTAMP_TZ(9)"),
+    ]
+    assert [col["name"] for col in t2] == ["ID"]
+    assert [(col["name"], col["data_type"]) for col in created_since] == [("ID", "NUMBER(38,0)")]
+    assert session.executed == [sql, "DESC TABLE DB.PUBLIC.T2"]
+
+
+def test_fetch_columns_matches_manifest_columns():
+    session = FakeSession(
+        results={
+            "DESC TABLE DB.PUBLIC.T": [
+                {
+                    "kind": "COLUMN",
+                    "name": "NAME",
+                    "type": "VARCHAR(16777216) COLLATE 'en-ci'",
+                    "null?": "N",
+                    "default": "'it''s'",
+                    "comment": None,
+                },
+                {
+                    "kind": "COLUMN",
+                    "name": "PRICE",
+                    "type": "NUMBER(10,2)",
+                    "null?": "Y",
+                    "default": None,
+                    "comment": None,
+                },
+                {
+                    "kind": "COLUMN",
+                    "name": "CREATED_AT",
+                    "type": "TIMESTAMP_TZ(9)",
+                    "null?": "Y",
+                    "default": "CURRENT_TIMESTAMP()",
+                    "comment": None,
+                },
+            ]
+        }
+    )
+    columns = data_provider.fetch_columns(session, "TABLE", parse_URN("urn::ABCD123:table/DB.PUBLIC.T").fqn)
+    assert columns[0]["data_type"] == "VARCHAR(16777216)"
+    assert columns[0]["collate"] == "en-ci"
+    assert columns[0]["default"] == "it's"
+    assert columns[2]["default"] == "CURRENT_TIMESTAMP()"
+
+    manifest_columns = [
+        {"name": "NAME", "data_type": "STRING", "collate": "en-ci", "not_null": True, "default": "it's"},
+        {"name": "PRICE", "data_type": "DECIMAL(10, 2)"},
+        {"name": "CREATED_AT", "data_type": "TIMESTAMP_TZ", "default": "CURRENT_TIMESTAMP()"},
+    ]
+    assert (
+        res.Table(name="T", columns=columns).to_dict()["columns"]
+        == res.Table(name="T", columns=manifest_columns).to_dict()["columns"]
+    )
+
+
+def test_tag_references_bulk_query_skips_missing_objects(monkeypatch):
+    monkeypatch.setattr(data_provider, "fetch_session", lambda session: {"account_edition": AccountEdition.ENTERPRISE})
+    urns = [parse_URN(f"urn::ABCD123:tag_reference/DB.PUBLIC.T{index}?domain=TABLE") for index in range(4)]
+    statements = data_provider.plan_tag_reference_prefetch(urns)
+    per_object = [data_provider._tag_reference_target(urn.fqn)[3] for urn in urns]
+
+    # T2 doesn't exist yet, so every query that includes it fails
+    missing = ProgrammingError("Table 'DB.PUBLIC.T2' does not exist or not authorized.", errno=2003)
+    tag_ref = {"TAG_DATABASE": "DB", "TAG_SCHEMA": "PUBLIC", "TAG_NAME": "PII", "TAG_VALUE": "true"}
+    session = FakeSession(
+        results={
+            statements[0]: missing,
+            data_provider._tag_references_bulk_sql(per_object[2:]): missing,
+            data_provider._tag_references_bulk_sql(per_object[2:3]): missing,
+            data_provider._tag_references_bulk_sql(per_object[3:]): [{"TITAN_REF": 0, **tag_ref}],
+        }
+    )
+    data_provider.prefetch_tag_references(session, statements)
+    assert len(session.executed) == 5
+
+    assert data_provider.fetch_resource(session, urns[3])["tags"] == {"DB.PUBLIC.PII": "true"}
+    assert data_provider.fetch_resource(session, urns[0]) is None
+    assert len(session.executed) == 5
+
+
+def test_incremental_refresh_skips_unchanged_objects():
+    last_altered_sql = "SELECT TABLE_SCHEMA, TABLE_NAME, LAST_ALTERED FROM DB.INFORMATION_SCHEMA.VIEWS"
+    session = FakeSession(
+        results={
+            "SHOW VIEWS IN ACCOUNT": [
+                {
+                    "name": "V1",
+                    "database_name": "DB",
+                    "schema_name": "PUBLIC",
+                    "owner": "SYSADMIN",
+                    "is_materialized": "false",
+                    "is_secure": "false",
+                    "change_tracking": "OFF",
+                    "comment": "",
+                    "text": "CREATE VIEW V1 AS SELECT 1 AS ID",
+                }
+            ],
+            last_altered_sql: [{"TABLE_SCHEMA": "PUBLIC", "TABLE_NAME": "V1", "LAST_ALTERED": 1}],
+            "DESC VIEW DB.PUBLIC.V1": [
+                {"kind": "COLUMN", "name": "ID", "type": "NUMBER(1,0)", "null?": "Y", "default": None, "comment": None}
+            ],
+        }
+    )
+    urn = parse_URN("urn::ABCD123:view/DB.PUBLIC.V1")
+
+    def _fetch(previous_state):
+        reset_cache()
+        session.executed.clear()
+        data_provider.start_incremental_refresh(previous_state)
+        data = data_provider.fetch_resource(session, urn)
+        return data, data_provider.stop_incremental_refresh()
+
+    data, state = _fetch({})
+    assert "DESC VIEW DB.PUBLIC.V1" in session.executed
+    assert data["columns"][0]["name"] == "ID"
+
+    unchanged, state = _fetch(state)
+    assert unchanged == data
+    assert "DESC VIEW DB.PUBLIC.V1" not in session.executed
+
+    session.results[last_altered_sql] = [{"TABLE_SCHEMA": "PUBLIC", "TABLE_NAME": "V1", "LAST_ALTERED": 2}]
+    _fetch(state)
+    assert "DESC VIEW DB.PUBLIC.V1" in session.executed
+
+
+def test_incremental_refresh_without_warehouse_fetches_in_full():
+    session = FakeSession(
+        results={
+            "SHOW VIEWS IN ACCOUNT": [
+                {
+                    "name": "V1",
+                    "database_name": "DB",
+                    "schema_name": "PUBLIC",
+                    "owner": "SYSADMIN",
+                    "is_materialized": "false",
+                    "is_secure": "false",
+                    "change_tracking": "OFF",
+                    "comment": "",
+                    "text": "CREATE VIEW V1 AS SELECT 1 AS ID",
+                }
+            ],
+            "SELECT TABLE_SCHEMA, TABLE_NAME, LAST_ALTERED FROM DB.INFORMATION_SCHEMA.VIEWS": ProgrammingError(
+                "No active warehouse selected in the current session.", errno=606
+            ),
+            "DESC VIEW DB.PUBLIC.V1": [
+                {"kind": "COLUMN", "name": "ID", "type": "NUMBER(1,0)", "null?": "Y", "default": None, "comment": None}
+            ],
+        }
+    )
+    data_provider.start_incremental_refresh({})
+    try:
+        data = data_provider.fetch_resource(session, parse_URN("urn::ABCD123:view/DB.PUBLIC.V1"))
+    finally:
+        assert data_provider.stop_incremental_refresh() == {}
+    assert data["columns"][0]["name"] == "ID"
+
+
+def test_grants_served_from_prefetched_role_grants():
+    urns = [
+        parse_URN("urn::ABCD123:grant/GRANT?priv=MODIFY&on=warehouse/WH&to=role/R1"),
+        parse_URN("urn::ABCD123:grant/GRANT?priv=USAGE&on=warehouse/WH&to=role/R1"),
+        parse_URN("urn::ABCD123:grant/GRANT?priv=USAGE&on=database/DB&to=role/R2"),
+        parse_URN("urn::ABCD123:future_grant/FUTURE_GRANT?priv=SELECT&on=schema/DB.PUBLIC.<TABLE>&to=role/R1"),
+        parse_URN("urn::ABCD123:role_grant/R1?role=R2"),
+    ]
+    statements = data_provider.plan_grant_prefetch(urns)
+    assert statements == [
+        "SHOW GRANTS TO ROLE R1",
+        "SHOW GRANTS TO ROLE R2",
+        "SHOW FUTURE GRANTS TO ROLE R1",
+        "SHOW GRANTS OF ROLE R1",
+    ]
+
+    grant = {"granted_to": "ROLE", "grant_option": "false", "granted_by": "SYSADMIN"}
+    session = FakeSession(
+        results={
+            "SHOW GRANTS TO ROLE R1": [
+                {**grant, "privilege": "USAGE", "granted_on": "WAREHOUSE", "name": "WH", "grantee_name": "R1"}
+            ],
+            "SHOW GRANTS TO ROLE R2": [
+                {**grant, "privilege": "USAGE", "granted_on": "DATABASE", "name": "DB", "grantee_name": "R2"}
+            ],
+            "SHOW FUTURE GRANTS TO ROLE R1": [
+                {
+                    "privilege": "SELECT",
+                    "grant_on": "TABLE",
+                    "name": "DB.PUBLIC.<TABLE>",
+                    "grant_to": "ROLE",
+                    "grantee_name": "R1",
+                    "grant_option": "false",
+                }
+            ],
+            "SHOW GRANTS OF ROLE R1": [{"role": "R1", "granted_to": "ROLE", "grantee_name": "R2"}],
+            "SHOW ROLES IN ACCOUNT": [{"name": "R1"}, {"name": "R2"}],
+        }
+    )
+    data_provider.prefetch(session, statements)
+    assert len(session.requests) == 2
+
+    fetched = [data_provider.fetch_resource(session, urn) for urn in urns]
+    assert fetched[0] is None
+    assert [data["priv"] for data in fetched[1:3]] == ["USAGE", "USAGE"]
+    assert fetched[3]["on_type"] == "TABLE"
+    assert fetched[4] == {"role": "R1", "to_role": "R2"}
+    assert len(session.requests) == 2
+
+
+def test_prefetch_batches_only_statements_for_existing_containers():
+    session = FakeSession(
+        results={
+            "SHOW DATABASES IN ACCOUNT": [{"name": "DB1"}],
+            "SHOW SCHEMAS IN DATABASE DB1": [{"name": "SCH1"}],
+            "SHOW ROLES IN ACCOUNT": [{"name": "R1"}],
+            "SHOW VIEWS IN SCHEMA DB1.SCH1": [{"name": "V1"}],
+            "SHOW GRANTS TO ROLE R1": [{"privilege": "USAGE"}],
+        }
+    )
+    statements = [
+        "SHOW VIEWS IN SCHEMA DB1.SCH1",
+        "SHOW VIEWS IN SCHEMA DB1.NEW_SCHEMA",
+        "SHOW VIEWS IN DATABASE NEW_DB",
+        "SHOW GRANTS TO ROLE R1",
+        "SHOW GRANTS TO ROLE NEW_ROLE",
+    ]
+    data_provider.prefetch(session, statements)
+
+    assert session.requests[-1] == "SHOW VIEWS IN SCHEMA DB1.SCH1;\nSHOW GRANTS TO ROLE R1"
+    assert not any("NEW_" in sql for sql in session.executed)
+    assert execute(session, "SHOW VIEWS IN DATABASE NEW_DB", cacheable=True) == []
+    assert execute(session, "SHOW GRANTS TO ROLE NEW_ROLE", cacheable=True) == []
+
+
+def test_tag_references_served_from_bulk_query(monkeypatch):
+    monkeypatch.setattr(data_provider, "fetch_session", lambda session: {"account_edition": AccountEdition.ENTERPRISE})
+    urns = [
+        parse_URN("urn::ABCD123:tag_reference/DB.PUBLIC.T1?domain=TABLE"),
+        parse_URN("urn::ABCD123:tag_reference/DB.SCH?domain=SCHEMA"),
+    ]
+    statements = data_provider.plan_tag_reference_prefetch(urns)
+    assert len(statements) == 1
+
+    tag_ref = {"TAG_DATABASE": "DB", "TAG_SCHEMA": "PUBLIC", "TAG_NAME": "PII", "TAG_VALUE": "true"}
+    session = FakeSession(results={statements[0]: [{"TITAN_REF": 0, **tag_ref}]})
+    data_provider.prefetch_tag_references(session, statements)
+
+    assert data_provider.fetch_resource(session, urns[0]) == {
+        "object_name": "DB.PUBLIC.T1",
+        "object_domain": "TABLE",
+        "tags": {"DB.PUBLIC.PII": "true"},
+    }
+    assert data_provider.fetch_resource(session, urns[1]) is None
+    assert session.executed == statements
@@ -0,0 +1,352 @@
+import json
+
+import pytest
+
+from titan import blueprint as blueprint_module
+from titan import data_provider
+from titan import resources as res
+from titan.blueprint import Blueprint, change_dependencies, compile_changes_to_sql, dump_plan, plan_from_dict
+from titan.client import execute, reset_cache
+from titan.enums import ResourceType
+from titan.exceptions import NonConformingPlanException
+from titan.emulator import EmulatedAccount, generate_account
+from titan.identifiers import parse_URN
+from titan.metrics import collect_metrics
+from titan.operations import blueprint as blueprint_operations
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    reset_cache()
+    yield
+    reset_cache()
+
+
+def _resources():
+    role = res.Role(name="ANALYST", comment="reads things")
+    database = res.Database(name="ANALYTICS", comment="analytics")
+    schema = res.Schema(name="MARTS", database=database, managed_access=True)
+    table = res.Table(
+        name="EVENTS",
+        columns=[{"name": "ID", "data_type": "NUMBER(38,0)", "not_null": True}],
+        schema=schema,
+        change_tracking=True,
+    )
+    warehouse = res.Warehouse(name="ANALYTICS_WH", warehouse_size="SMALL", auto_suspend=60)
+    return [
+        role,
+        database,
+        schema,
+        table,
+        warehouse,
+        res.Grant(priv="USAGE", on_database="ANALYTICS", to=role),
+        res.Grant(priv="SELECT", on_table="ANALYTICS.MARTS.EVENTS", to=role),
+        res.RoleGrant(role=role, to_role="SYSADMIN"),
+    ]
+
+
+def test_plan_apply_replan_converges():
+    account = EmulatedAccount()
+    session = account.session()
+
+    blueprint = Blueprint(resources=_resources())
+    plan = blueprint.plan(session)
+    assert plan
+    blueprint.apply(session, plan)
+    reset_cache()
+
+    assert Blueprint(resources=_resources()).plan(account.session()) == []
+    assert account.get(ResourceType.SCHEMA, "ANALYTICS.MARTS").data["managed_access"] is True
+
+
+def test_update_and_drop():
+    account = EmulatedAccount()
+    session = account.session()
+    execute(session, "CREATE WAREHOUSE WH warehouse_size = XSMALL COMMENT = $$one$$")
+    execute(session, "ALTER WAREHOUSE WH SET warehouse_size = LARGE")
+    execute(session, "ALTER WAREHOUSE WH UNSET comment")
+    [row] = execute(session, "SHOW WAREHOUSES LIKE 'WH'")
+    assert (row["size"], row["comment"], row["owner"]) == ("LARGE", "", "SYSADMIN")
+
+    execute(session, "CREATE DATABASE DB")
+    execute(session, "ALTER DATABASE DB RENAME TO DB2")
+    assert [row["name"] for row in execute(session, "SHOW SCHEMAS IN DATABASE DB2")] == ["PUBLIC"]
+    execute(session, "DROP DATABASE IF EXISTS DB2 RESTRICT")
+    assert execute(session, "SHOW DATABASES") == []
+    assert execute(session, "SHOW SCHEMAS IN ACCOUNT") == []
+
+
+def test_generate_account():
+    account = generate_account(databases=2, schemas_per_database=3, tables_per_schema=5, roles=4, warehouses=1)
+    session = account.session()
+    assert len(execute(session, "SHOW TABLES IN ACCOUNT")) == 30
+    assert len(execute(session, "SHOW TABLES IN SCHEMA DB_1.SCH_2")) == 5
+    assert len(execute(session, "SHOW SCHEMAS IN DATABASE DB_0")) == 4
+    grants = execute(session, "SHOW GRANTS TO ROLE ROLE_3")
+    assert {(row["privilege"], row["granted_on"], row["name"]) for row in grants} == {
+        ("USAGE", "DATABASE", "DB_1"),
+        ("USAGE", "WAREHOUSE", "WH_0"),
+    }
+
+
+def test_fetch_tables_reads_columns_once_per_database():
+    account = generate_account(databases=1, schemas_per_database=2, tables_per_schema=3)
+    session = account.session()
+    urns = [parse_URN(f"urn::EMU00000:table/DB_0.SCH_{i}.T_{j}") for i in range(2) for j in range(3)]
+    with collect_metrics() as registry:
+        tables = [data_provider.fetch_resource(session, urn) for urn in urns]
+
+    queries = registry.to_dict()["queries"]
+    assert "DESC TABLE ?" not in queries
+    assert [stats["cache_misses"] for template, stats in queries.items() if template.startswith("SELECT")] == [1]
+    for urn, table in zip(urns, tables):
+        assert table["columns"] == data_provider.fetch_columns(session, "TABLE", urn.fqn)
+
+
+def test_parallel_apply_converges():
+    account = EmulatedAccount()
+    session = account.session()
+    session_ctx = data_provider.fetch_session(session)
+
+    blueprint = Blueprint(resources=_resources(), parallelism=4)
+    plan = blueprint.plan(session, session_factory=account.session_factory)
+    change_commands = compile_changes_to_sql(session_ctx, plan)
+    dependencies = change_dependencies(plan, change_commands, set(blueprint._manifest.refs))
+    index = {str(change.urn).split(":", 3)[-1]: i for i, change in enumerate(plan)}
+    assert index["database/ANALYTICS"] in dependencies[index["schema/ANALYTICS.MARTS"]]
+    assert index["role/ANALYST"] in dependencies[index["role_grant/ANALYST?role=SYSADMIN"]]
+    assert not dependencies[index["warehouse/ANALYTICS_WH"]]
+
+    blueprint.apply(session, plan, session_factory=account.session_factory)
+    reset_cache()
+    assert Blueprint(resources=_resources()).plan(account.session()) == []
+
+
+def test_apply_plan_file_keeps_plan_order(monkeypatch):
+    account = EmulatedAccount()
+    plan_dict = json.loads(dump_plan(Blueprint(resources=_resources()).plan(account.session())))
+    reset_cache()
+
+    # The blueprint applying a plan file has no resources, so nothing is known about how its changes depend
+    # on each other
+    scheduled = []
+    monkeypatch.setattr(blueprint_operations, "connect", account.session_factory)
+    monkeypatch.setattr(
+        blueprint_module, "change_dependencies", lambda *args: scheduled.append(args) or change_dependencies(*args)
+    )
+    blueprint_operations.blueprint_apply_plan(plan_dict, {"parallelism": 4})
+    assert scheduled == []
+
+    reset_cache()
+    assert Blueprint(resources=_resources()).plan(account.session()) == []
+
+
+def test_apply_coalesces_grants():
+    account = EmulatedAccount()
+    session = account.session()
+
+    def resources():
+        return _resources() + [
+            res.Grant(priv=priv, on_table="ANALYTICS.MARTS.EVENTS", to="ANALYST")
+            for priv in ["INSERT", "UPDATE", "DELETE"]
+        ]
+
+    blueprint = Blueprint(resources=resources())
+    actions = blueprint.apply(session)
+    grants = [sql for sql in actions if sql.startswith("GRANT") and "ON TABLE" in sql]
+    assert grants == ["GRANT DELETE, INSERT, SELECT, UPDATE ON TABLE ANALYTICS.MARTS.EVENTS TO ROLE ANALYST"]
+    # Each grant is accounted for by the statement that applied it
+    table_grants = {
+        urn: statements
+        for urn, statements in blueprint.statements_by_urn.items()
+        if urn.resource_type == ResourceType.GRANT and "ANALYTICS.MARTS.EVENTS" in str(urn)
+    }
+    assert len(table_grants) == 4
+    assert all(statements == grants for statements in table_grants.values())
+    assert all(blueprint.statements_by_urn.values())
+    reset_cache()
+    assert Blueprint(resources=resources()).plan(account.session()) == []
+
+    reset_cache()
+    grants = [resource for resource in _resources() if isinstance(resource, res.Grant)]
+    actions = Blueprint(resources=grants, run_mode="SYNC", allowlist=["grant"]).apply(account.session())
+    assert [sql for sql in actions if sql.startswith("REVOKE")] == [
+        "REVOKE DELETE, INSERT, UPDATE ON TABLE ANALYTICS.MARTS.EVENTS FROM ANALYST"
+    ]
+
+
+def test_apply_plan_file_does_not_coalesce_grants():
+    account = EmulatedAccount()
+
+    def resources():
+        return _resources() + [
+            res.Grant(priv=priv, on_table="ANALYTICS.MARTS.EVENTS", to="ANALYST") for priv in ["INSERT", "UPDATE"]
+        ]
+
+    plan = Blueprint(resources=resources()).plan(account.session())
+    plan = plan_from_dict(json.loads(dump_plan(plan)))
+    reset_cache()
+
+    # The manifest doesn't include the extra grants, so it says nothing about what they depend on
+    actions = Blueprint(resources=_resources()).apply(account.session(), plan)
+    grants = [sql for sql in actions if sql.startswith("GRANT") and "ON TABLE" in sql]
+    assert sorted(grants) == [
+        "GRANT INSERT ON TABLE ANALYTICS.MARTS.EVENTS TO ROLE ANALYST",
+        "GRANT SELECT ON TABLE ANALYTICS.MARTS.EVENTS TO ROLE ANALYST",
+        "GRANT UPDATE ON TABLE ANALYTICS.MARTS.EVENTS TO ROLE ANALYST",
+    ]
+    reset_cache()
+    assert Blueprint(resources=resources()).plan(account.session()) == []
+
+
+def test_apply_updates_every_attribute_in_one_statement():
+    account = EmulatedAccount()
+    session = account.session()
+    execute(session, "CREATE WAREHOUSE WH_0 warehouse_size = XSMALL auto_suspend = 600 COMMENT = $$old$$")
+    execute(session, "CREATE WAREHOUSE WH_1 warehouse_size = XSMALL auto_suspend = 600")
+    execute(session, "CREATE WAREHOUSE WH_2 warehouse_size = XSMALL auto_suspend = 600")
+
+    def resources():
+        return [
+            res.Warehouse(name=f"WH_{index}", warehouse_size="SMALL", auto_suspend=60, max_concurrency_level=4)
+            for index in range(3)
+        ]
+
+    reset_cache()
+    actions = Blueprint(resources=resources()).apply(session)
+    alters = [sql for sql in actions if sql.startswith("ALTER")]
+    assert sorted(alters) == [
+        "ALTER WAREHOUSE WH_0 SET warehouse_size = SMALL AUTO_SUSPEND = 60 MAX_CONCURRENCY_LEVEL = 4",
+        "ALTER WAREHOUSE WH_0 UNSET comment",
+        "ALTER WAREHOUSE WH_1 SET warehouse_size = SMALL AUTO_SUSPEND = 60 MAX_CONCURRENCY_LEVEL = 4",
+        "ALTER WAREHOUSE WH_2 SET warehouse_size = SMALL AUTO_SUSPEND = 60 MAX_CONCURRENCY_LEVEL = 4",
+    ]
+    reset_cache()
+    assert Blueprint(resources=resources()).plan(account.session()) == []
+
+
+def test_apply_evolves_table_columns():
+    account = EmulatedAccount()
+    session = account.session()
+    execute(session, "CREATE DATABASE DB")
+    execute(
+        session,
+        "CREATE TABLE DB.PUBLIC.T (ID NUMBER(38,0) NOT NULL, OLD_NAME VARCHAR(16777216), "
+        "LEGACY VARCHAR(16777216), NOTE VARCHAR(16777216) COMMENT 'x')",
+    )
+
+    def resources(**kwargs):
+        database = res.Database(name="DB")
+        table = res.Table(
+            name="T",
+            schema=database.public_schema,
+            columns=[
+                {"name": "ID", "data_type": "NUMBER(38,0)"},
+                {"name": "NOTE", "data_type": "VARCHAR(16777216)", "not_null": True, "comment": "it's a note"},
+                {"name": "NEW_NAME", "data_type": "VARCHAR(16777216)"},
+                {"name": "CREATED_AT", "data_type": "TIMESTAMP_NTZ(9)"},
+            ],
+            **kwargs,
+        )
+        return [database, table]
+
+    # Column changes are ignored unless the table opts in to them
+    assert Blueprint(resources=resources()).plan(session) == []
+
+    # Dropping columns loses their data, which create-or-update mode doesn't allow
+    reset_cache()
+    with pytest.raises(NonConformingPlanException, match="does not allow dropping column OLD_NAME"):
+        Blueprint(resources=resources(lifecycle={"ignore_changes": []})).plan(session)
+
+    reset_cache()
+    sync = {"run_mode": "SYNC", "allowlist": ["database", "table"]}
+    actions = Blueprint(resources=resources(lifecycle={"ignore_changes": []}), **sync).apply(session)
+    # OLD_NAME isn't renamed to NEW_NAME, since nothing says the two are the same column
+    assert [sql for sql in actions if sql.startswith("ALTER")] == [
+        "ALTER TABLE DB.PUBLIC.T DROP COLUMN OLD_NAME, LEGACY",
+        "ALTER TABLE DB.PUBLIC.T ADD COLUMN NEW_NAME VARCHAR(16777216), CREATED_AT TIMESTAMP_NTZ(9)",
+        "ALTER TABLE DB.PUBLIC.T ALTER COLUMN ID DROP NOT NULL, COLUMN NOTE SET NOT NULL, "
+        "COLUMN NOTE COMMENT $$it's a note$$",
+    ]
+    assert not [sql for sql in actions if sql.startswith("DROP")]
+    assert execute(account.session(), "DESC TABLE DB.PUBLIC.T")[1]["comment"] == "it's a note"
+    reset_cache()
+    assert Blueprint(resources=resources(lifecycle={"ignore_changes": []}), **sync).plan(account.session()) == []
+
+
+def test_table_column_reorder_is_reported():
+    account = EmulatedAccount()
+    execute(account.session(), "CREATE DATABASE DB")
+    execute(account.session(), "CREATE TABLE DB.PUBLIC.T (A VARCHAR(16777216), B VARCHAR(16777216))")
+
+    def resources(*names):
+        database = res.Database(name="DB")
+        columns = [{"name": name, "data_type": "VARCHAR(16777216)"} for name in names]
+        return [
+            database,
+            res.Table(name="T", schema=database.public_schema, columns=columns, lifecycle={"ignore_changes": []}),
+        ]
+
+    # Snowflake can't reorder columns, so this change would never converge
+    with pytest.raises(NonConformingPlanException, match="can't reorder columns"):
+        Blueprint(resources=resources("B", "A")).plan(account.session())
+    reset_cache()
+    with pytest.raises(NonConformingPlanException, match="can't reorder columns"):
+        Blueprint(resources=resources("C", "A", "B")).plan(account.session())
+
+    # Appending a column keeps the existing ones in place
+    reset_cache()
+    actions = Blueprint(resources=resources("A", "B", "C")).apply(account.session())
+    assert [sql for sql in actions if sql.startswith("ALTER")] == [
+        "ALTER TABLE DB.PUBLIC.T ADD COLUMN C VARCHAR(16777216)"
+    ]
+
+
+def test_table_with_collation_and_default_converges():
+    account = EmulatedAccount()
+
+    def resources(default="it's"):
+        database = res.Database(name="DB")
+        columns = [
+            {"name": "NAME", "data_type": "STRING", "collate": "en-ci", "not_null": True, "default": default},
+            {"name": "PRICE", "data_type": "DECIMAL(10, 2)"},
+            {"name": "CREATED_AT", "data_type": "TIMESTAMP_TZ"},
+        ]
+        table = res.Table(name="T", schema=database.public_schema, columns=columns, lifecycle={"ignore_changes": []})
+        return [database, table]
+
+    Blueprint(resources=resources()).apply(account.session())
+    desc = execute(account.session(), "DESC TABLE DB.PUBLIC.T")
+    assert desc[0]["type"] == "VARCHAR(16777216) COLLATE 'en-ci'"
+    assert desc[0]["default"] == "'it''s'"
+    reset_cache()
+    assert Blueprint(resources=resources()).plan(account.session()) == []
+
+    # Snowflake can't change a column's default, which the plan reports instead of failing during apply
+    reset_cache()
+    with pytest.raises(NonConformingPlanException, match="can't change the default of column NAME"):
+        Blueprint(resources=resources(default="other")).plan(account.session())
+
+
+def test_noop_apply_keeps_state_cache(tmp_path):
+    account = EmulatedAccount()
+    session = account.session()
+    Blueprint(resources=_resources()).apply(session)
+
+    blueprint = Blueprint(resources=_resources(), state_cache=str(tmp_path))
+    plan = blueprint.plan(session)
+    snapshot = tmp_path / f"{account.account_locator}.pickle"
+    assert plan == [] and snapshot.exists()
+    assert blueprint.apply(session, plan) == ["USE SECONDARY ROLES ALL"]
+    assert snapshot.exists()
+
+
+def test_parallel_plan_attributes_fetches_to_phases():
+    account = EmulatedAccount()
+    session = account.session()
+    with collect_metrics() as registry:
+        Blueprint(resources=_resources(), parallelism=4).plan(session, session_factory=account.session_factory)
+
+    phases = registry.to_dict()["phases"]
+    assert phases["plan:fetch"]["count"] > 0
+    assert phases["plan:references"]["count"] > 0
@@ -0,0 +1,115 @@
+import threading
+
+import pytest
+from snowflake.connector.errors import ProgrammingError
+
+from titan import data_provider
+from titan.client import DOES_NOT_EXIST_ERR, execute, execute_batch, execute_stream, reset_cache
+from titan.metrics import (
+    collect_metrics,
+    current_phase,
+    in_current_phase,
+    metrics_enabled,
+    phase,
+    query_template,
+    record_query,
+)
+
+from tests.helpers import FakeSession
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    reset_cache()
+    yield
+    reset_cache()
+
+
+@pytest.mark.parametrize(
+    "sql, template",
+    [
+        ("SHOW GRANTS TO ROLE SOMEROLE", "SHOW GRANTS TO ROLE ?"),
+        ("SHOW ROLES IN ACCOUNT", "SHOW ROLES IN ACCOUNT"),
+        ("SHOW VIEWS IN SCHEMA DB.PUBLIC", "SHOW VIEWS IN SCHEMA ?"),
+        ('DESC VIEW DB.PUBLIC."my view"', "DESC VIEW ?"),
+        ("SHOW TERSE USERS LIKE 'ADMIN'", "SHOW TERSE USERS LIKE ?"),
+        ("SELECT SYSTEM$GET_TAG('DB.PUBLIC.PII', 42)", "SELECT SYSTEM$GET_TAG(?, ?)"),
+    ],
+)
+def test_query_template(sql, template):
+    assert query_template(sql) == template
+
+
+def test_record_query_is_a_no_op_without_registry():
+    record_query("SYSADMIN", "SHOW ROLES", [], 0.1)
+
+
+def test_execute_records_queries_and_cache_hits():
+    session = FakeSession(
+        results={
+            "SHOW GRANTS TO ROLE R1": [{"privilege": "USAGE"}, {"privilege": "MONITOR"}],
+            "SHOW GRANTS TO ROLE R2": [{"privilege": "USAGE"}],
+            "DESC ROLE R3": ProgrammingError("missing", errno=DOES_NOT_EXIST_ERR),
+        }
+    )
+    with collect_metrics() as registry, phase("plan:fetch"):
+        execute(session, "SHOW GRANTS TO ROLE R1", cacheable=True)
+        execute(session, "SHOW GRANTS TO ROLE R1", cacheable=True)
+        execute_batch(session, ["SHOW GRANTS TO ROLE R1", "SHOW GRANTS TO ROLE R2"], cacheable=True)
+        execute(session, "DESC ROLE R3", empty_response_codes=[DOES_NOT_EXIST_ERR])
+        data_provider.use_secondary_roles(session, all=True)
+    record_query("SYSADMIN", "SHOW ROLES", [], 0.1)
+
+    metrics = registry.to_dict()
+    grants = metrics["queries"]["SHOW GRANTS TO ROLE ?"]
+    assert grants["count"] == 4
+    assert grants["rows"] == 7
+    assert (grants["cache_hits"], grants["cache_misses"]) == (2, 2)
+    assert sum(grants["latency_histogram"].values()) == 2
+    assert metrics["queries"]["DESC ROLE ?"]["errors"] == 1
+    assert "SHOW ROLES" not in metrics["queries"]
+    assert metrics["phases"]["plan:fetch"]["count"] == 6
+    assert metrics["fetchers"] == {
+        "use_secondary_roles": {"count": 1, "rows": 0, "bytes": 0, "total_seconds": pytest.approx(0, abs=1)}
+    }
+
+
+def test_metrics_aggregate_by_role():
+    with collect_metrics() as registry:
+        record_query("SYSADMIN", "SHOW ROLES", [{"name": "R1"}, {"name": "R2"}], 0.5)
+        record_query("SYSADMIN", "SHOW USERS", [], 0.25)
+        record_query("SECURITYADMIN", "SHOW GRANTS TO ROLE R1", [{"privilege": "USAGE"}], 1.0)
+        record_query(None, "SELECT 1", [], 0.1)
+
+    roles = registry.to_dict()["roles"]
+    assert list(roles) == ["SECURITYADMIN", "SYSADMIN"]
+    assert roles["SYSADMIN"]["count"] == 2
+    assert roles["SYSADMIN"]["rows"] == 2
+    assert roles["SYSADMIN"]["total_seconds"] == pytest.approx(0.75)
+    assert roles["SECURITYADMIN"]["count"] == 1
+
+
+def test_execute_stream_records_row_count():
+    rows = [{"name": f"R{i}"} for i in range(5)]
+    session = FakeSession(results={"SHOW ROLES": rows})
+    assert not metrics_enabled()
+    assert list(execute_stream(session, "SHOW ROLES", batch_size=2)) == rows
+
+    with collect_metrics() as registry:
+        assert metrics_enabled()
+        assert list(execute_stream(session, "SHOW ROLES", batch_size=2)) == rows
+    stats = registry.to_dict()["queries"]["SHOW ROLES"]
+    assert (stats["count"], stats["rows"], stats["bytes"]) == (1, 5, 0)
+
+
+def test_phase_is_local_to_thread_unless_handed_over():
+    seen = []
+    with phase("plan:fetch"):
+        worker = threading.Thread(target=lambda: seen.append(current_phase()))
+        handed_over = threading.Thread(target=in_current_phase(lambda: seen.append(current_phase())))
+        for thread in (worker, handed_over):
+            thread.start()
+            thread.join()
+        assert current_phase() == "plan:fetch"
+    assert seen == [None, "plan:fetch"]
+    assert current_phase() is None
@@ -351,3 +351,21 @@ def test_future_grant_alt_syntax():
     role = res.Role(name="ROLE")
     fg = res.FutureGrant(priv="SELECT", on_type="table", in_type=db.resource_type, in_name=db.name, to=role)
     assert fg
+
+
+def test_spec_metadata_is_computed_once():
+    spec = res.Table.spec
+    assert spec.get_metadata("copy_grants") is spec.get_metadata("copy_grants")
+    assert spec.get_metadata("copy_grants").fetchable is False
+    assert [f.name for f, _ in spec.fields_with_metadata()][:2] == ["name", "columns"]
+    with pytest.raises(ValueError):
+        spec.get_metadata("not_a_field")
+
+
+def test_spec_field_coercers_are_compiled_once():
+    spec = res.Table.spec
+    assert spec.field_coercers() is spec.field_coercers()
+    table = res.Table(name="T", columns=[{"name": "ID", "data_type": "NUMBER(38,0)"}], owner="ADMIN")
+    assert table._data.owner.resource_type == ResourceType.ROLE
+    with pytest.raises(TypeError):
+        res.Table(name="T", columns=[{"name": "ID", "data_type": "NUMBER(38,0)"}], transient="yes")
@@ -0,0 +1,183 @@
+import threading
+import time
+
+import pytest
+
+from titan.blueprint_config import BlueprintConfig
+from titan.client import RolePool, SessionPool, role_pool, using_role
+
+from tests.helpers import FakeSession
+
+
+def test_session_pool_serial_uses_primary_session():
+    primary = FakeSession()
+    with SessionPool(primary) as pool:
+        results = list(pool.map(lambda session, item: (session, item), range(5)))
+    assert [item for _, item in results] == list(range(5))
+    assert all(session is primary for session, _ in results)
+
+
+def test_session_pool_preserves_order():
+    primary = FakeSession()
+
+    def _work(session, item):
+        time.sleep(0.001 * (5 - item))
+        return item * 2
+
+    with SessionPool(primary, size=4, session_factory=FakeSession) as pool:
+        assert list(pool.map(_work, range(5))) == [0, 2, 4, 6, 8]
+
+
+def test_session_pool_without_factory_is_serial():
+    primary = FakeSession()
+    threads = set()
+
+    def _work(session, item):
+        threads.add(threading.get_ident())
+        return session
+
+    with SessionPool(primary, size=4) as pool:
+        assert pool.size == 1
+        assert all(session is primary for session in pool.map(_work, range(5)))
+    assert threads == {threading.get_ident()}
+
+
+def test_session_pool_opens_at_most_size_connections():
+    primary = FakeSession(role="SECURITYADMIN")
+    opened = []
+    lock = threading.Lock()
+
+    def _factory():
+        session = FakeSession(role="PUBLIC")
+        with lock:
+            opened.append(session)
+        return session
+
+    def _work(session, item):
+        time.sleep(0.005)
+        return session
+
+    with SessionPool(primary, size=3, session_factory=_factory) as pool:
+        sessions = list(pool.map(_work, range(20)))
+
+    assert len(opened) <= 2
+    assert {id(s) for s in sessions} <= {id(primary)} | {id(s) for s in opened}
+    for session in opened:
+        assert session.executed[0] == "USE ROLE SECURITYADMIN"
+        assert session.closed
+    assert not primary.closed
+
+
+def test_session_pool_raises_worker_exceptions():
+    def _work(session, item):
+        if item == 3:
+            raise RuntimeError("boom")
+        return item
+
+    with SessionPool(FakeSession(), size=2, session_factory=FakeSession) as pool:
+        with pytest.raises(RuntimeError):
+            list(pool.map(_work, range(5)))
+
+
+def test_blueprint_config_parallelism_validation():
+    assert BlueprintConfig().parallelism == 1
+    assert BlueprintConfig(parallelism=8).parallelism == 8
+    with pytest.raises(ValueError):
+        BlueprintConfig(parallelism=0)
+    with pytest.raises(ValueError):
+        SessionPool(FakeSession(), size=0)
+
+
+def test_role_pool_pins_one_connection_per_role():
+    primary = FakeSession(role="SYSADMIN")
+    opened = []
+
+    def _factory():
+        opened.append(FakeSession(role="PUBLIC"))
+        return opened[-1]
+
+    with RolePool(primary, session_factory=_factory) as pool:
+        securityadmin = pool.session_for_role("SECURITYADMIN")
+        assert pool.session_for_role('"SECURITYADMIN"') is securityadmin
+        assert pool.session_for_role("sysadmin") is primary
+
+    assert len(opened) == 1
+    assert securityadmin.executed == ["USE ROLE SECURITYADMIN"]
+    assert securityadmin.closed
+    assert primary.executed == []
+
+
+def test_using_role_routes_through_role_pool():
+    primary = FakeSession(role="SYSADMIN")
+    with using_role(primary, "SECURITYADMIN") as session:
+        assert session is primary
+        assert primary.role == "SECURITYADMIN"
+    assert primary.executed == ["USE ROLE SECURITYADMIN", "USE ROLE SYSADMIN"]
+
+    primary.executed.clear()
+    with role_pool(primary, session_factory=lambda: FakeSession(role="PUBLIC")):
+        with using_role(primary, "SECURITYADMIN") as session:
+            assert session is not primary
+            assert session.role == "SECURITYADMIN"
+    assert primary.executed == []
+
+
+def test_role_pool_connects_outside_lock():
+    primary = FakeSession(role="SYSADMIN")
+    # Both connects must be in flight at once to pass the barrier, which would time out if connects were serialized
+    barrier = threading.Barrier(2, timeout=5)
+    opened = []
+
+    def _factory():
+        barrier.wait()
+        opened.append(FakeSession(role="PUBLIC"))
+        return opened[-1]
+
+    with RolePool(primary, session_factory=_factory) as pool:
+        sessions = {}
+
+        def _get(role):
+            sessions[role] = pool.session_for_role(role)
+
+        threads = [threading.Thread(target=_get, args=(role,)) for role in ("SECURITYADMIN", "USERADMIN")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sessions["SECURITYADMIN"].role == "SECURITYADMIN"
+        assert sessions["USERADMIN"].role == "USERADMIN"
+    assert len(opened) == 2
+
+
+def test_role_pool_closes_connection_that_lost_race():
+    primary = FakeSession(role="SYSADMIN")
+    barrier = threading.Barrier(2, timeout=5)
+    opened = []
+
+    def _factory():
+        barrier.wait()
+        opened.append(FakeSession(role="PUBLIC"))
+        return opened[-1]
+
+    with RolePool(primary, session_factory=_factory) as pool:
+        sessions = []
+        threads = [
+            threading.Thread(target=lambda: sessions.append(pool.session_for_role("SECURITYADMIN"))) for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sessions[0] is sessions[1]
+        assert pool.session_for_role("SECURITYADMIN") is sessions[0]
+        assert sum(conn.closed for conn in opened) == 1
+    assert all(conn.closed for conn in opened)
+
+
+def test_blueprint_operations_only_open_extra_connections_in_parallel():
+    from titan.operations import blueprint as blueprint_operations
+
+    assert blueprint_operations._session_factory(BlueprintConfig()) is None
+    assert blueprint_operations._session_factory(BlueprintConfig(parallelism=4)) is blueprint_operations.connect
@@ -0,0 +1,90 @@
+import os
+import pickle
+import time
+
+import pytest
+
+from titan import client
+from titan.client import execute, reset_cache
+from titan.enums import ResourceType
+from titan.state_cache import StateCache, parse_duration, resource_type_for_query
+
+from tests.helpers import FakeSession
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    reset_cache()
+    yield
+    reset_cache()
+
+
+def test_parse_duration():
+    assert parse_duration(90) == 90
+    assert parse_duration("90") == 90
+    assert parse_duration("90s") == 90
+    assert parse_duration("10m") == 600
+    assert parse_duration("2h") == 7200
+    assert parse_duration("1d") == 86400
+    with pytest.raises(ValueError):
+        parse_duration("10 minutes")
+
+
+def test_resource_type_for_query():
+    assert resource_type_for_query("SHOW ROLES IN ACCOUNT") == ResourceType.ROLE
+    assert resource_type_for_query("SHOW USER FUNCTIONS IN ACCOUNT") == ResourceType.FUNCTION
+    assert resource_type_for_query("SHOW PARAMETERS FOR WAREHOUSE WH") == ResourceType.WAREHOUSE
+    assert resource_type_for_query("SHOW GRANTS TO ROLE SOMEROLE") == ResourceType.GRANT
+    assert resource_type_for_query("DESC EXTERNAL ACCESS INTEGRATION EAI") == ResourceType.EXTERNAL_ACCESS_INTEGRATION
+    assert resource_type_for_query("SELECT * FROM DB.INFORMATION_SCHEMA.COLUMNS") is None
+
+
+def test_state_cache_round_trip(tmp_path):
+    session = FakeSession(results={"SHOW ROLES IN ACCOUNT": [{"name": "R1"}]})
+    execute(session, "SHOW ROLES IN ACCOUNT", cacheable=True)
+    execute(session, "SHOW WAREHOUSES IN ACCOUNT", cacheable=True)
+    StateCache(str(tmp_path)).save("ABCD123")
+
+    reset_cache()
+    assert StateCache(str(tmp_path)).load("ABCD123") == 2
+    assert execute(session, "SHOW ROLES IN ACCOUNT", cacheable=True) == [{"name": "R1"}]
+    assert session.executed == ["SHOW ROLES IN ACCOUNT", "SHOW WAREHOUSES IN ACCOUNT"]
+
+
+def test_state_cache_skips_stale_entries(tmp_path):
+    fetched_at = time.time() - 120
+    entries = {
+        "SYSADMIN": {
+            "SHOW ROLES IN ACCOUNT": (fetched_at, [{"name": "R1"}]),
+            "SHOW WAREHOUSES IN ACCOUNT": (fetched_at, [{"name": "WH"}]),
+        }
+    }
+    with open(os.path.join(tmp_path, "ABCD123.pickle"), "wb") as f:
+        pickle.dump({"version": 1, "entries": entries}, f)
+
+    state_cache = StateCache(str(tmp_path), max_age=60, ttls={ResourceType.ROLE: 600})
+    assert state_cache.load("ABCD123") == 1
+    assert client.cache_snapshot() == {"SYSADMIN": {"SHOW ROLES IN ACCOUNT": [{"name": "R1"}]}}
+
+    # Reused entries keep their original fetch time
+    state_cache.save("ABCD123")
+    with open(os.path.join(tmp_path, "ABCD123.pickle"), "rb") as f:
+        saved = pickle.load(f)["entries"]
+    assert saved["SYSADMIN"]["SHOW ROLES IN ACCOUNT"][0] == fetched_at
+
+    state_cache.invalidate("ABCD123")
+    assert not os.path.exists(os.path.join(tmp_path, "ABCD123.pickle"))
+
+
+def test_state_cache_invalidate_keeps_resources(tmp_path):
+    session = FakeSession(results={"SHOW ROLES IN ACCOUNT": [{"name": "R1"}]})
+    execute(session, "SHOW ROLES IN ACCOUNT", cacheable=True)
+    state_cache = StateCache(str(tmp_path))
+    state_cache.resources = {"urn::ABCD123:view/DB.PUBLIC.V1": (("fingerprint",), {"name": "V1"})}
+    state_cache.save("ABCD123")
+    state_cache.invalidate("ABCD123")
+
+    reset_cache()
+    state_cache = StateCache(str(tmp_path))
+    assert state_cache.load("ABCD123") == 0
+    assert state_cache.resources == {"urn::ABCD123:view/DB.PUBLIC.V1": (("fingerprint",), {"name": "V1"})}
@@ -1,4 +1,12 @@
-from titan.blueprint import topological_sort
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from titan.blueprint import topological_levels, topological_sort
+from titan.exceptions import NotADAGException
 
 resource_set = {
     'urn:::role_grant/private_equity_associate?user="c.black@arrakisinvestments.com"',
@@ -96,3 +104,41 @@ refs = [
 def test_topological_sort():
     sorted_resources = topological_sort(resource_set, set(refs))
     assert len(sorted_resources) == len(resource_set)
+
+
+def test_topological_levels():
+    levels = topological_levels(resource_set, set(refs))
+    assert sum(levels.sizes) == len(resource_set)
+    assert "urn:::account/TITAN_TEST_AWS_ENTERPRISE" in levels.levels[0]
+    level_of = {node: depth for depth, level in enumerate(levels) for node in level}
+    for node, ref in refs:
+        assert level_of[ref] < level_of[node]
+    assert levels.critical_path_length == len(levels) == max(level_of.values()) + 1
+
+
+def test_topological_levels_reports_cycle():
+    with pytest.raises(NotADAGException) as err:
+        topological_levels({"a", "b", "c", "d"}, {("a", "b"), ("b", "c"), ("c", "a"), ("d", "a")})
+    cycle = err.value.cycle
+    assert cycle[0] == cycle[-1]
+    assert sorted(cycle[:-1]) == ["a", "b", "c"]
+
+
+def test_topological_sort_is_independent_of_hash_seed():
+    script = (
+        "from tests.test_topological_sort import refs, resource_set;"
+        "from titan.blueprint import topological_sort;"
+        "print(list(topological_sort(set(resource_set), set(refs))))"
+    )
+    orders = set()
+    for seed in ("0", "1", "2"):
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=Path(__file__).parent.parent,
+            env={**os.environ, "PYTHONHASHSEED": seed},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        orders.add(result.stdout)
+    assert len(orders) == 1
@@ -1,9 +1,12 @@
+import heapq
 import json
 import logging
 from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from queue import Queue
-from typing import Any, Generator, Iterable, Optional, Sequence, TypeVar, Union, cast
+from typing import Any, Callable, Generator, Generic, Iterable, Iterator, Optional, Sequence, TypeVar, Union, cast
 
 import snowflake.connector
 
@@ -13,8 +16,17 @@ from .client import (
     ALREADY_EXISTS_ERR,
     DOES_NOT_EXIST_ERR,
     INVALID_GRANT_ERR,
+    MAX_BATCH_STATEMENTS,
+    ConcurrencyGovernor,
+    RolePool,
+    SessionFactory,
+    SessionPool,
+    cache_stats,
     execute,
+    execute_batch,
+    governed,
     reset_cache,
+    role_pool,
 )
 from .data_provider import SessionContext
 from .enums import AccountEdition, BlueprintScope, ResourceType, RunMode, resource_type_is_grant
@@ -28,6 +40,7 @@ from .exceptions import (
     OrphanResourceException,
 )
 from .identifiers import URN, parse_identifier, parse_URN, resource_label_for_type
+from .metrics import in_current_phase, phase
 from .privs import (
     CREATE_PRIV_FOR_RESOURCE_TYPE,
     system_role_for_priv,
@@ -48,6 +61,7 @@ from .resources.resource import (
 from .resources.role import Role
 from .resources.tag import Tag, TaggableResource
 from .scope import AccountScope, DatabaseScope, OrganizationScope, SchemaScope, TableScope
+from .state_cache import DEFAULT_MAX_AGE, StateCache, parse_duration
 
 T = TypeVar("T")
 ResourceRef = Union[tuple[ResourceType, str], str]
@@ -76,12 +90,16 @@ class CreateResource(ResourceChange):
     after: dict[str, str]
 
     def to_dict(self) -> dict[str, Union[str, dict[str, str]]]:
-        return {
+        data: dict[str, Union[str, dict[str, str]]] = {
             "action": "CREATE",
             "urn": str(self.urn),
             "resource_cls": self.resource_cls.__name__,
             "after": self.after,
         }
+        if self.container is not None:
+            container_urn, container_owner = self.container
+            data["container"] = {str(container_urn): str(container_owner)}
+        return data
 
 
 @dataclass
@@ -139,8 +157,8 @@ def plan_from_dict(plan_dict: dict) -> Plan:
     for change in plan_dict:
         action = change["action"]
         if action == "CREATE":
-            container_descriptor: ContainerDescriptor
-            for urn, owner in change["container"].items():
+            container_descriptor: Optional[ContainerDescriptor] = None
+            for urn, owner in change.get("container", {}).items():
                 container_descriptor = (parse_URN(urn), ResourceName(owner))
             changes.append(
                 CreateResource(
@@ -525,6 +543,13 @@ class Blueprint:
         scope: Optional[str] = None,
         database: Optional[str] = None,
         schema: Optional[str] = None,
+        parallelism: int = 1,
+        max_qps: Optional[float] = None,
+        query_tag: Optional[str] = None,
+        state_cache: Optional[str] = None,
+        state_cache_max_age: Union[int, str] = DEFAULT_MAX_AGE,
+        state_cache_ttls: Optional[dict] = None,
+        incremental: bool = False,
     ) -> None:
         self._config: BlueprintConfig = BlueprintConfig(
             name=name,
@@ -537,8 +562,22 @@ class Blueprint:
             scope=BlueprintScope(scope) if scope else None,
             database=ResourceName(database) if database else None,
             schema=ResourceName(schema) if schema else None,
+            parallelism=parallelism,
+            max_qps=max_qps,
+            query_tag=query_tag,
+            state_cache=state_cache,
+            state_cache_max_age=parse_duration(state_cache_max_age),
+            state_cache_ttls={
+                ResourceType(resource_type): parse_duration(ttl)
+                for resource_type, ttl in (state_cache_ttls or {}).items()
+            },
+            incremental=incremental,
         )
         self._finalized: bool = False
+        self._manifest: Optional[Manifest] = None
+        self._planned: Optional[Plan] = None
+        # The statements the last apply ran for each change in its plan, by URN. Coalesced grants share a statement.
+        self.statements_by_urn: dict[URN, list[str]] = {}
         self._staged: list[Resource] = []
         self._root: ResourcePointer = ResourcePointer(name="MISSING", resource_type=ResourceType.ACCOUNT)
         self.add(resources or [])
@@ -550,6 +589,8 @@ class Blueprint:
         blueprint._staged = []
         blueprint._root = ResourcePointer(name="MISSING", resource_type=ResourceType.ACCOUNT)
         blueprint._finalized = False
+        blueprint._manifest = None
+        blueprint._planned = None
         blueprint.add(config.resources or [])
         return blueprint
 
@@ -569,6 +610,19 @@ class Blueprint:
                 if change.resource_cls.resource_type == ResourceType.GRANT:
                     exceptions.append(f"Grants cannot be updated (ref: {change.urn})")
 
+            # Column exceptions
+            if isinstance(change, UpdateResource) and "columns" in change.delta:
+                if change.urn.resource_type in (ResourceType.TABLE, ResourceType.ICEBERG_TABLE):
+                    for column_change in lifecycle.unsupported_column_changes(
+                        change.before["columns"], change.after["columns"]
+                    ):
+                        exceptions.append(f"{column_change} (ref: {change.urn})")
+                    if self._config.run_mode == RunMode.CREATE_OR_UPDATE:
+                        for column in lifecycle.dropped_columns(change.before["columns"], change.after["columns"]):
+                            exceptions.append(
+                                f"Create-or-update mode does not allow dropping column {column} (ref: {change.urn})"
+                            )
+
             # Valid Resource Types exceptions
             if self._config.allowlist:
                 if change.urn.resource_type not in self._config.allowlist:
@@ -615,59 +669,109 @@ class Blueprint:
         )
         return plan
 
-    def fetch_remote_state(self, session, manifest: Manifest) -> State:
+    def fetch_remote_state(
+        self,
+        session,
+        manifest: Manifest,
+        session_factory: Optional[SessionFactory] = None,
+    ) -> State:
+        """
+        Fetch the current state of every resource in the manifest. When the blueprint is configured with
+        parallelism > 1, fetches are spread over a pool of sessions. Extra connections are opened with
+        `session_factory` if one is provided, otherwise the pool shares `session`.
+        """
         state: State = {}
         session_ctx = data_provider.fetch_session(session)
 
-        data_provider.use_secondary_roles(session, all=True)
+        setup_session = self._session_setup("plan")
+        setup_session(session)
 
-        if self._config.run_mode == RunMode.SYNC:
-            if self._config.allowlist:
-                for resource_type in self._config.allowlist:
-                    for fqn in data_provider.list_resource(session, resource_label_for_type(resource_type)):
-                        # FIXME
-                        if self._config.scope == BlueprintScope.DATABASE and fqn.database != self._config.database:
-                            continue
-                        elif self._config.scope == BlueprintScope.SCHEMA and fqn.schema != self._config.schema:
-                            continue
-                        urn = URN(resource_type=resource_type, fqn=fqn, account_locator=session_ctx["account_locator"])
-                        data = data_provider.fetch_resource(session, urn)
+        def _fetch_reference(conn, reference: URN):
+            try:
+                return data_provider.fetch_resource(conn, reference)
+            except Exception:
+                return None
+
+        pool = SessionPool(
+            session,
+            size=self._config.parallelism,
+            session_factory=session_factory,
+            on_connect=setup_session,
+        )
+        pinned_roles = role_pool(session, session_factory=session_factory, on_connect=setup_session)
+        with pool, pinned_roles, governed(self._governor()):
+            if self._config.run_mode == RunMode.SYNC:
+                if self._config.allowlist:
+                    allowlist_labels = [
+                        resource_label_for_type(resource_type) for resource_type in self._config.allowlist
+                    ]
+                    sync_urns = []
+                    listings = pool.map(data_provider.list_resource, allowlist_labels)
+                    for resource_type, fqns in zip(self._config.allowlist, listings):
+                        for fqn in fqns:
+                            # FIXME
+                            if self._config.scope == BlueprintScope.DATABASE and fqn.database != self._config.database:
+                                continue
+                            elif self._config.scope == BlueprintScope.SCHEMA and fqn.schema != self._config.schema:
+                                continue
+                            sync_urns.append(
+                                URN(
+                                    resource_type=resource_type, fqn=fqn, account_locator=session_ctx["account_locator"]
+                                )
+                            )
+                    for urn, data in zip(sync_urns, pool.map(data_provider.fetch_resource, sync_urns)):
                         if data is None:
                             raise MissingResourceException(f"Resource could not be found: {urn}")
                         resource_cls = Resource.resolve_resource_cls(urn.resource_type, data)
                         state[urn] = resource_cls.spec(**data).to_dict(session_ctx["account_edition"])
-            else:
-                raise RuntimeError("Sync mode requires an allowlist")
-
-        for urn, manifest_item in manifest.items():
-            data = data_provider.fetch_resource(session, urn)
-            if data is not None:
-                if isinstance(manifest_item, ResourcePointer):
-                    resource_cls = Resource.resolve_resource_cls(urn.resource_type, data)
                 else:
-                    resource_cls = manifest_item.resource_cls
+                    raise RuntimeError("Sync mode requires an allowlist")
 
-                state[urn] = resource_cls.spec(**data).to_dict(session_ctx["account_edition"])
-
-        # check for existence of resource refs
-        for parent, reference in manifest.refs:
-            if reference in manifest:
-                continue
+            manifest_items = list(manifest.items())
+            manifest_urns = [urn for urn, _ in manifest_items]
 
-            is_public_schema = reference.resource_type == ResourceType.SCHEMA and reference.fqn.name == ResourceName(
-                "PUBLIC"
-            )
-
-            try:
-                data = data_provider.fetch_resource(session, reference)
-            except Exception:
-                data = None
-
-            if data is None and not is_public_schema:
-                # logger.error(manifest.to_dict(session_ctx))
-                raise MissingResourceException(
-                    f"Resource {reference} required by {parent} not found or failed to fetch"
+            # Warm the cache with one SHOW per resource type and container, and one SHOW GRANTS per role, before
+            # fetching individual resources, then with the parameters of the objects that turned up
+            with phase("plan:prefetch"):
+                prefetch_sql = data_provider.plan_prefetch(manifest_urns) + data_provider.plan_grant_prefetch(
+                    manifest_urns
                 )
+                for _ in pool.map(data_provider.prefetch, _batches(prefetch_sql, pool.size)):
+                    pass
+                prefetch_sql = data_provider.plan_parameter_prefetch(session, manifest_urns)
+                for _ in pool.map(data_provider.prefetch, _batches(prefetch_sql, pool.size)):
+                    pass
+                if session_ctx["account_edition"] != AccountEdition.STANDARD:
+                    tag_reference_sql = data_provider.plan_tag_reference_prefetch(manifest_urns)
+                    for _ in pool.map(data_provider.prefetch_tag_references, _batches(tag_reference_sql, pool.size)):
+                        pass
+
+            with phase("plan:fetch"):
+                fetched = list(pool.map(data_provider.fetch_resource, manifest_urns))
+            for (urn, manifest_item), data in zip(manifest_items, fetched):
+                if data is not None:
+                    if isinstance(manifest_item, ResourcePointer):
+                        resource_cls = Resource.resolve_resource_cls(urn.resource_type, data)
+                    else:
+                        resource_cls = manifest_item.resource_cls
+
+                    state[urn] = resource_cls.spec(**data).to_dict(session_ctx["account_edition"])
+
+            # check for existence of resource refs
+            external_refs = [(parent, reference) for parent, reference in manifest.refs if reference not in manifest]
+            references = [reference for _, reference in external_refs]
+            with phase("plan:references"):
+                fetched = list(pool.map(_fetch_reference, references))
+            for (parent, reference), data in zip(external_refs, fetched):
+                is_public_schema = (
+                    reference.resource_type == ResourceType.SCHEMA and reference.fqn.name == ResourceName("PUBLIC")
+                )
+
+                if data is None and not is_public_schema:
+                    # logger.error(manifest.to_dict(session_ctx))
+                    raise MissingResourceException(
+                        f"Resource {reference} required by {parent} not found or failed to fetch"
+                    )
 
         return state
 
@@ -945,14 +1049,32 @@ class Blueprint:
 
         return manifest
 
-    def plan(self, session) -> Plan:
+    def plan(self, session, session_factory: Optional[SessionFactory] = None) -> Plan:
+        with phase("plan"):
+            return self._plan_with_session(session, session_factory)
+
+    def _plan_with_session(self, session, session_factory: Optional[SessionFactory] = None) -> Plan:
         reset_cache()
         logger.debug("Using blueprint vars:")
         for key in self._config.vars.keys():
             logger.debug(f"  {key}")
         session_ctx = data_provider.fetch_session(session)
+        state_cache = self._state_cache()
+        if state_cache:
+            state_cache.load(session_ctx["account_locator"])
         manifest = self.generate_manifest(session_ctx)
-        remote_state = self.fetch_remote_state(session, manifest)
+        self._manifest = manifest
+        if state_cache and self._config.incremental:
+            data_provider.start_incremental_refresh(state_cache.resources)
+            try:
+                remote_state = self.fetch_remote_state(session, manifest, session_factory=session_factory)
+            finally:
+                state_cache.resources = data_provider.stop_incremental_refresh()
+        else:
+            remote_state = self.fetch_remote_state(session, manifest, session_factory=session_factory)
+        logger.debug(f"Execution cache: {cache_stats()}")
+        if state_cache:
+            state_cache.save(session_ctx["account_locator"])
         try:
             finished_plan = self._plan(remote_state, manifest)
         except Exception as e:
@@ -963,11 +1085,12 @@ class Blueprint:
 
             raise e
         self._raise_for_nonconforming_plan(session_ctx, finished_plan)
+        self._planned = finished_plan
         return finished_plan
 
-    def apply(self, session, plan: Optional[Plan] = None):
+    def apply(self, session, plan: Optional[Plan] = None, session_factory: Optional[SessionFactory] = None):
         if plan is None:
-            plan = self.plan(session)
+            plan = self.plan(session, session_factory=session_factory)
 
         # TODO: cursor setup, including query tag
 
@@ -990,28 +1113,99 @@ class Blueprint:
 
         _raise_if_plan_would_drop_session_user(session_ctx, plan)
 
-        action_queue = compile_plan_to_sql(session_ctx, plan)
+        change_commands = compile_changes_to_sql(session_ctx, plan)
+        members = [[index] for index in range(len(plan))]
+        refs = self._apply_refs(session_ctx, plan)
+        dependencies = change_dependencies(plan, change_commands, refs) if refs is not None else None
+        concurrent = dependencies is not None and self._config.parallelism > 1 and session_factory is not None
+        if dependencies is not None:
+            # Privileges granted on the same object to the same role are granted in one statement. Merging relies
+            # on the dependencies, so it only happens when they come from a manifest that covers the plan. From
+            # here on, each entry of change_commands runs one or more changes.
+            change_commands, dependencies, members = coalesce_grant_changes(plan, change_commands, dependencies)
+            for commands, indexes in zip(change_commands, members):
+                if len(indexes) > 1:
+                    logger.debug(f"{commands[-1]} applies {', '.join(str(plan[index].urn) for index in indexes)}")
+        statements_by_urn: dict[URN, list[str]] = {}
+        for commands, indexes in zip(change_commands, members):
+            for index in indexes:
+                statements = statements_by_urn.setdefault(plan[index].urn, [])
+                statements.extend(sql for sql in commands if not sql.startswith("USE ROLE"))
+        if dependencies is not None and not concurrent:
+            # Run changes for the same role back to back, as far as their dependencies allow
+            order, switches_saved = schedule_changes_by_role(change_commands, dependencies)
+            change_commands = [change_commands[index] for index in order]
+            logger.debug(f"Grouping changes by role saved {switches_saved} role switches")
+        action_queue = ["USE SECONDARY ROLES ALL"] + [sql for commands in change_commands for sql in commands]
         actions_taken = []
 
-        while action_queue:
-            sql = action_queue.pop(0)
-            actions_taken.append(sql)
-            try:
-                if not self._config.dry_run:
-                    execute(session, sql)
-            except snowflake.connector.errors.ProgrammingError as err:
-                if err.errno == ALREADY_EXISTS_ERR:
-                    logger.error(f"Resource already exists: {sql}, skipping...")
-                elif err.errno == INVALID_GRANT_ERR:
-                    logger.error(f"Invalid grant: {sql}, skipping...")
-                elif err.errno == DOES_NOT_EXIST_ERR and sql.startswith("REVOKE"):
-                    logger.error(f"Resource does not exist: {sql}, skipping...")
-                elif err.errno == DOES_NOT_EXIST_ERR and sql.startswith("DROP"):
-                    logger.error(f"Resource does not exist: {sql}, skipping...")
-                else:
-                    raise err
+        setup_session = self._session_setup("apply")
+        if self._config.query_tag and not self._config.dry_run:
+            data_provider.set_query_tag(session, self._query_tag("apply"))
+
+        # Each role's statements run on a connection pinned to that role, instead of switching roles back and
+        # forth on a single session
+        pinned_roles = role_pool(session, session_factory=session_factory, on_connect=setup_session)
+        with pinned_roles as roles, governed(self._governor()), phase("apply"):
+            if concurrent and not self._config.dry_run:
+                actions_taken = action_queue
+                execute(session, action_queue[0])
+                apply_changes_concurrently(roles, change_commands, dependencies, workers=self._config.parallelism)
+            else:
+                for role, sql_commands in _sql_commands_by_role(action_queue, session_ctx["role"]):
+                    actions_taken.extend(sql_commands)
+                    if self._config.dry_run:
+                        continue
+                    _execute_sql_commands(
+                        roles.session_for_role(role),
+                        [sql for sql in sql_commands if not sql.startswith("USE ROLE")],
+                    )
+        self.statements_by_urn = statements_by_urn
+
+        state_cache = self._state_cache()
+        if state_cache and any(change_commands) and not self._config.dry_run:
+            # The snapshot describes the account as it was before these changes
+            state_cache.invalidate(session_ctx["account_locator"])
         return actions_taken
 
+    def _apply_refs(self, session_ctx: SessionContext, plan: Plan) -> Optional[set[tuple[URN, URN]]]:
+        # The manifest refs say which changes depend on each other. They only hold for a plan this blueprint
+        # made, or one whose every change is in the manifest. Otherwise, apply runs the plan as is.
+        if self._manifest is None:
+            if self._finalized:
+                return None
+            self._manifest = self.generate_manifest(session_ctx)
+        if plan is not self._planned and not all(change.urn in self._manifest for change in plan):
+            return None
+        return set(self._manifest.refs)
+
+    def _query_tag(self, phase_name: str) -> str:
+        return f"{self._config.query_tag}:{phase_name}"
+
+    def _session_setup(self, phase_name: str) -> Callable[[Any], None]:
+        # Applied to the primary session and to every connection Titan opens during the phase
+        def _setup(conn):
+            data_provider.use_secondary_roles(conn, all=True)
+            if self._config.query_tag:
+                data_provider.set_query_tag(conn, self._query_tag(phase_name))
+
+        return _setup
+
+    def _governor(self) -> Optional[ConcurrencyGovernor]:
+        # Only concurrent or rate-limited runs need governing
+        if self._config.parallelism == 1 and self._config.max_qps is None:
+            return None
+        return ConcurrencyGovernor(max_concurrency=self._config.parallelism, max_qps=self._config.max_qps)
+
+    def _state_cache(self) -> Optional[StateCache]:
+        if self._config.state_cache is None:
+            return None
+        return StateCache(
+            self._config.state_cache,
+            max_age=self._config.state_cache_max_age,
+            ttls=self._config.state_cache_ttls,
+        )
+
     def _add(self, resource: Resource):
         if self._finalized:
             raise Exception("Cannot add resources to a finalized blueprint")
@@ -1151,7 +1345,7 @@ def sql_commands_for_change(
     """
 
     before_change_cmd = []
-    change_cmd = None
+    change_cmds = []
     after_change_cmd = []
 
     execution_role, transfer_owner = execution_strategy_for_change(
@@ -1163,7 +1357,7 @@ def sql_commands_for_change(
 
     if isinstance(change, CreateResource):
 
-        change_cmd = lifecycle.create_resource(change.urn, change.after, change.resource_cls.props)
+        change_cmds = [lifecycle.create_resource(change.urn, change.after, change.resource_cls.props)]
         if transfer_owner:
             after_change_cmd.append(
                 lifecycle.transfer_resource(
@@ -1187,10 +1381,10 @@ def sql_commands_for_change(
                 )
 
             if change.urn.resource_type == ResourceType.SCANNER_PACKAGE:
-                after_change_cmd.append(lifecycle.update_resource(change.urn, {}, change.resource_cls.props))
+                after_change_cmd.extend(lifecycle.update_resource(change.urn, {}, change.resource_cls.props))
     elif isinstance(change, UpdateResource):
         props = Resource.props_for_resource_type(change.urn.resource_type, change.after)
-        change_cmd = lifecycle.update_resource(change.urn, change.delta, props)
+        change_cmds = lifecycle.update_resource(change.urn, change.delta, props, before=change.before)
     elif isinstance(change, DropResource):
         if transfer_owner:
             before_change_cmd.append(
@@ -1201,26 +1395,124 @@ def sql_commands_for_change(
                     copy_current_grants=True,
                 )
             )
-        change_cmd = lifecycle.drop_resource(
-            change.urn,
-            change.before,
-            if_exists=True,
-        )
+        change_cmds = [
+            lifecycle.drop_resource(
+                change.urn,
+                change.before,
+                if_exists=True,
+            )
+        ]
     elif isinstance(change, TransferOwnership):
-        change_cmd = lifecycle.transfer_resource(
-            change.urn,
-            owner=change.to_owner,
-            owner_resource_type=infer_role_type_from_name(change.to_owner),
-            copy_current_grants=True,
-        )
+        change_cmds = [
+            lifecycle.transfer_resource(
+                change.urn,
+                owner=change.to_owner,
+                owner_resource_type=infer_role_type_from_name(change.to_owner),
+                copy_current_grants=True,
+            )
+        ]
+
+    return before_change_cmd + change_cmds + after_change_cmd
+
+
+def _batches(statements: list[str], workers: int) -> list[list[str]]:
+    # Spread statements evenly over the workers, without exceeding the maximum batch size
+    if not statements:
+        return []
+    batch_size = min(MAX_BATCH_STATEMENTS, -(-len(statements) // workers))
+    return [statements[i : i + batch_size] for i in range(0, len(statements), batch_size)]
+
+
+def _execute_sql_command(session, sql: str) -> None:
+    try:
+        execute(session, sql)
+    except snowflake.connector.errors.ProgrammingError as err:
+        if err.errno == ALREADY_EXISTS_ERR:
+            logger.error(f"Resource already exists: {sql}, skipping...")
+        elif err.errno == INVALID_GRANT_ERR:
+            logger.error(f"Invalid grant: {sql}, skipping...")
+        elif err.errno == DOES_NOT_EXIST_ERR and sql.startswith("REVOKE"):
+            logger.error(f"Resource does not exist: {sql}, skipping...")
+        elif err.errno == DOES_NOT_EXIST_ERR and sql.startswith("DROP"):
+            logger.error(f"Resource does not exist: {sql}, skipping...")
+        else:
+            raise err
+
+
+def _execute_sql_commands(session, sql_commands: list[str]) -> None:
+    for batch in batch_sql_commands(sql_commands):
+        if len(batch) > 1:
+            try:
+                execute_batch(session, batch)
+                continue
+            except snowflake.connector.errors.ProgrammingError:
+                # Snowflake doesn't report which statement in the batch failed. Every statement but
+                # the last is safe to run twice, so replay the batch one statement at a time.
+                pass
+        for sql in batch:
+            _execute_sql_command(session, sql)
 
-    return before_change_cmd + [change_cmd] + after_change_cmd
+
+def _sql_commands_by_role(sql_commands: list[str], default_role: ResourceName) -> list[tuple[ResourceName, list[str]]]:
+    """
+    Split compiled plan SQL into runs of statements for the same role, in order. Each run starts with the
+    USE ROLE statement that selected its role, if any.
+    """
+    runs: list[tuple[ResourceName, list[str]]] = []
+    role = default_role
+    run: list[str] = []
+    for sql in sql_commands:
+        if sql.startswith("USE ROLE"):
+            next_role = ResourceName(sql.split(" ", 2)[-1])
+            if next_role != role and run:
+                runs.append((role, run))
+                run = []
+            role = next_role
+        run.append(sql)
+    if run:
+        runs.append((role, run))
+    return runs
+
+
+def _sql_command_is_replayable(sql: str) -> bool:
+    # Running these a second time leaves the account in the same state, or fails with an error apply skips.
+    # GRANT OWNERSHIP is excluded because the executing role loses the privilege to run it again.
+    if sql.startswith("GRANT OWNERSHIP"):
+        return False
+    return sql.startswith(("USE ", "GRANT ", "REVOKE ", "DROP "))
+
+
+def batch_sql_commands(sql_commands: list[str]) -> list[list[str]]:
+    """
+    Split compiled plan SQL into batches that can each be sent as one multi-statement request. Order is
+    preserved. A batch ends after any statement that isn't safe to replay, so if a batch fails it can be
+    rerun one statement at a time.
+    """
+    batches = []
+    batch: list[str] = []
+    for sql in sql_commands:
+        batch.append(sql)
+        if not _sql_command_is_replayable(sql) or len(batch) == MAX_BATCH_STATEMENTS:
+            batches.append(batch)
+            batch = []
+    if batch:
+        batches.append(batch)
+    return batches
 
 
 def compile_plan_to_sql(session_ctx: SessionContext, plan: Plan):
-    sql_commands = []
+    sql_commands = ["USE SECONDARY ROLES ALL"]
+    for commands in compile_changes_to_sql(session_ctx, plan):
+        sql_commands.extend(commands)
+    return sql_commands
+
 
-    sql_commands.append("USE SECONDARY ROLES ALL")
+def compile_changes_to_sql(session_ctx: SessionContext, plan: Plan) -> list[list[str]]:
+    """
+    The SQL commands for each change in the plan, in plan order. Each change's commands start with the
+    USE ROLE statement for the role that runs them.
+    """
+    change_commands = []
     available_roles = session_ctx["available_roles"].copy()
     default_role = session_ctx["role"]
     for change in plan:
@@ -1230,7 +1522,7 @@ def compile_plan_to_sql(session_ctx: SessionContext, plan: Plan):
             available_roles,
             default_role,
         )
-        sql_commands.extend(commands)
+        change_commands.append(commands)
 
         if isinstance(change, CreateResource):
             if change.urn.resource_type == ResourceType.ROLE:
@@ -1239,51 +1531,331 @@ def compile_plan_to_sql(session_ctx: SessionContext, plan: Plan):
                 if change.after["to_role"] in available_roles:
                     available_roles.append(ResourceName(change.after["role"]))
 
-    return sql_commands
+    return change_commands
 
 
-def topological_sort(resource_set: set[T], references: set[tuple[T, T]]) -> dict[T, int]:
-    # Kahn's algorithm
+def _role_key(role: Union[ResourceName, str]) -> tuple[str, str]:
+    return ("role", ResourceName(str(role)).normalized())
+
 
-    # Compute in-degree (# of inbound edges) for each node
-    in_degrees: dict[T, int] = {}
-    outgoing_edges: dict[T, set[T]] = {}
+def _change_access(change: ResourceChange, commands: list[str], refs: dict[URN, list[URN]]) -> list[tuple]:
+    """
+    What a change touches, as (key, mode) pairs. A change writes its own resource, and reads its containers,
+    the resources it references, and the roles it runs as or hands ownership to. Roles are keyed by name, so
+    a change that runs as a role waits for the role to be created, and for earlier grants that give it
+    privileges or make it usable. Grants to the same role commute, so they are marked as shared additions.
+    """
+    urn = change.urn
+    access: list[tuple] = [(urn, "write")]
+    container = urn
+    while isinstance(RESOURCE_SCOPES[container.resource_type], (DatabaseScope, SchemaScope)):
+        container = _container_urn(container)
+        access.append((container, "read"))
+    for ref in refs.get(urn, []):
+        access.append((ref, "read"))
+
+    # Every change's commands start with USE ROLE
+    access.append((_role_key(commands[0].split(" ", 2)[-1]), "read"))
+    if isinstance(change, TransferOwnership):
+        data = {"owner": change.to_owner}
+    else:
+        data = change.before if isinstance(change, DropResource) else change.after
+    if data.get("owner"):
+        access.append((_role_key(data["owner"]), "read"))
+
+    if urn.resource_type == ResourceType.ROLE:
+        access.append((_role_key(urn.fqn.name), "write"))
+    elif urn.resource_type == ResourceType.ROLE_GRANT:
+        access.append((_role_key(data["role"]), "add"))
+        if data.get("to_role"):
+            access.append((_role_key(data["to_role"]), "add"))
+    elif resource_type_is_grant(urn.resource_type) and data.get("to"):
+        access.append((_role_key(data["to"]), "add"))
+    return access
+
+
+def change_dependencies(plan: Plan, change_commands: list[list[str]], refs: set[tuple[URN, URN]]) -> list[set[int]]:
+    """
+    For each change in the plan, the indexes of the earlier changes that must finish before it starts.
+    Changes that touch the same key keep their plan order, unless they only read it or only add to it.
+    """
+    refs_by_urn: dict[URN, list[URN]] = {}
+    for urn, ref in refs:
+        refs_by_urn.setdefault(urn, []).append(ref)
+
+    # key => (mode of the latest group of changes, that group, the group before it)
+    groups: dict[Any, tuple[str, list[int], list[int]]] = {}
+    dependencies: list[set[int]] = []
+    for index, (change, commands) in enumerate(zip(plan, change_commands)):
+        depends_on: set[int] = set()
+        for key, mode in _change_access(change, commands, refs_by_urn):
+            if key not in groups:
+                groups[key] = (mode, [index], [])
+                continue
+            group_mode, group, previous = groups[key]
+            if mode == group_mode and mode != "write":
+                depends_on.update(previous)
+                if group[-1] != index:
+                    group.append(index)
+            elif group != [index]:
+                depends_on.update(group)
+                groups[key] = (mode, [index], group)
+        depends_on.discard(index)
+        dependencies.append(depends_on)
+    return dependencies
+
+
+def _apply_change(roles: RolePool, commands: list[str]) -> None:
+    # A change's commands run in order on the connection for its role
+    role = ResourceName(commands[0].split(" ", 2)[-1])
+    _execute_sql_commands(roles.session_for_role(role), commands[1:])
+
+
+def _grant_coalescing_key(change: ResourceChange, commands: list[str]) -> Optional[tuple]:
+    # Grants and revokes of privileges on the same object, to the same grantee, run by the same role
+    if change.urn.resource_type != ResourceType.GRANT or len(commands) != 2:
+        return None
+    if isinstance(change, CreateResource):
+        data = change.after
+        verb = "GRANT"
+    elif isinstance(change, DropResource):
+        data = change.before
+        verb = "REVOKE"
+    else:
+        return None
+    if data["priv"] in ("ALL", "OWNERSHIP"):
+        return None
+    return (verb, commands[0], data["on_type"], data["on"], data.get("to_type"), data["to"], data["grant_option"])
+
+
+def coalesce_grant_changes(
+    plan: Plan, change_commands: list[list[str]], dependencies: list[set[int]]
+) -> tuple[list[list[str]], list[set[int]], list[list[int]]]:
+    """
+    Merge grants that share an object, grantee, execution role and grant option into one
+    `GRANT a, b, c ON ...`, and likewise for revokes. Only changes at the same depth of the dependency graph
+    are merged, so none of them depends on another and merging them can't create a cycle.
+
+    Returns the commands and dependencies of each merged unit, and the indexes of the plan changes it runs.
+    """
+    depth: list[int] = []
+    for depends_on in dependencies:
+        depth.append(1 + max((depth[dependency] for dependency in depends_on), default=0))
+
+    unit_of: list[int] = []
+    members: list[list[int]] = []
+    units_by_key: dict[tuple, int] = {}
+    for index, (change, commands) in enumerate(zip(plan, change_commands)):
+        key = _grant_coalescing_key(change, commands)
+        if key is not None and (depth[index],) + key in units_by_key:
+            unit = units_by_key[(depth[index],) + key]
+            members[unit].append(index)
+        else:
+            unit = len(members)
+            members.append([index])
+            if key is not None:
+                units_by_key[(depth[index],) + key] = unit
+        unit_of.append(unit)
+
+    unit_commands = []
+    unit_dependencies = []
+    for indexes in members:
+        first = indexes[0]
+        commands = change_commands[first]
+        if len(indexes) > 1:
+            change = plan[first]
+            privs = ", ".join(sorted(_change_data(plan[index])["priv"] for index in indexes))
+            if isinstance(change, CreateResource):
+                sql = lifecycle.create_grant(change.urn, {**change.after, "priv": privs}, None, False)
+            else:
+                sql = lifecycle.drop_grant(change.urn, {**change.before, "priv": privs})
+            commands = [commands[0], sql]
+        unit_commands.append(commands)
+        unit = unit_of[first]
+        unit_dependencies.append(
+            {unit_of[dependency] for index in indexes for dependency in dependencies[index]} - {unit}
+        )
+    return unit_commands, unit_dependencies, members
 
-    for node in resource_set:
-        in_degrees[node] = 0
-        outgoing_edges[node] = set()
 
+def _change_data(change: ResourceChange) -> dict:
+    return change.before if isinstance(change, DropResource) else change.after
+
+
+def _dependents(dependencies: list[set[int]]) -> list[list[int]]:
+    dependents: list[list[int]] = [[] for _ in dependencies]
+    for index, depends_on in enumerate(dependencies):
+        for dependency in depends_on:
+            dependents[dependency].append(index)
+    return dependents
+
+
+def _role_switches(roles: list[str]) -> int:
+    return sum(1 for previous, role in zip(roles, roles[1:]) if role != previous)
+
+
+def schedule_changes_by_role(change_commands: list[list[str]], dependencies: list[set[int]]) -> tuple[list[int], int]:
+    """
+    Order changes so that changes run by the same role are next to each other, without moving a change ahead
+    of one it depends on. Changes for the current role run while any are ready, then the schedule switches to
+    the role of the earliest ready change. Returns the order, as indexes into the plan, and how many role
+    switches it saves over running the plan in order.
+    """
+    roles = [ResourceName(commands[0].split(" ", 2)[-1]).normalized() for commands in change_commands]
+    waiting = [len(depends_on) for depends_on in dependencies]
+    dependents = _dependents(dependencies)
+    ready: dict[str, list[int]] = {}
+    for index, count in enumerate(waiting):
+        if count == 0:
+            heapq.heappush(ready.setdefault(roles[index], []), index)
+
+    order: list[int] = []
+    role = roles[0] if roles else None
+    while len(order) < len(change_commands):
+        if not ready.get(role):
+            role = min((heap[0], role) for role, heap in ready.items() if heap)[1]
+        index = heapq.heappop(ready[role])
+        order.append(index)
+        for dependent in dependents[index]:
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                heapq.heappush(ready.setdefault(roles[dependent], []), dependent)
+    return order, _role_switches(roles) - _role_switches([roles[index] for index in order])
+
+
+def apply_changes_concurrently(
+    roles: RolePool, change_commands: list[list[str]], dependencies: list[set[int]], workers: int
+) -> None:
+    """
+    Run each change's commands as soon as the changes it depends on have finished, up to `workers` at a
+    time. After a change fails, no new changes are started, and the first error is raised once the changes
+    already running have finished.
+    """
+    waiting = [len(depends_on) for depends_on in dependencies]
+    dependents = _dependents(dependencies)
+    ready = deque(index for index, count in enumerate(waiting) if count == 0)
+    running: dict[Future, int] = {}
+    error: Optional[BaseException] = None
+    apply_change = in_current_phase(_apply_change)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while running or (ready and error is None):
+            while ready and error is None and len(running) < workers:
+                index = ready.popleft()
+                running[executor.submit(apply_change, roles, change_commands[index])] = index
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                for dependent in dependents[index]:
+                    waiting[dependent] -= 1
+                    if waiting[dependent] == 0:
+                        ready.append(dependent)
+    if error is not None:
+        raise error
+
+
+@dataclass
+class TopologicalLevels(Generic[T]):
+    """
+    A DAG partitioned into levels. Every node's references are in earlier levels, so the nodes of a level can
+    be processed concurrently once the levels before it are done.
+    """
+
+    levels: list[list[T]]
+
+    def __iter__(self) -> Iterator[list[T]]:
+        return iter(self.levels)
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    @property
+    def sizes(self) -> list[int]:
+        return [len(level) for level in self.levels]
+
+    @property
+    def critical_path_length(self) -> int:
+        # The longest chain of references, counted in nodes
+        return len(self.levels)
+
+
+def topological_levels(resource_set: Iterable[T], references: Iterable[tuple[T, T]]) -> TopologicalLevels[T]:
+    """
+    Kahn's algorithm, one level at a time. `references` holds (node, ref) pairs, where `node` has to come after
+    `ref`. Edges are kept in flat integer arrays rather than a set per node, so memory grows with the number of
+    edges and nothing else. Nodes are ordered by their string form within a level, so the result doesn't
+    depend on hash randomization.
+    """
+    nodes = sorted(resource_set, key=str)
+    ids = {node: index for index, node in enumerate(nodes)}
+    sources = array("q")
+    targets = array("q")
     for node, ref in references:
-        in_degrees[ref] += 1
-        outgoing_edges[node].add(ref)
-
-    # Put all nodes with 0 in-degree in a queue
-    queue: Queue = Queue()
-    for node, in_degree in in_degrees.items():
-        if in_degree == 0:
-            queue.put(node)
-
-    # Create an empty node list
-    nodes = []
-
-    while not queue.empty():
-        node = queue.get()
-        nodes.append(node)
-
-        # For each of node's outgoing edges
-        empty_neighbors = set()
-        for edge in outgoing_edges[node]:
-            in_degrees[edge] -= 1
-            if in_degrees[edge] == 0:
-                queue.put(edge)
-                empty_neighbors.add(edge)
-
-        # Remove edges to empty neighbors
-        outgoing_edges[node].difference_update(empty_neighbors)
-    nodes.reverse()
-    if len(nodes) != len(resource_set):
-        raise NotADAGException("Graph is not a DAG")
-    return {value: index for index, value in enumerate(nodes)}
+        sources.append(ids[node])
+        targets.append(ids[ref])
+
+    # For each node, the number of references not yet processed, and the nodes that reference it as a
+    # slice of `dependents` starting at `offsets[node]`
+    pending = array("q", bytes(8 * len(nodes)))
+    offsets = array("q", bytes(8 * (len(nodes) + 1)))
+    for source, target in zip(sources, targets):
+        pending[source] += 1
+        offsets[target + 1] += 1
+    for index in range(len(nodes)):
+        offsets[index + 1] += offsets[index]
+    dependents = array("q", bytes(8 * len(sources)))
+    fill = offsets[:-1]
+    for source, target in zip(sources, targets):
+        dependents[fill[target]] = source
+        fill[target] += 1
+
+    levels = []
+    processed = 0
+    level = [index for index in range(len(nodes)) if pending[index] == 0]
+    while level:
+        levels.append([nodes[index] for index in level])
+        processed += len(level)
+        next_level = []
+        for index in level:
+            for dependent in dependents[offsets[index] : offsets[index + 1]]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    next_level.append(dependent)
+        level = sorted(next_level)
+
+    if processed != len(nodes):
+        cycle = [nodes[index] for index in _find_cycle(sources, targets, pending)]
+        raise NotADAGException(f"Graph is not a DAG, found a cycle: {' -> '.join(map(str, cycle))}", cycle=cycle)
+    return TopologicalLevels(levels)
+
+
+def _find_cycle(sources: array, targets: array, pending: array) -> list[int]:
+    # Every node left unprocessed references another unprocessed node, so following those references from
+    # any of them has to come back around
+    refs: dict[int, int] = {}
+    for source, target in zip(sources, targets):
+        if pending[source] and pending[target]:
+            refs.setdefault(source, target)
+    node = min(refs)
+    path: list[int] = []
+    seen: dict[int, int] = {}
+    while node not in seen:
+        seen[node] = len(path)
+        path.append(node)
+        node = refs[node]
+    return path[seen[node] :] + [node]
+
+
+def topological_sort(resource_set: set[T], references: set[tuple[T, T]]) -> dict[T, int]:
+    index = 0
+    sort_order = {}
+    for level in topological_levels(resource_set, references):
+        for node in level:
+            sort_order[node] = index
+            index += 1
+    return sort_order
 
 
 def diff(remote_state: State, manifest: Manifest):
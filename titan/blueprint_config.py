@@ -5,6 +5,7 @@ from .enums import BlueprintScope, ResourceType, RunMode
 from .exceptions import InvalidResourceException, MissingVarException
 from .resource_name import ResourceName
 from .resources.resource import Resource
+from .state_cache import DEFAULT_MAX_AGE
 
 _VAR_TYPE_MAP = {
     "bool": bool,
@@ -30,6 +31,13 @@ class BlueprintConfig:
     scope: Optional[BlueprintScope] = None
     database: Optional[ResourceName] = None
     schema: Optional[ResourceName] = None
+    parallelism: int = 1
+    max_qps: Optional[float] = None
+    query_tag: Optional[str] = None
+    state_cache: Optional[str] = None
+    state_cache_max_age: int = DEFAULT_MAX_AGE
+    state_cache_ttls: dict[ResourceType, int] = field(default_factory=dict)
+    incremental: bool = False
 
     def __post_init__(self):
 
@@ -42,6 +50,25 @@ class BlueprintConfig:
         if self.vars_spec is None:
             raise ValueError("vars_spec must be provided")
 
+        if not isinstance(self.parallelism, int) or self.parallelism < 1:
+            raise ValueError(f"parallelism must be a positive integer, got: {self.parallelism=}")
+
+        if self.max_qps is not None and (not isinstance(self.max_qps, (int, float)) or self.max_qps <= 0):
+            raise ValueError(f"max_qps must be a positive number, got: {self.max_qps=}")
+
+        if self.query_tag is not None and (not isinstance(self.query_tag, str) or not self.query_tag):
+            raise ValueError(f"query_tag must be a non-empty string, got: {self.query_tag=}")
+
+        if not isinstance(self.state_cache_max_age, int) or self.state_cache_max_age < 0:
+            raise ValueError(f"state_cache_max_age must be a non-negative integer, got: {self.state_cache_max_age=}")
+
+        if self.incremental and self.state_cache is None:
+            raise ValueError("Incremental refresh requires a state_cache")
+
+        for resource_type, ttl in self.state_cache_ttls.items():
+            if not isinstance(resource_type, ResourceType) or not isinstance(ttl, int) or ttl < 0:
+                raise ValueError(f"Invalid state_cache_ttls entry: {resource_type}={ttl}")
+
         if not isinstance(self.run_mode, RunMode):
             raise ValueError(f"Invalid run_mode: {self.run_mode}")
 
@@ -121,4 +148,9 @@ def print_blueprint_config(config: BlueprintConfig):
     print(f"{config.run_mode=}")
     print(f"{config.dry_run=}")
     print(f"{config.allowlist=}")
+    print(f"{config.parallelism=}")
+    print(f"{config.max_qps=}")
+    print(f"{config.query_tag=}")
+    print(f"{config.state_cache=}")
+    print(f"{config.incremental=}")
     print(f"config.vars={list(config.vars.keys())}")
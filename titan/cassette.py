@@ -0,0 +1,282 @@
+import gzip
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional, Union
+
+from snowflake.connector import errors
+from snowflake.connector.connection import SnowflakeConnection
+
+from .client import SessionFactory, compact_result
+
+logger = logging.getLogger("titan")
+
+CASSETTE_VERSION = 1
+
+
+@dataclass(frozen=True)
+class RecordedError:
+    error_class: str
+    errno: Optional[int]
+    msg: Optional[str]
+    sqlstate: Optional[str]
+
+    @classmethod
+    def from_error(cls, err: errors.Error) -> "RecordedError":
+        return cls(type(err).__name__, err.errno, err.raw_msg, err.sqlstate)
+
+    def to_error(self) -> errors.Error:
+        error_cls = getattr(errors, self.error_class, None)
+        if not (isinstance(error_cls, type) and issubclass(error_cls, errors.Error)):
+            error_cls = errors.ProgrammingError
+        return error_cls(msg=self.msg, errno=self.errno, sqlstate=self.sqlstate)
+
+
+# The result sets of one request, one per statement, or the error it raised
+Response = Union[list[list], RecordedError]
+
+
+class CassetteMissError(Exception):
+    pass
+
+
+class Cassette:
+    """
+    Query results recorded from a live Snowflake account, keyed by role and SQL text.
+
+    Statements sent in a multi-statement request are recorded one by one, so a replay may batch them
+    differently. A request that fails is recorded as a whole, since Snowflake doesn't report which of its
+    statements failed. When the same statement was recorded several times, replays serve the responses in
+    the order they were recorded and repeat the last one.
+    """
+
+    def __init__(
+        self,
+        responses: Optional[dict[tuple[str, str], list[Response]]] = None,
+        role: Optional[str] = None,
+        user: Optional[str] = None,
+    ):
+        self.responses: dict[tuple[str, str], list[Response]] = responses or {}
+        # The role and user of the first session recorded, which replays start out as
+        self.role = role
+        self.user = user
+        self._served: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, role: str, sql: str, response: Response) -> None:
+        if not isinstance(response, RecordedError):
+            response = [compact_result(result) for result in response]
+        with self._lock:
+            self.responses.setdefault((role, sql), []).append(response)
+
+    def replay(self, role: str, sql: str) -> Response:
+        key = (role, sql)
+        with self._lock:
+            responses = self.responses.get(key)
+            if not responses:
+                raise CassetteMissError(f"No recorded response for [{role}] {sql}")
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            return responses[min(served, len(responses) - 1)]
+
+    def rewind(self) -> None:
+        with self._lock:
+            self._served = {}
+
+    def __contains__(self, key: tuple[str, str]) -> bool:
+        return key in self.responses
+
+    def __len__(self) -> int:
+        return len(self.responses)
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                cassette = {
+                    "version": CASSETTE_VERSION,
+                    "role": self.role,
+                    "user": self.user,
+                    "responses": self.responses,
+                }
+                pickle.dump(cassette, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        with gzip.open(path, "rb") as f:
+            cassette = pickle.load(f)
+        if not isinstance(cassette, dict) or cassette.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette: {path}")
+        return cls(cassette["responses"], role=cassette["role"], user=cassette["user"])
+
+
+def _split_request(sql: str, num_statements: Optional[int]) -> list[str]:
+    # titan.client.execute_batch joins statements with ";\n"
+    if not num_statements:
+        return [sql]
+    statements = sql.split(";\n")
+    return statements if len(statements) == num_statements else [sql]
+
+
+class _BufferedCursor:
+    def __init__(self, session):
+        self.session = session
+        self.sfqid = None
+        self._results: list[list] = []
+
+    def nextset(self):
+        self._results.pop(0)
+        return self if self._results else None
+
+    def fetchall(self) -> list:
+        rows, self._results[0] = self._results[0], []
+        return rows
+
+    def fetchmany(self, size: int) -> list:
+        rows, self._results[0] = self._results[0][:size], self._results[0][size:]
+        return rows
+
+    def close(self) -> None:
+        self._results = []
+
+
+class _RecordingCursor(_BufferedCursor):
+    def __init__(self, session: "RecordingSession", cursor):
+        super().__init__(session)
+        self._cursor = cursor
+
+    def execute(self, sql: str, num_statements: Optional[int] = None):
+        role = self.session.role
+        try:
+            if num_statements:
+                self._cursor.execute(sql, num_statements=num_statements)
+            else:
+                self._cursor.execute(sql)
+            results = [self._cursor.fetchall()]
+            for _ in range(1, num_statements or 1):
+                self._cursor.nextset()
+                results.append(self._cursor.fetchall())
+        except errors.Error as err:
+            self.session.cassette.record(role, sql, RecordedError.from_error(err))
+            raise
+        finally:
+            self.sfqid = self._cursor.sfqid
+        statements = _split_request(sql, num_statements)
+        if len(statements) == len(results):
+            for statement, result in zip(statements, results):
+                self.session.cassette.record(role, statement, [result])
+        else:
+            self.session.cassette.record(role, sql, results)
+        self._results = results
+        return self
+
+    def close(self) -> None:
+        super().close()
+        self._cursor.close()
+
+
+class _ReplayCursor(_BufferedCursor):
+    def execute(self, sql: str, num_statements: Optional[int] = None):
+        cassette = self.session.cassette
+        role = self.session.role
+        if num_statements and (role, sql) in cassette:
+            statements = [sql]
+        else:
+            statements = _split_request(sql, num_statements)
+        results = []
+        for statement in statements:
+            response = cassette.replay(role, statement)
+            if isinstance(response, RecordedError):
+                raise response.to_error()
+            # Hand out fresh dicts, as DictCursor does, so callers can't alter the cassette
+            results.extend([dict(row) for row in result] for result in response)
+            if statement.startswith("USE ROLE"):
+                self.session.role = statement.split(" ", 2)[-1]
+        self._results = results
+        return self
+
+
+class RecordingSession:
+    """
+    Wraps a SnowflakeConnection and records every query run on it into `cassette`.
+
+    Results are fetched in full when a query runs, so streamed queries are held in memory while recording.
+    """
+
+    def __init__(self, session: SnowflakeConnection, cassette: Cassette):
+        self._session = session
+        self.cassette = cassette
+        if cassette.role is None:
+            cassette.role = session.role
+            cassette.user = session.user
+
+    def cursor(self, *args) -> _RecordingCursor:
+        return _RecordingCursor(self, self._session.cursor(*args))
+
+    def session_factory(self, session_factory: SessionFactory) -> SessionFactory:
+        """
+        Wrap a blueprint's `session_factory` so the connections it opens are recorded too.
+        """
+        return lambda: RecordingSession(session_factory(), self.cassette)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._session, name)
+
+
+class ReplaySession:
+    """
+    Stands in for a SnowflakeConnection and serves the responses recorded in `cassette`, eg. to benchmark
+    a plan offline. Queries that weren't recorded raise `CassetteMissError`.
+    """
+
+    def __init__(self, cassette: Cassette, role: Optional[str] = None, user: Optional[str] = None):
+        if role is None and cassette.role is None:
+            raise ValueError("A role is required to replay a cassette that hasn't recorded one")
+        self.cassette = cassette
+        self.role = role or cassette.role
+        self._initial_role = self.role
+        self.user = user or cassette.user or "TITAN"
+        self.closed = False
+
+    def cursor(self, *args) -> _ReplayCursor:
+        return _ReplayCursor(self)
+
+    def close(self) -> None:
+        self.closed = True
+
+    def session_factory(self) -> "ReplaySession":
+        """
+        Open another replay session on the same cassette, for use as a blueprint's `session_factory`. Like a
+        new connection, it starts out as the role this session started out as.
+        """
+        return ReplaySession(self.cassette, role=self._initial_role, user=self.user)
+
+
+@contextmanager
+def record_session(session: SnowflakeConnection, path: str) -> Iterator[RecordingSession]:
+    """
+    Record every query run on the yielded session, then write them to a cassette at `path`. Responses
+    already in the cassette at `path` are kept.
+    """
+    cassette = Cassette.load(path) if os.path.exists(path) else Cassette()
+    try:
+        yield RecordingSession(session, cassette)
+    finally:
+        cassette.save(path)
+        logger.debug(f"Recorded {len(cassette)} queries to {path}")
+
+
+def replay_session(path: str, role: Optional[str] = None, user: Optional[str] = None) -> ReplaySession:
+    """
+    Open a session that replays the cassette at `path`, starting out as the role it was recorded with.
+    """
+    return ReplaySession(Cassette.load(path), role=role, user=user)
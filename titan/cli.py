@@ -1,4 +1,5 @@
 import json
+from contextlib import nullcontext
 from typing import Any
 
 import click
@@ -13,6 +14,7 @@ from titan.gitops import (
     merge_vars,
     parse_resources,
 )
+from titan.metrics import collect_metrics
 from titan.operations.blueprint import blueprint_apply, blueprint_apply_plan, blueprint_plan
 from titan.operations.connector import connect, get_env_vars
 from titan.operations.export import export_resources
@@ -121,6 +123,74 @@ def database_option():
     )
 
 
+def parallelism_option():
+    return click.option(
+        "--parallelism",
+        type=click.IntRange(min=1),
+        help="Number of Snowflake connections used to fetch remote state concurrently",
+        metavar="<n>",
+    )
+
+
+def max_qps_option():
+    return click.option(
+        "--max-qps",
+        type=click.FloatRange(min=0, min_open=True),
+        help="Maximum number of queries Titan starts per second, across all connections",
+        metavar="<n>",
+    )
+
+
+def query_tag_option():
+    return click.option(
+        "--query-tag",
+        type=str,
+        help="Set QUERY_TAG on Titan's Snowflake sessions, suffixed with the phase, eg. titan:plan",
+        metavar="<tag>",
+    )
+
+
+def metrics_option():
+    return click.option(
+        "--metrics",
+        "metrics_file",
+        type=click.Path(dir_okay=False),
+        help="Write per-query timings, row counts and cache hits to a JSON file",
+        metavar="<filename>",
+    )
+
+
+def write_metrics(metrics_file, registry):
+    with open(metrics_file, "w") as f:
+        f.write(json.dumps(registry.to_dict(), indent=2))
+
+
+def state_cache_option():
+    return click.option(
+        "--state-cache",
+        type=click.Path(file_okay=False),
+        help="Directory to cache remote state in between runs",
+        metavar="<dir>",
+    )
+
+
+def max_age_option():
+    return click.option(
+        "--max-age",
+        type=str,
+        help="How long cached remote state stays fresh, eg. 90s, 10m, 1h. Requires --state-cache",
+        metavar="<duration>",
+    )
+
+
+def incremental_option():
+    return click.option(
+        "--incremental",
+        is_flag=True,
+        help="Only describe tables, views and schemas that changed since the last run. Requires --state-cache",
+    )
+
+
 def schema_option():
     return click.option(
         "--schema",
@@ -140,7 +210,31 @@ def schema_option():
 @scope_option()
 @database_option()
 @schema_option()
-def plan(config_path, json_output, output_file, vars: dict, allowlist, run_mode, scope, database, schema):
+@parallelism_option()
+@max_qps_option()
+@query_tag_option()
+@state_cache_option()
+@max_age_option()
+@incremental_option()
+@metrics_option()
+def plan(
+    config_path,
+    json_output,
+    output_file,
+    vars: dict,
+    allowlist,
+    run_mode,
+    scope,
+    database,
+    schema,
+    parallelism,
+    max_qps,
+    query_tag,
+    state_cache,
+    max_age,
+    incremental,
+    metrics_file,
+):
     """Compare a resource config to the current state of Snowflake"""
 
     if not config_path:
@@ -164,12 +258,33 @@ def plan(config_path, json_output, output_file, vars: dict, allowlist, run_mode,
         cli_config["database"] = database
     if schema:
         cli_config["schema"] = schema
+    if parallelism:
+        cli_config["parallelism"] = parallelism
+    if max_qps:
+        cli_config["max_qps"] = max_qps
+    if query_tag:
+        cli_config["query_tag"] = query_tag
+    if max_age and not state_cache:
+        raise click.UsageError("--max-age requires --state-cache")
+    if incremental and not state_cache:
+        raise click.UsageError("--incremental requires --state-cache")
+    if incremental:
+        cli_config["incremental"] = incremental
+    if state_cache:
+        cli_config["state_cache"] = state_cache
+    if max_age:
+        cli_config["state_cache_max_age"] = max_age
 
     env_vars = collect_vars_from_environment()
     if env_vars:
         cli_config["vars"] = merge_vars(cli_config.get("vars", {}), env_vars)
 
-    plan_obj = blueprint_plan(yaml_config, cli_config)
+    with collect_metrics() if metrics_file else nullcontext() as registry:
+        try:
+            plan_obj = blueprint_plan(yaml_config, cli_config)
+        finally:
+            if registry:
+                write_metrics(metrics_file, registry)
     if output_file:
         with open(output_file, "w") as f:
             f.write(dump_plan(plan_obj, format="json"))
@@ -191,8 +306,32 @@ def plan(config_path, json_output, output_file, vars: dict, allowlist, run_mode,
 @scope_option()
 @database_option()
 @schema_option()
+@parallelism_option()
+@max_qps_option()
+@query_tag_option()
+@state_cache_option()
+@max_age_option()
+@incremental_option()
+@metrics_option()
 @click.option("--dry-run", is_flag=True, help="When dry run is true, Titan will not make any changes to Snowflake")
-def apply(config_path, plan_file, vars, allowlist, run_mode, scope, database, schema, dry_run):
+def apply(
+    config_path,
+    plan_file,
+    vars,
+    allowlist,
+    run_mode,
+    scope,
+    database,
+    schema,
+    parallelism,
+    max_qps,
+    query_tag,
+    state_cache,
+    max_age,
+    incremental,
+    metrics_file,
+    dry_run,
+):
     """Apply a resource config to a Snowflake account"""
 
     if config_path and plan_file:
@@ -215,22 +354,43 @@ def apply(config_path, plan_file, vars, allowlist, run_mode, scope, database, sc
         cli_config["database"] = database
     if schema:
         cli_config["schema"] = schema
+    if parallelism:
+        cli_config["parallelism"] = parallelism
+    if max_qps:
+        cli_config["max_qps"] = max_qps
+    if query_tag:
+        cli_config["query_tag"] = query_tag
+    if max_age and not state_cache:
+        raise click.UsageError("--max-age requires --state-cache")
+    if incremental and not state_cache:
+        raise click.UsageError("--incremental requires --state-cache")
+    if incremental:
+        cli_config["incremental"] = incremental
+    if state_cache:
+        cli_config["state_cache"] = state_cache
+    if max_age:
+        cli_config["state_cache_max_age"] = max_age
 
     env_vars = collect_vars_from_environment()
     if env_vars:
         cli_config["vars"] = merge_vars(cli_config.get("vars", {}), env_vars)
 
-    if config_path:
-        yaml_config: dict[str, Any] = {}
-        configs = collect_configs_from_path(config_path)
-        for config in configs:
-            yaml_config = merge_configs(yaml_config, config[1])
-        blueprint_apply(yaml_config, cli_config)
-    elif plan_file:
-        plan_obj = load_plan(plan_file)
-        blueprint_apply_plan(plan_obj, cli_config)
-    else:
-        raise Exception("No config or plan file specified")
+    with collect_metrics() if metrics_file else nullcontext() as registry:
+        try:
+            if config_path:
+                yaml_config: dict[str, Any] = {}
+                configs = collect_configs_from_path(config_path)
+                for config in configs:
+                    yaml_config = merge_configs(yaml_config, config[1])
+                blueprint_apply(yaml_config, cli_config)
+            elif plan_file:
+                plan_obj = load_plan(plan_file)
+                blueprint_apply_plan(plan_obj, cli_config)
+            else:
+                raise Exception("No config or plan file specified")
+        finally:
+            if registry:
+                write_metrics(metrics_file, registry)
 
 
 @titan_cli.command("export", context_settings={"show_default": True}, no_args_is_help=True)
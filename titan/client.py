@@ -1,14 +1,31 @@
 import logging
 import os
+import threading
 import time
 
-from typing import Optional, Union
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from queue import Queue
+from typing import Any, Callable, Hashable, Iterable, Iterator, Optional, TypeVar, Union
 
 import snowflake.connector
 
 from snowflake.connector.cursor import SnowflakeCursor
 from snowflake.connector.connection import SnowflakeConnection
-from snowflake.connector.errors import ProgrammingError
+from snowflake.connector.errors import (
+    GatewayTimeoutError,
+    OtherHTTPRetryableError,
+    ProgrammingError,
+    RequestExceedMaxRetryError,
+    RequestTimeoutError,
+    ServiceUnavailableError,
+    TooManyRequests,
+)
+
+from .metrics import in_current_phase, metrics_enabled, query_template, record_query
+from .resource_name import ResourceName, resource_name_from_snowflake_metadata
 
 logger = logging.getLogger("titan")
 
@@ -22,6 +39,13 @@ ACCESS_CONTROL_ERR = 3001
 ALREADY_EXISTS_ERR = 3041  # Not sure this is correct
 INVALID_GRANT_ERR = 3042
 FEATURE_NOT_ENABLED_ERR = 3078  # Unsure if this is just Replication Groups or not
+STATEMENT_TIMEOUT_ERR = 630
+NO_ACTIVE_WAREHOUSE_ERR = 606
+
+MAX_BATCH_STATEMENTS = 50
+
+# Rows fetched per round trip when streaming a result
+STREAM_BATCH_SIZE = 10_000
 
 connection_params = {
     "account": os.environ.get("SNOWFLAKE_ACCOUNT"),
@@ -29,12 +53,344 @@ connection_params = {
     "password": os.environ.get("SNOWFLAKE_PASSWORD"),
 }
 
-_EXECUTION_CACHE = {}
+# Maximum number of result rows held by the execution cache before the least recently used results are evicted
+DEFAULT_CACHE_MAX_ROWS = 2_000_000
+
+T = TypeVar("T")
+R = TypeVar("R")
+SessionFactory = Callable[[], SnowflakeConnection]
+
+
+class Row(Mapping):
+    """
+    A read-only row of a compacted result. Rows of the same result share one column map and store their
+    values in a tuple, instead of each repeating the column names as dict keys. Supports the same lookups
+    as the dicts returned by DictCursor.
+    """
+
+    __slots__ = ("_columns", "_values")
+
+    def __init__(self, columns: dict[str, int], values: tuple):
+        self._columns = columns
+        self._values = values
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._columns[key]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns)
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def copy(self) -> dict:
+        return dict(self)
+
+
+def compact_result(result: list) -> list:
+    """
+    Convert a list of dict rows into `Row`s. Consecutive rows with the same columns share a column map.
+    """
+    if not result or not isinstance(result[0], dict):
+        return result
+    columns: dict[str, int] = {}
+    rows: list = []
+    for row in result:
+        if row.keys() != columns.keys():
+            columns = {column: position for position, column in enumerate(row)}
+        rows.append(Row(columns, tuple(row.values())))
+    return rows
+
+
+class ExecutionCache:
+    """
+    A thread-safe LRU cache of query results, keyed by role and SQL text.
+
+    The cache holds at most `max_rows` result rows in total (unbounded if None). Once that budget is
+    exceeded, the least recently used results are evicted along with any indexes built over them. The newest
+    result is never evicted, so a result larger than the whole budget is kept on its own until the next one
+    is cached. Cached results are stored compactly, see `Row`.
+    """
+
+    def __init__(self, max_rows: Optional[int] = DEFAULT_CACHE_MAX_ROWS):
+        self.max_rows = max_rows
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[tuple[str, str], list] = OrderedDict()
+        # Indexes over cached results, keyed by the result's cache key and then index name
+        self._indexes: dict[tuple[str, str], dict[Hashable, dict]] = {}
+        self._keys_by_id: dict[int, tuple[str, str]] = {}
+        # Maps (SHOW noun, database, schema) to the SHOW statement prefetched for that container, so the plan
+        # of what was prefetched is dropped along with the results
+        self.prefetched: dict[tuple[str, Optional[str], Optional[str]], str] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, role: str, sql_text: str) -> Optional[list]:
+        key = (role, sql_text)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, role: str, sql_text: str, result: list, replace: bool = True) -> list:
+        """
+        Cache a result and return the cached copy, which callers should use in place of `result`.
+        """
+        key = (role, sql_text)
+        with self._lock:
+            if key in self._entries:
+                if not replace:
+                    return self._entries[key]
+                self._remove(key)
+        result = compact_result(result)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = result
+            self._keys_by_id[id(result)] = key
+            self.rows += len(result)
+            while self.max_rows is not None and self.rows > self.max_rows and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return result
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        result = self._entries.pop(key)
+        self.rows -= len(result)
+        self._indexes.pop(key, None)
+        if self._keys_by_id.get(id(result)) == key:
+            del self._keys_by_id[id(result)]
+
+    def index(self, result: list, index_name: Hashable, build: Callable[[list], dict]) -> dict:
+        """
+        Return the index named `index_name` over a cached result, building it with `build` on first use.
+        Results that aren't cached are indexed every time.
+        """
+        with self._lock:
+            key = self._keys_by_id.get(id(result))
+            if key is None or self._entries.get(key) is not result:
+                key = None
+            else:
+                index = self._indexes.get(key, {}).get(index_name)
+                if index is not None:
+                    return index
+        index = build(result)
+        if key is not None:
+            with self._lock:
+                if self._entries.get(key) is result:
+                    index = self._indexes.setdefault(key, {}).setdefault(index_name, index)
+        return index
+
+    def snapshot(self) -> dict[str, dict[str, list]]:
+        with self._lock:
+            snapshot: dict[str, dict[str, list]] = {}
+            for (role, sql_text), result in self._entries.items():
+                snapshot.setdefault(role, {})[sql_text] = result
+            return snapshot
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "rows": self.rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
 
+_EXECUTION_CACHE = ExecutionCache()
 
-def reset_cache():
+
+def reset_cache(max_rows: Optional[int] = DEFAULT_CACHE_MAX_ROWS):
     global _EXECUTION_CACHE
-    _EXECUTION_CACHE = {}
+    _EXECUTION_CACHE = ExecutionCache(max_rows)
+
+
+def cache_snapshot() -> dict[str, dict[str, list]]:
+    """
+    Return a copy of the execution cache, keyed by role and then SQL text.
+    """
+    return _EXECUTION_CACHE.snapshot()
+
+
+def cache_stats() -> dict[str, int]:
+    """
+    Return the execution cache's size and its hit, miss and eviction counters.
+    """
+    return _EXECUTION_CACHE.stats()
+
+
+def restore_cache(entries: dict[str, dict[str, list]]) -> dict[str, dict[str, list]]:
+    """
+    Add previously fetched results to the execution cache without overwriting results already cached.
+    Returns the results as they are held in the cache.
+    """
+    restored: dict[str, dict[str, list]] = {}
+    for role, queries in entries.items():
+        for sql_text, result in queries.items():
+            restored.setdefault(role, {})[sql_text] = _EXECUTION_CACHE.put(role, sql_text, result, replace=False)
+    return restored
+
+
+def prefetched_queries() -> dict[tuple[str, Optional[str], Optional[str]], str]:
+    """
+    Return the SHOW statements prefetched into the current execution cache, keyed by container.
+    """
+    return _EXECUTION_CACHE.prefetched
+
+
+def index_result(result: list, index_name: Hashable, build: Callable[[list], dict]) -> dict:
+    """
+    Return the index named `index_name` over a query result, building it with `build` on first use.
+    Indexes are evicted along with the cached result they were built from.
+    """
+    return _EXECUTION_CACHE.index(result, index_name, build)
+
+
+# Errors that mean Snowflake is shedding load rather than rejecting the query
+_THROTTLING_EXCEPTIONS = (
+    GatewayTimeoutError,
+    OtherHTTPRetryableError,
+    RequestExceedMaxRetryError,
+    RequestTimeoutError,
+    ServiceUnavailableError,
+    TooManyRequests,
+)
+_THROTTLING_ERRNOS = {STATEMENT_TIMEOUT_ERR}
+
+# A query only counts as slow once it takes this many times the typical latency, and at least this many seconds
+CONGESTION_LATENCY_FACTOR = 3.0
+CONGESTION_MIN_LATENCY = 1.0
+
+
+def is_throttling_error(err: BaseException) -> bool:
+    if isinstance(err, _THROTTLING_EXCEPTIONS):
+        return True
+    return isinstance(err, ProgrammingError) and err.errno in _THROTTLING_ERRNOS
+
+
+class ConcurrencyGovernor:
+    """
+    Limits how many queries run at once across all threads, adapting the limit with additive increase,
+    multiplicative decrease (AIMD).
+
+    Every query that completes normally raises the limit by 1/limit, up to `max_concurrency`. A throttling
+    error, or a query that takes much longer than the typical latency of queries of the same template (see
+    `titan.metrics.query_template`), halves the limit, down to `min_concurrency`. Comparing within a template
+    keeps naturally slow statements, like account-wide SHOWs, from reading as congestion. The limit is halved
+    at most once per typical query latency (and at most once a second), so one burst of slow queries counts
+    as one congestion signal. With `max_qps`, query starts are also spaced out to stay under that rate.
+    """
+
+    def __init__(self, max_concurrency: int, min_concurrency: int = 1, max_qps: Optional[float] = None):
+        if min_concurrency < 1 or max_concurrency < min_concurrency:
+            raise ValueError(f"Invalid concurrency bounds: {min_concurrency}..{max_concurrency}")
+        if max_qps is not None and max_qps <= 0:
+            raise ValueError(f"max_qps must be positive, got {max_qps}")
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_qps = max_qps
+        self.limit = float(max_concurrency)
+        self.throttled = 0
+        self.decreases = 0
+        self._in_flight = 0
+        self._typical_latency: dict[Optional[str], float] = {}
+        self._last_decrease = 0.0
+        self._next_start = 0.0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, template: Optional[str] = None) -> Iterator[None]:
+        """
+        Hold one of the in-flight query slots for the duration of the block, running a query of `template`.
+        """
+        self._acquire()
+        start = time.monotonic()
+        throttled = False
+        try:
+            yield
+        except BaseException as err:
+            throttled = is_throttling_error(err)
+            raise
+        finally:
+            self._release(time.monotonic() - start, throttled, template)
+
+    def _acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+            delay = 0.0
+            if self.max_qps is not None:
+                now = time.monotonic()
+                start_at = max(now, self._next_start)
+                self._next_start = start_at + 1 / self.max_qps
+                delay = start_at - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def _release(self, latency: float, throttled: bool, template: Optional[str]) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            typical = self._typical_latency.get(template)
+            slow = typical is not None and latency > max(typical * CONGESTION_LATENCY_FACTOR, CONGESTION_MIN_LATENCY)
+            if throttled:
+                self.throttled += 1
+            if throttled or slow:
+                now = time.monotonic()
+                if now - self._last_decrease >= max(typical or 0.0, CONGESTION_MIN_LATENCY):
+                    self.limit = max(float(self.min_concurrency), self.limit / 2)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            if not throttled:
+                self._typical_latency[template] = latency if typical is None else 0.9 * typical + 0.1 * latency
+            self._cond.notify_all()
+
+    def stats(self) -> dict[str, Union[int, float]]:
+        with self._cond:
+            return {"limit": int(self.limit), "throttled": self.throttled, "decreases": self.decreases}
+
+
+_GOVERNOR: Optional[ConcurrencyGovernor] = None
+
+
+@contextmanager
+def governed(governor: Optional[ConcurrencyGovernor]) -> Iterator[Optional[ConcurrencyGovernor]]:
+    """
+    Route every query run through `execute`, `execute_batch` and `execute_stream` through `governor` until
+    the block exits.
+    """
+    global _GOVERNOR
+    previous, _GOVERNOR = _GOVERNOR, governor
+    try:
+        yield governor
+    finally:
+        _GOVERNOR = previous
+
+
+@contextmanager
+def _query_slot(sql: str) -> Iterator[None]:
+    governor = _GOVERNOR
+    if governor is None:
+        yield
+        return
+    with governor.slot(query_template(sql)):
+        yield
 
 
 def execute(
@@ -69,30 +425,347 @@ def execute(
 
     session_header = f"[{session.user}:{session.role}] > {sql_text}"
 
-    if cacheable and session.role in _EXECUTION_CACHE and sql_text in _EXECUTION_CACHE[session.role]:
-        result = _EXECUTION_CACHE[session.role][sql_text]
-        # logger.warning(f"{session_header}    \033[94m({len(result)} rows, cached)\033[0m")
-        return result
+    if cacheable:
+        result = _EXECUTION_CACHE.get(session.role, sql_text)
+        if result is not None:
+            # logger.warning(f"{session_header}    \033[94m({len(result)} rows, cached)\033[0m")
+            record_query(session.role, sql_text, result, 0.0, cached=True)
+            return result
 
     start = time.time()
     try:
-        cur.execute(sql_text)
-        result = cur.fetchall()
+        with _query_slot(sql_text):
+            cur.execute(sql_text)
+            result = cur.fetchall()
         runtime = time.time() - start
         logger.warning(f"{session_header}    \033[94m({len(result)} rows, {runtime:.2f}s)\033[0m")
+        record_query(session.role, sql_text, result, runtime)
         if cacheable:
-            if session.role not in _EXECUTION_CACHE:
-                _EXECUTION_CACHE[session.role] = {}
-            _EXECUTION_CACHE[session.role][sql_text] = result
+            result = _EXECUTION_CACHE.put(session.role, sql_text, result)
         return result
     except ProgrammingError as err:
+        runtime = time.time() - start
+        record_query(session.role, sql_text, None, runtime, errno=err.errno)
         if empty_response_codes and err.errno in empty_response_codes:
-            runtime = time.time() - start
             logger.warning(f"{session_header}    \033[94m(empty, {runtime:.2f}s)\033[0m")
             if cacheable:
-                if session.role not in _EXECUTION_CACHE:
-                    _EXECUTION_CACHE[session.role] = {}
-                _EXECUTION_CACHE[session.role][sql_text] = []
+                _EXECUTION_CACHE.put(session.role, sql_text, [])
             return []
-        logger.error(f"{session_header}    \033[31m(err {err.errno}, {time.time() - start:.2f}s)\033[0m")
+        logger.error(f"{session_header}    \033[31m(err {err.errno}, {runtime:.2f}s)\033[0m")
         raise ProgrammingError(f"failed to execute sql, [{sql_text}]", errno=err.errno) from err
+
+
+def execute_stream(
+    session: SnowflakeConnection,
+    sql: str,
+    batch_size: int = STREAM_BATCH_SIZE,
+    empty_response_codes: Optional[list[int]] = None,
+) -> Iterator[dict]:
+    """
+    Run a query and yield its rows, fetching at most `batch_size` rows at a time so large results are never
+    held in memory all at once. Streamed results bypass the execution cache.
+    """
+    session_header = f"[{session.user}:{session.role}] > {sql}"
+    cur = session.cursor(snowflake.connector.DictCursor)
+    start = time.time()
+    try:
+        with _query_slot(sql):
+            cur.execute(sql)
+    except ProgrammingError as err:
+        runtime = time.time() - start
+        record_query(session.role, sql, None, runtime, errno=err.errno)
+        if empty_response_codes and err.errno in empty_response_codes:
+            logger.warning(f"{session_header}    \033[94m(empty, {runtime:.2f}s)\033[0m")
+            return
+        logger.error(f"{session_header}    \033[31m(err {err.errno}, {runtime:.2f}s)\033[0m")
+        raise ProgrammingError(f"failed to execute sql, [{sql}]", errno=err.errno) from err
+
+    row_count = 0
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            row_count += len(rows)
+            yield from rows
+    finally:
+        cur.close()
+    runtime = time.time() - start
+    logger.warning(f"{session_header}    \033[94m({row_count} rows, {runtime:.2f}s, streamed)\033[0m")
+    if metrics_enabled():
+        record_query(session.role, sql, row_count, runtime)
+
+
+def execute_batch(session: SnowflakeConnection, statements: list[str], cacheable: bool = False) -> list[list]:
+    """
+    Send several statements in a single multi-statement request and return one result per statement, in order.
+
+    Snowflake stops at the first failing statement and reports the error for the whole request, so callers
+    can't tell which statements already ran. On error, only batch statements that are safe to run twice.
+    With `cacheable`, statements already in the execution cache are not resent. Cached results are stored
+    under the session's current role, so cacheable batches must not change roles.
+    """
+    statements = [sql.rstrip().rstrip(";") for sql in statements]
+    cached: dict[str, list] = {}
+    if cacheable:
+        for sql in statements:
+            result = _EXECUTION_CACHE.get(session.role, sql)
+            if result is not None:
+                cached[sql] = result
+        pending = list(dict.fromkeys(sql for sql in statements if sql not in cached))
+    else:
+        # Statements with side effects run exactly as given, repeats included
+        pending = statements
+    for sql, result in cached.items():
+        record_query(session.role, sql, result, 0.0, cached=True)
+
+    pending_results: list[list] = []
+    if len(pending) == 1:
+        pending_results = [execute(session, pending[0], cacheable=cacheable)]
+    elif pending:
+        session_header = f"[{session.user}:{session.role}] > " + ";\n  ".join(pending)
+        cur = session.cursor(snowflake.connector.DictCursor)
+        start = time.time()
+        try:
+            with _query_slot(";\n".join(pending)):
+                cur.execute(";\n".join(pending), num_statements=len(pending))
+                for index in range(len(pending)):
+                    if index > 0:
+                        cur.nextset()
+                    pending_results.append(cur.fetchall())
+        except ProgrammingError as err:
+            logger.error(f"{session_header}    \033[31m(err {err.errno}, {time.time() - start:.2f}s)\033[0m")
+            raise ProgrammingError(f"failed to execute batch of {len(pending)} statements", errno=err.errno) from err
+        runtime = time.time() - start
+        logger.warning(f"{session_header}    \033[94m({len(pending)} statements, {runtime:.2f}s)\033[0m")
+        # Snowflake doesn't time statements in a batch separately, so the round trip is split evenly
+        for sql, result in zip(pending, pending_results):
+            record_query(session.role, sql, result, runtime / len(pending))
+        if cacheable:
+            pending_results = [
+                _EXECUTION_CACHE.put(session.role, sql, result) for sql, result in zip(pending, pending_results)
+            ]
+
+    if not cacheable:
+        return pending_results
+    results = dict(zip(pending, pending_results))
+    return [results[sql] if sql in results else cached[sql] for sql in statements]
+
+
+class SessionPool:
+    """
+    A fixed-size pool of Snowflake sessions used to fan independent queries out over several connections.
+
+    The primary session is always part of the pool. Additional connections are opened lazily with
+    `session_factory` and switched to the primary session's role. Without a factory, the pool runs serially
+    on the primary session: fetchers may switch its role, which isn't safe under concurrent cursors.
+    """
+
+    def __init__(
+        self,
+        session: SnowflakeConnection,
+        size: int = 1,
+        session_factory: Optional[SessionFactory] = None,
+        on_connect: Optional[Callable[[SnowflakeConnection], Any]] = None,
+    ):
+        if size < 1:
+            raise ValueError(f"SessionPool size must be at least 1, got {size}")
+        self._primary = session
+        self._size = size if session_factory is not None else 1
+        self._session_factory = session_factory
+        self._on_connect = on_connect
+        self._lock = threading.Lock()
+        self._idle: Queue = Queue()
+        self._idle.put(session)
+        self._opened: list[SnowflakeConnection] = []
+        self._reserved = 0
+
+    def __enter__(self) -> "SessionPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _open(self) -> SnowflakeConnection:
+        conn = self._session_factory()
+        if self._primary.role:
+            execute(conn, f"USE ROLE {resource_name_from_snowflake_metadata(self._primary.role)}")
+        if self._on_connect:
+            self._on_connect(conn)
+        return conn
+
+    def _checkout(self) -> SnowflakeConnection:
+        if self._session_factory is None:
+            return self._primary
+        with self._lock:
+            # Reserve a slot before connecting so concurrent checkouts don't overshoot the pool size
+            can_open = self._idle.empty() and self._reserved + 1 < self._size
+            if can_open:
+                self._reserved += 1
+        if not can_open:
+            return self._idle.get()
+        try:
+            conn = self._open()
+        except Exception:
+            with self._lock:
+                self._reserved -= 1
+            raise
+        with self._lock:
+            self._opened.append(conn)
+        return conn
+
+    def _checkin(self, conn: SnowflakeConnection) -> None:
+        if self._session_factory is not None:
+            self._idle.put(conn)
+
+    @contextmanager
+    def session(self) -> Iterator[SnowflakeConnection]:
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+
+    def map(self, fn: Callable[[SnowflakeConnection, T], R], items: Iterable[T]) -> Iterator[R]:
+        """
+        Call `fn(session, item)` for every item and yield the results in input order.
+
+        With a pool size of 1 this runs serially on the primary session. Otherwise, items are spread over
+        `size` worker threads, each borrowing a session for the duration of a single call. An exception
+        is raised at the position of the item that caused it.
+        """
+        if self._size == 1:
+            for item in items:
+                yield fn(self._primary, item)
+            return
+
+        @in_current_phase
+        def _run(item: T) -> R:
+            with self.session() as conn:
+                return fn(conn, item)
+
+        with ThreadPoolExecutor(max_workers=self._size, thread_name_prefix="titan") as executor:
+            yield from executor.map(_run, items)
+
+    def close(self) -> None:
+        with self._lock:
+            opened, self._opened = self._opened, []
+        for conn in opened:
+            conn.close()
+
+
+class RolePool:
+    """
+    Connections pinned to one role each, so statements for different roles don't have to switch the role of a
+    shared session back and forth.
+
+    The primary session is pinned to its current role. Connections for other roles are opened lazily with
+    `session_factory` and switched to their role once. Without a factory, the primary session is switched to
+    whichever role was asked for last, which is only safe when it is used from one thread at a time.
+    """
+
+    def __init__(
+        self,
+        session: SnowflakeConnection,
+        session_factory: Optional[SessionFactory] = None,
+        on_connect: Optional[Callable[[SnowflakeConnection], Any]] = None,
+    ):
+        self._primary = session
+        self._session_factory = session_factory
+        self._on_connect = on_connect
+        self._lock = threading.Lock()
+        self._sessions: dict[str, SnowflakeConnection] = {}
+        self._opened: list[SnowflakeConnection] = []
+        if session.role:
+            self._sessions[session.role] = session
+
+    def __enter__(self) -> "RolePool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def session_for_role(self, role: Union[ResourceName, str]) -> SnowflakeConnection:
+        role = role if isinstance(role, ResourceName) else ResourceName(role)
+        if self._session_factory is None:
+            execute(self._primary, f"USE ROLE {role}")
+            return self._primary
+        # Role names in Snowflake metadata, like the session's role, are in normalized form
+        key = role.normalized()
+        with self._lock:
+            conn = self._sessions.get(key)
+        if conn is not None:
+            return conn
+        # Connecting is slow, so it happens outside the lock. Threads racing for the same role may each open a
+        # connection; the first one published wins and the others are closed.
+        conn = self._session_factory()
+        try:
+            execute(conn, f"USE ROLE {role}")
+            if self._on_connect:
+                self._on_connect(conn)
+        except Exception:
+            conn.close()
+            raise
+        with self._lock:
+            existing = self._sessions.get(key)
+            if existing is None:
+                self._sessions[key] = conn
+                self._opened.append(conn)
+        if existing is not None:
+            conn.close()
+            return existing
+        return conn
+
+    def close(self) -> None:
+        with self._lock:
+            opened, self._opened = self._opened, []
+            self._sessions = {self._primary.role: self._primary} if self._primary.role else {}
+        for conn in opened:
+            conn.close()
+
+
+_ROLE_POOL: Optional[RolePool] = None
+
+
+@contextmanager
+def role_pool(
+    session: SnowflakeConnection,
+    session_factory: Optional[SessionFactory] = None,
+    on_connect: Optional[Callable[[SnowflakeConnection], Any]] = None,
+) -> Iterator[RolePool]:
+    """
+    Open a RolePool and route `using_role` through it until the block exits. Without a `session_factory`,
+    `using_role` keeps switching the session's role and back, since the pool couldn't pin anything.
+    """
+    global _ROLE_POOL
+    pool = RolePool(session, session_factory=session_factory, on_connect=on_connect)
+    previous = _ROLE_POOL
+    if session_factory is not None:
+        _ROLE_POOL = pool
+    try:
+        yield pool
+    finally:
+        _ROLE_POOL = previous
+        pool.close()
+
+
+@contextmanager
+def using_role(session: SnowflakeConnection, role: Union[ResourceName, str]) -> Iterator[SnowflakeConnection]:
+    """
+    Yield a connection that acts as `role`. Inside `role_pool`, this is the connection pinned to that role.
+    Otherwise `session` is switched to the role and back.
+    """
+    if _ROLE_POOL is not None:
+        yield _ROLE_POOL.session_for_role(role)
+        return
+    previous_role = session.role
+    execute(session, f"USE ROLE {role}")
+    try:
+        yield session
+    finally:
+        if previous_role:
+            execute(session, f"USE ROLE {resource_name_from_snowflake_metadata(previous_role)}")
@@ -1,7 +1,9 @@
 import datetime
 import json
 import logging
+import re
 import sys
+from copy import deepcopy
 from functools import cache
 from typing import Any, Optional, TypedDict, Union
 
@@ -19,9 +21,17 @@ from .builtins import (
 from .client import (
     DOES_NOT_EXIST_ERR,
     INVALID_IDENTIFIER,
+    NO_ACTIVE_WAREHOUSE_ERR,
     OBJECT_DOES_NOT_EXIST_ERR,
     UNSUPPORTED_FEATURE,
+    MAX_BATCH_STATEMENTS,
     execute,
+    execute_batch,
+    execute_stream,
+    index_result,
+    prefetched_queries,
+    restore_cache,
+    using_role,
 )
 from .enums import AccountEdition, ResourceType, WarehouseSize
 from .identifiers import FQN, URN, parse_FQN, resource_type_for_label
@@ -159,7 +169,57 @@ def _fail_if_not_granted(result, *args):
         raise Exception(result[0]["status"], *args)
 
 
-_INDEX: dict[int, dict[tuple[str, str, str], dict[str, Any]]] = {}
+# Resource types whose fetchers read from `_show_resources`, and the SHOW noun for each
+_PREFETCH_SHOW_TYPES = {
+    ResourceType.AGGREGATION_POLICY: "AGGREGATION POLICIES",
+    ResourceType.ALERT: "ALERTS",
+    ResourceType.API_INTEGRATION: "API INTEGRATIONS",
+    ResourceType.AUTHENTICATION_POLICY: "AUTHENTICATION POLICIES",
+    ResourceType.CATALOG_INTEGRATION: "CATALOG INTEGRATIONS",
+    ResourceType.DATABASE: "DATABASES",
+    ResourceType.DYNAMIC_TABLE: "DYNAMIC TABLES",
+    ResourceType.EXTERNAL_ACCESS_INTEGRATION: "EXTERNAL ACCESS INTEGRATIONS",
+    ResourceType.EXTERNAL_VOLUME: "EXTERNAL VOLUMES",
+    ResourceType.FILE_FORMAT: "FILE FORMATS",
+    ResourceType.FUNCTION: "USER FUNCTIONS",
+    ResourceType.ICEBERG_TABLE: "ICEBERG TABLES",
+    ResourceType.IMAGE_REPOSITORY: "IMAGE REPOSITORIES",
+    ResourceType.MASKING_POLICY: "MASKING POLICIES",
+    ResourceType.MATERIALIZED_VIEW: "MATERIALIZED VIEWS",
+    ResourceType.NETWORK_POLICY: "NETWORK POLICIES",
+    ResourceType.NETWORK_RULE: "NETWORK RULES",
+    ResourceType.NOTEBOOK: "NOTEBOOKS",
+    ResourceType.PACKAGES_POLICY: "PACKAGES POLICIES",
+    ResourceType.PASSWORD_POLICY: "PASSWORD POLICIES",
+    ResourceType.PIPE: "PIPES",
+    ResourceType.ROLE: "ROLES",
+    ResourceType.SCHEMA: "SCHEMAS",
+    ResourceType.SECRET: "SECRETS",
+    ResourceType.STAGE: "STAGES",
+    ResourceType.TABLE: "TABLES",
+    ResourceType.TASK: "TASKS",
+    ResourceType.VIEW: "VIEWS",
+    ResourceType.WAREHOUSE: "WAREHOUSES",
+}
+
+# SHOW PARAMETERS statements run by fetchers, for the types that have one
+_PREFETCH_PARAMETERS_SQL = {
+    ResourceType.DATABASE: "SHOW PARAMETERS IN DATABASE {fqn}",
+    ResourceType.SCHEMA: "SHOW PARAMETERS IN SCHEMA {fqn}",
+    ResourceType.WAREHOUSE: "SHOW PARAMETERS FOR WAREHOUSE {fqn}",
+}
+
+# Incremental refresh: fingerprinted resources from the previous run, and the ones fetched in this run,
+# keyed by URN string
+_INCREMENTAL_REFRESH = False
+_PREVIOUS_STATE: dict[str, tuple[tuple, dict]] = {}
+_FETCHED_STATE: dict[str, tuple[tuple, dict]] = {}
+
+# Maximum number of tag_references() calls combined into a single query
+TAG_REFERENCES_PER_QUERY = 100
+
+# Maps each bulk tag reference query to the per-object tag_references() statements it answers, in order
+_TAG_REFERENCE_QUERIES: dict[str, list[str]] = {}
 
 
 def _fetch_grant_to_role(
@@ -171,22 +231,18 @@ def _fetch_grant_to_role(
     role_type: ResourceType = ResourceType.ROLE,
 ):
     grants = _show_grants_to_role(session, role, role_type=role_type, cacheable=True)
-    if id(grants) not in _INDEX:
-        local_index: dict[tuple[str, str, str], dict[str, Any]] = {}
-        _INDEX[id(grants)] = local_index
-        for grant in grants:
-            name = "ACCOUNT" if grant["granted_on"] == "ACCOUNT" else grant["name"]
-            index_key = (grant["granted_on"], grant["privilege"], name)
-            if index_key not in local_index:
-                local_index[index_key] = grant
-    else:
-        local_index = _INDEX[id(grants)]
+    local_index = index_result(grants, "grant_to_role", _build_grant_to_role_index)
+    return local_index.get((granted_on, privilege, on_name))
 
-    needle = (granted_on, privilege, on_name)
-    if needle in local_index:
-        return local_index[needle]
-    else:
-        return None
+
+def _build_grant_to_role_index(grants: list[dict]) -> dict[tuple[str, str, str], dict[str, Any]]:
+    local_index: dict[tuple[str, str, str], dict[str, Any]] = {}
+    for grant in grants:
+        name = "ACCOUNT" if grant["granted_on"] == "ACCOUNT" else grant["name"]
+        index_key = (grant["granted_on"], grant["privilege"], name)
+        if index_key not in local_index:
+            local_index[index_key] = grant
+    return local_index
 
 
 def _filter_result(result, **kwargs):
@@ -208,6 +264,32 @@ def _filter_result(result, **kwargs):
     return filtered
 
 
+def _lookup(result: list[dict], **kwargs) -> list[dict]:
+    """
+    Same matching rules as `_filter_result`, but served from a hash index over the result that is built once
+    per cached result and set of columns. Use this for large, cached SHOW results that are searched repeatedly.
+    """
+    columns = tuple(sorted(key for key, value in kwargs.items() if value is not None))
+
+    def _build(rows: list[dict]) -> dict[tuple, list[dict]]:
+        index: dict[tuple, list[dict]] = {}
+        for row in rows:
+            # Names in Snowflake metadata are already in normalized form
+            index.setdefault(tuple(row[column] for column in columns), []).append(row)
+        return index
+
+    index = index_result(result, columns, _build)
+    needle = tuple(
+        (
+            ResourceName(kwargs[column]).normalized()
+            if attribute_is_resource_name(column) or isinstance(kwargs[column], ResourceName)
+            else kwargs[column]
+        )
+        for column in columns
+    )
+    return index.get(needle, [])
+
+
 # def _urn_from_grant(row, session_ctx):
 #     account_scoped_resources = {"user", "role", "warehouse", "database", "task"}
 #     granted_on = row["granted_on"].lower()
@@ -388,41 +470,88 @@ def remove_none_values(d):
     return new_dict
 
 
-def _fetch_columns_for_table(session: SnowflakeConnection, fqn: FQN):
-    info_schema_result = execute(session, f"SELECT * FROM {fqn.database}.INFORMATION_SCHEMA.COLUMNS", cacheable=True)
-    columns = []
+_INFORMATION_SCHEMA_COLUMNS = [
+    "TABLE_SCHEMA",
+    "TABLE_NAME",
+    "COLUMN_NAME",
+    "DATA_TYPE",
+    "NUMERIC_PRECISION",
+    "NUMERIC_SCALE",
+    "CHARACTER_MAXIMUM_LENGTH",
+    "DATETIME_PRECISION",
+    "COLLATION_NAME",
+    "COLUMN_DEFAULT",
+    "IS_NULLABLE",
+    "COMMENT",
+]
+
+
+def _information_schema_data_type(col: dict) -> str:
+    # Render the data type the way DESC TABLE does, so both sources yield the same columns
+    data_type = col["DATA_TYPE"]
+    if data_type == "NUMBER":
+        data_type = f"NUMBER({col['NUMERIC_PRECISION']},{col['NUMERIC_SCALE']})"
+    elif data_type == "TEXT":
+        data_type = f"VARCHAR({col['CHARACTER_MAXIMUM_LENGTH']})"
+    elif data_type == "BINARY":
+        data_type = f"BINARY({col['CHARACTER_MAXIMUM_LENGTH']})"
+    elif data_type in ("TIME", "TIMESTAMP_LTZ", "TIMESTAMP_NTZ", "TIMESTAMP_TZ"):
+        data_type = f"{data_type}({col['DATETIME_PRECISION']})"
+    return data_type
+
+
+_COLLATED_DATA_TYPE = re.compile(r"^(?P<data_type>.+?) COLLATE '(?P<collate>.*)'$")
+
+
+def _split_collation(data_type: str) -> tuple[str, Optional[str]]:
+    # DESC TABLE appends the collation to the data type, eg. VARCHAR(16777216) COLLATE 'en-ci'
+    collated = _COLLATED_DATA_TYPE.match(data_type)
+    if collated:
+        return collated.group("data_type"), collated.group("collate")
+    return data_type, None
+
+
+def _column_default(default: Optional[str]) -> Optional[str]:
+    # Snowflake returns a default as the SQL expression, eg. 'abc' for the string abc. A string literal is read
+    # back into the value a manifest holds, which render_column quotes again.
+    if default is not None and len(default) >= 2 and default.startswith("'") and default.endswith("'"):
+        return default[1:-1].replace("''", "'")
+    return default
+
+
+def _build_columns_index(info_schema_result: list[dict]) -> dict[tuple[str, str], list[dict]]:
+    index: dict[tuple[str, str], list[dict]] = {}
     for col in info_schema_result:
-
-        if (
-            resource_name_from_snowflake_metadata(col["TABLE_SCHEMA"]) != fqn.schema
-            or resource_name_from_snowflake_metadata(col["TABLE_NAME"]) != fqn.name
-        ):
-            continue
-
-        data_type = None
-        default = col["COLUMN_DEFAULT"]
-
-        if col["DATA_TYPE"] == "NUMBER":
-            data_type = f"NUMBER({col['NUMERIC_PRECISION']}, {col['NUMERIC_SCALE']})"
-        elif col["DATA_TYPE"] == "TEXT":
-            data_type = f"VARCHAR({col['CHARACTER_MAXIMUM_LENGTH']})"
-            if col["COLUMN_DEFAULT"]:
-                default = col["COLUMN_DEFAULT"].strip("'")
-        else:
-            data_type = col["DATA_TYPE"]
-
-        columns.append(
+        index.setdefault((col["TABLE_SCHEMA"], col["TABLE_NAME"]), []).append(
             {
                 "name": col["COLUMN_NAME"],
-                "data_type": data_type,
+                "data_type": _information_schema_data_type(col),
                 "not_null": col["IS_NULLABLE"] == "NO",
-                "default": default,
+                "default": _column_default(col["COLUMN_DEFAULT"]),
                 "comment": col["COMMENT"] or None,
                 "constraint": None,
-                "collate": None,
+                "collate": col["COLLATION_NAME"] or None,
             }
         )
-    return columns
+    return index
+
+
+def _fetch_columns_for_table(session: SnowflakeConnection, fqn: FQN):
+    # One query per database. The result is grouped by (schema, table) once and shared by every table lookup.
+    # Tables it doesn't cover, eg. because the session has no warehouse or the table was created since, fall
+    # back to DESC TABLE.
+    info_schema_result = execute(
+        session,
+        f"SELECT {', '.join(_INFORMATION_SCHEMA_COLUMNS)} FROM {fqn.database}.INFORMATION_SCHEMA.COLUMNS"
+        " ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION",
+        cacheable=True,
+        empty_response_codes=[DOES_NOT_EXIST_ERR, OBJECT_DOES_NOT_EXIST_ERR, NO_ACTIVE_WAREHOUSE_ERR],
+    )
+    index = index_result(info_schema_result, "columns_by_table", _build_columns_index)
+    columns = index.get((ResourceName(fqn.schema).normalized(), ResourceName(fqn.name).normalized()))
+    if not columns:
+        return fetch_columns(session, "TABLE", fqn)
+    return [col.copy() for col in columns]
 
 
 def _fetch_owner(session: SnowflakeConnection, type_str: str, fqn: FQN) -> Optional[str]:
@@ -433,50 +562,66 @@ def _fetch_owner(session: SnowflakeConnection, type_str: str, fqn: FQN) -> Optio
     return ownership_grant[0]["grantee_name"]
 
 
+def _show_resources_sql(type_str: str, database=None, schema=None) -> str:
+    if schema is not None:
+        return f"SHOW {type_str} IN SCHEMA {database}.{schema}"
+    elif database is not None:
+        return f"SHOW {type_str} IN DATABASE {database}"
+    elif "INTEGRATIONS" in type_str:
+        return f"SHOW {type_str}"
+    else:
+        return f"SHOW {type_str} IN ACCOUNT"
+
+
+def _container_filters(show_result: list[dict], fqn: FQN) -> dict:
+    container_kwargs = {}
+    show_columns = show_result[0].keys()
+    if "database" in show_columns:
+        container_kwargs["database"] = fqn.database
+    elif "database_name" in show_columns:
+        container_kwargs["database_name"] = fqn.database
+
+    if "schema" in show_columns:
+        container_kwargs["schema"] = fqn.schema
+    elif "schema_name" in show_columns:
+        container_kwargs["schema_name"] = fqn.schema
+    return container_kwargs
+
+
+def _prefetched_sql(type_str: str, fqn: FQN) -> Optional[str]:
+    if fqn.database is None:
+        keys = [(type_str, None, None)]
+    elif fqn.schema is None:
+        keys = [(type_str, str(fqn.database), None)]
+    else:
+        keys = [(type_str, str(fqn.database), str(fqn.schema)), (type_str, str(fqn.database), None)]
+    prefetched = prefetched_queries()
+    for key in keys:
+        if key in prefetched:
+            return prefetched[key]
+    return None
+
+
 def _show_resources(session: SnowflakeConnection, type_str, fqn: FQN, cacheable: bool = True) -> list[dict]:
     try:
-        in_account = " IN ACCOUNT"
-        if "INTEGRATIONS" in type_str:
-            in_account = ""
-        initial_fetch = execute(session, f"SHOW {type_str}{in_account}", cacheable=cacheable)
+        prefetched_sql = _prefetched_sql(type_str, fqn)
+        if prefetched_sql:
+            prefetched = execute(session, prefetched_sql, cacheable=True, empty_response_codes=[DOES_NOT_EXIST_ERR])
+            if len(prefetched) == 0:
+                return []
+            found = _lookup(prefetched, name=fqn.name, **_container_filters(prefetched, fqn))
+            # SHOW returns at most 10k rows, so a large result doesn't prove the object is missing
+            if found or len(prefetched) < 1000:
+                return found
+            return _show_resources_like(session, type_str, fqn, cacheable)
+
+        initial_fetch = execute(session, _show_resources_sql(type_str), cacheable=cacheable)
         if len(initial_fetch) == 0:
             return []
         elif len(initial_fetch) < 1000:
-            container_kwargs = {}
-            show_columns = initial_fetch[0].keys()
-            if "database" in show_columns:
-                container_kwargs["database"] = fqn.database
-            elif "database_name" in show_columns:
-                container_kwargs["database_name"] = fqn.database
-
-            if "schema" in show_columns:
-                container_kwargs["schema"] = fqn.schema
-            elif "schema_name" in show_columns:
-                container_kwargs["schema_name"] = fqn.schema
-            filtered_fetch = _filter_result(
-                initial_fetch,
-                name=fqn.name,
-                **container_kwargs,
-            )
-            return filtered_fetch
+            return _lookup(initial_fetch, name=fqn.name, **_container_filters(initial_fetch, fqn))
         else:
-
-            if fqn.database is None and fqn.schema is None:
-                return execute(session, f"SHOW {type_str} LIKE '{fqn.name}'", cacheable=cacheable)
-            elif fqn.database is None:
-                return execute(
-                    session, f"SHOW {type_str} LIKE '{fqn.name}' IN SCHEMA {fqn.schema}", cacheable=cacheable
-                )
-            elif fqn.schema is None:
-                return execute(
-                    session, f"SHOW {type_str} LIKE '{fqn.name}' IN DATABASE {fqn.database}", cacheable=cacheable
-                )
-            else:
-                return execute(
-                    session,
-                    f"SHOW {type_str} LIKE '{fqn.name}' IN SCHEMA {fqn.database}.{fqn.schema}",
-                    cacheable=cacheable,
-                )
+            return _show_resources_like(session, type_str, fqn, cacheable)
     except ProgrammingError as err:
         if err.errno == OBJECT_DOES_NOT_EXIST_ERR or err.errno == DOES_NOT_EXIST_ERR:
             return []
@@ -484,6 +629,36 @@ def _show_resources(session: SnowflakeConnection, type_str, fqn: FQN, cacheable:
             raise
 
 
+def _show_resources_like(session: SnowflakeConnection, type_str, fqn: FQN, cacheable: bool = True) -> list[dict]:
+    # LIKE matches case-insensitively, against the name without quotes
+    name = ResourceName(fqn.name).normalized()
+    if fqn.database is None and fqn.schema is None:
+        return execute(session, f"SHOW {type_str} LIKE '{name}'", cacheable=cacheable)
+    elif fqn.database is None:
+        return execute(session, f"SHOW {type_str} LIKE '{name}' IN SCHEMA {fqn.schema}", cacheable=cacheable)
+    elif fqn.schema is None:
+        return execute(session, f"SHOW {type_str} LIKE '{name}' IN DATABASE {fqn.database}", cacheable=cacheable)
+    else:
+        return execute(
+            session,
+            f"SHOW {type_str} LIKE '{name}' IN SCHEMA {fqn.database}.{fqn.schema}",
+            cacheable=cacheable,
+        )
+
+
+def _show_tables(session: SnowflakeConnection, fqn: FQN) -> list[dict]:
+    # A plan reads tables from the prefetched listing of their schema or database. Elsewhere, eg. during
+    # export, each table is looked up by name, so the tables of the whole account are never held in memory.
+    if _prefetched_sql("TABLES", fqn):
+        return _show_resources(session, "TABLES", fqn)
+    return _lookup(
+        _show_resources_like(session, "TABLES", fqn),
+        name=fqn.name,
+        database_name=fqn.database,
+        schema_name=fqn.schema,
+    )
+
+
 def _show_resource_parameters(session: SnowflakeConnection, type_str: str, fqn: FQN, cacheable: bool = True) -> dict:
     result = execute(session, f"SHOW PARAMETERS IN {type_str} {fqn}", cacheable=cacheable)
     return params_result_to_dict(result)
@@ -516,9 +691,8 @@ def _show_users(session) -> list[dict]:
         else:
             raise RuntimeError("Managing users requires the MANAGE GRANTS privilege")
 
-        use_role(session, execution_role)
-        users = execute(session, "SHOW USERS", cacheable=True)
-        use_role(session, current_role)
+        with using_role(session, execution_role) as role_session:
+            users = execute(role_session, "SHOW USERS", cacheable=True)
 
     return users
 
@@ -540,6 +714,18 @@ def _get_account_privilege_roles(session: SnowflakeConnection) -> dict[str, list
     return grant_map
 
 
+def _show_grants_to_role_sql(role: ResourceName, role_type: ResourceType = ResourceType.ROLE) -> str:
+    return f"SHOW GRANTS TO {role_type} {role}"
+
+
+def _show_future_grants_to_role_sql(role: ResourceName, role_type: ResourceType = ResourceType.ROLE) -> str:
+    return f"SHOW FUTURE GRANTS TO {role_type} {role}"
+
+
+def _show_grants_of_role_sql(role: ResourceName) -> str:
+    return f"SHOW GRANTS OF ROLE {role}"
+
+
 def _show_grants_to_role(
     session: SnowflakeConnection,
     role: ResourceName,
@@ -560,7 +746,7 @@ def _show_grants_to_role(
     """
     grants = execute(
         session,
-        f"SHOW GRANTS TO {role_type} {role}",
+        _show_grants_to_role_sql(role, role_type),
         cacheable=cacheable,
         empty_response_codes=[DOES_NOT_EXIST_ERR],
     )
@@ -583,7 +769,7 @@ def _show_future_grants_to_role(
     """
     grants = execute(
         session,
-        f"SHOW FUTURE GRANTS TO ROLE {role}",
+        _show_future_grants_to_role_sql(role),
         cacheable=cacheable,
         empty_response_codes=[DOES_NOT_EXIST_ERR],
     )
@@ -598,6 +784,14 @@ def use_secondary_roles(session: SnowflakeConnection, all: bool = False):
     execute(session, f"USE SECONDARY ROLES {secondary_roles}")
 
 
+def set_query_tag(session: SnowflakeConnection, query_tag: str):
+    """
+    Tag every query the session runs from now on, so it can be found in QUERY_HISTORY.
+    """
+    query_tag = query_tag.replace("'", "''")
+    execute(session, f"ALTER SESSION SET QUERY_TAG = '{query_tag}'")
+
+
 def use_role(session: SnowflakeConnection, role_name: ResourceName):
     """
     Set the active role for the current session.
@@ -605,8 +799,334 @@ def use_role(session: SnowflakeConnection, role_name: ResourceName):
     execute(session, f"USE ROLE {role_name}")
 
 
+def plan_prefetch(urns: list[URN]) -> list[str]:
+    """
+    Group URNs by resource type and container and return one SHOW statement per group.
+
+    Schema-scoped resources are fetched with `SHOW ... IN SCHEMA` when all of a database's resources of that
+    type share a schema, and with `SHOW ... IN DATABASE` otherwise. `_show_resources` reads from these
+    results instead of issuing a statement per object.
+    """
+    prefetched = prefetched_queries()
+    prefetched.clear()
+    schemas_by_database: dict[tuple[str, str], set[str]] = {}
+    for urn in urns:
+        type_str = _PREFETCH_SHOW_TYPES.get(urn.resource_type)
+        if type_str is None:
+            continue
+        fqn = urn.fqn
+        if fqn.database is None:
+            prefetched[(type_str, None, None)] = _show_resources_sql(type_str)
+        elif fqn.schema is None:
+            prefetched[(type_str, str(fqn.database), None)] = _show_resources_sql(type_str, fqn.database)
+        else:
+            schemas_by_database.setdefault((type_str, str(fqn.database)), set()).add(str(fqn.schema))
+
+    for (type_str, database), schemas in schemas_by_database.items():
+        if len(schemas) == 1:
+            schema = next(iter(schemas))
+            prefetched[(type_str, database, schema)] = _show_resources_sql(type_str, database, schema)
+        else:
+            prefetched[(type_str, database, None)] = _show_resources_sql(type_str, database)
+
+    return list(dict.fromkeys(prefetched.values()))
+
+
+def plan_parameter_prefetch(session: SnowflakeConnection, urns: list[URN]) -> list[str]:
+    """
+    Return the SHOW PARAMETERS statements that fetching `urns` will run, limited to objects the SHOW
+    prefetch found. Run this after the statements from `plan_prefetch` have been prefetched.
+    """
+    statements = []
+    for urn in urns:
+        template = _PREFETCH_PARAMETERS_SQL.get(urn.resource_type)
+        if template is None:
+            continue
+        # Unchanged objects are served from the previous state during an incremental refresh
+        if _INCREMENTAL_REFRESH and urn.resource_type in _FINGERPRINTERS:
+            continue
+        type_str = _PREFETCH_SHOW_TYPES[urn.resource_type]
+        if _prefetched_sql(type_str, urn.fqn) is None:
+            continue
+        if _show_resources(session, type_str, urn.fqn):
+            statements.append(template.format(fqn=urn.fqn))
+    return statements
+
+
+def plan_grant_prefetch(urns: list[URN]) -> list[str]:
+    """
+    Return one SHOW GRANTS statement per role that fetching the grants, future grants and role grants in
+    `urns` will query. Prefetching these lets every grant be served from the per-role grant index.
+    """
+    statements = []
+    for urn in urns:
+        if urn.resource_type in (ResourceType.GRANT, ResourceType.FUTURE_GRANT):
+            to_type, to = urn.fqn.params["to"].split("/", 1)
+            to_type = resource_type_for_label(to_type)
+            if urn.resource_type == ResourceType.GRANT:
+                statements.append(_show_grants_to_role_sql(to, to_type))
+            else:
+                statements.append(_show_future_grants_to_role_sql(to, to_type))
+        elif urn.resource_type == ResourceType.ROLE_GRANT:
+            statements.append(_show_grants_of_role_sql(urn.fqn.name))
+    return list(dict.fromkeys(statements))
+
+
+_PREFETCH_CONTAINER = re.compile(r"^SHOW .+ IN (?P<type>DATABASE|SCHEMA) (?P<name>.+)$")
+_PREFETCH_ROLE = re.compile(r"^SHOW (?:FUTURE )?GRANTS (?:TO|OF) (?P<type>ROLE|DATABASE ROLE) (?P<name>.+)$")
+
+
+def _listed(show_result: list[dict], name: str) -> bool:
+    return ResourceName(name).normalized() in {row["name"] for row in show_result}
+
+
+def _prefetch_target_exists(session: SnowflakeConnection, sql: str) -> Optional[bool]:
+    """
+    Whether the database, schema or role a prefetch statement lists objects in exists, going by the account's
+    listings, which are cached for the fetchers that follow. Returns None when it can't tell.
+    """
+    if match := _PREFETCH_CONTAINER.match(sql):
+        fqn = parse_FQN(match.group("name"), is_db_scoped=True)
+        database = fqn.database if match.group("type") == "SCHEMA" else fqn.name
+        if not _listed(execute(session, _show_resources_sql("DATABASES"), cacheable=True), str(database)):
+            return False
+        if match.group("type") == "DATABASE":
+            return True
+        schemas = execute(
+            session,
+            _show_resources_sql("SCHEMAS", database),
+            cacheable=True,
+            empty_response_codes=[DOES_NOT_EXIST_ERR],
+        )
+        return _listed(schemas, str(fqn.name))
+    if match := _PREFETCH_ROLE.match(sql):
+        if match.group("type") != "ROLE":
+            return None
+        return _listed(execute(session, _show_resources_sql("ROLES"), cacheable=True), match.group("name"))
+    return True
+
+
+def prefetch(session: SnowflakeConnection, statements: list[str]) -> None:
+    """
+    Run prefetch statements in as few round trips as possible and cache their results.
+
+    A multi-statement request fails as a whole when one of its statements does, so only statements whose
+    database, schema or role is known to exist are batched. Statements for containers that don't exist are
+    cached as empty without running them, and the rest run one at a time. If a batch still fails, its
+    statements are retried one at a time. SHOW statements that still fail are dropped, and the containers they
+    cover fall back to the regular per-object lookups.
+    """
+    batchable, unverified = [], []
+    for sql in statements:
+        exists = _prefetch_target_exists(session, sql)
+        if exists is None:
+            unverified.append(sql)
+        elif exists:
+            batchable.append(sql)
+        else:
+            restore_cache({session.role: {sql: []}})
+    for start in range(0, len(batchable), MAX_BATCH_STATEMENTS):
+        _prefetch_batch(session, batchable[start : start + MAX_BATCH_STATEMENTS])
+    for sql in unverified:
+        _prefetch_one(session, sql)
+
+
+def _prefetch_batch(session: SnowflakeConnection, statements: list[str]) -> None:
+    try:
+        execute_batch(session, statements, cacheable=True)
+        return
+    except ProgrammingError:
+        pass
+
+    for sql in statements:
+        _prefetch_one(session, sql)
+
+
+def _prefetch_one(session: SnowflakeConnection, sql: str) -> None:
+    try:
+        execute(session, sql, cacheable=True, empty_response_codes=[DOES_NOT_EXIST_ERR, OBJECT_DOES_NOT_EXIST_ERR])
+    except ProgrammingError:
+        prefetched = prefetched_queries()
+        for key in [key for key, prefetched_sql in list(prefetched.items()) if prefetched_sql == sql]:
+            prefetched.pop(key, None)
+
+
+def _tag_references_sql(database: Union[ResourceName, FQN, str], object_fqn: Union[FQN, str], domain: str) -> str:
+    return f"SELECT * FROM table({database}.information_schema.tag_references('{object_fqn}', '{domain}'))"
+
+
+def _tag_reference_target(fqn: FQN) -> tuple[str, str, str, str]:
+    """
+    Returns the object name, object domain, database and tag_references() statement for a tag reference FQN.
+    """
+    object_domain = fqn.params["domain"]
+    # TODO: this is a hacky fix
+    name = str(fqn).split("?")[0]
+    resource_fqn = parse_FQN(name, is_db_scoped=(object_domain == "SCHEMA"))
+
+    tag_db = resource_fqn.database if resource_fqn.database else resource_fqn
+
+    # Another hacky fix
+    if str(resource_fqn) == "DATABASE":
+        resource_fqn = '"DATABASE"'  # type: ignore[assignment]
+
+    return name, object_domain, str(tag_db), _tag_references_sql(tag_db, resource_fqn, object_domain)
+
+
+def plan_tag_reference_prefetch(urns: list[URN]) -> list[str]:
+    """
+    Combine the tag_references() lookups for the tag references in `urns` into a few UNION ALL queries per
+    database. `prefetch_tag_references` splits their results back into the per-object statements that
+    `fetch_tag_reference` runs.
+    """
+    _TAG_REFERENCE_QUERIES.clear()
+    by_database: dict[str, list[str]] = {}
+    for urn in urns:
+        if urn.resource_type != ResourceType.TAG_REFERENCE:
+            continue
+        _, _, database, sql = _tag_reference_target(urn.fqn)
+        by_database.setdefault(database, []).append(sql)
+
+    for per_object in by_database.values():
+        per_object = list(dict.fromkeys(per_object))
+        for start in range(0, len(per_object), TAG_REFERENCES_PER_QUERY):
+            chunk = per_object[start : start + TAG_REFERENCES_PER_QUERY]
+            _TAG_REFERENCE_QUERIES[_tag_references_bulk_sql(chunk)] = chunk
+    return list(_TAG_REFERENCE_QUERIES.keys())
+
+
+def _tag_references_bulk_sql(per_object: list[str]) -> str:
+    return "\nUNION ALL\n".join(
+        sql.replace("SELECT *", f"SELECT {position} AS TITAN_REF, *", 1) for position, sql in enumerate(per_object)
+    )
+
+
+def prefetch_tag_references(session: SnowflakeConnection, statements: list[str]) -> None:
+    """
+    Run bulk tag reference queries and cache their rows under the per-object statements they cover.
+    """
+    for bulk_sql in statements:
+        _prefetch_tag_references(session, _TAG_REFERENCE_QUERIES[bulk_sql])
+
+
+def _prefetch_tag_references(session: SnowflakeConnection, per_object: list[str]) -> None:
+    try:
+        rows = execute(session, _tag_references_bulk_sql(per_object))
+    except ProgrammingError as err:
+        # One missing object, eg. one this plan creates, fails the whole query. The query is split in halves
+        # until only the missing objects are left, and those are looked up one at a time. Other errors skip
+        # the query.
+        if err.errno in (DOES_NOT_EXIST_ERR, OBJECT_DOES_NOT_EXIST_ERR) and len(per_object) > 1:
+            middle = len(per_object) // 2
+            _prefetch_tag_references(session, per_object[:middle])
+            _prefetch_tag_references(session, per_object[middle:])
+        return
+    results: dict[str, list] = {sql: [] for sql in per_object}
+    for row in rows:
+        row = row.copy()
+        results[per_object[row.pop("TITAN_REF")]].append(row)
+    restore_cache({session.role: results})
+
+
+def _last_altered(session: SnowflakeConnection, database: ResourceName, view: str, *key_columns: str):
+    result = execute(
+        session,
+        f"SELECT {', '.join(key_columns)}, LAST_ALTERED FROM {database}.INFORMATION_SCHEMA.{view}",
+        cacheable=True,
+        # Without LAST_ALTERED, objects are fetched in full
+        empty_response_codes=[DOES_NOT_EXIST_ERR, OBJECT_DOES_NOT_EXIST_ERR, NO_ACTIVE_WAREHOUSE_ERR],
+    )
+    return index_result(
+        result,
+        ("last_altered", key_columns),
+        lambda rows: {tuple(row[column] for column in key_columns): row["LAST_ALTERED"] for row in rows},
+    )
+
+
+def _fingerprint(show_result: list[dict], last_altered) -> Optional[tuple]:
+    if len(show_result) != 1 or last_altered is None:
+        return None
+    return (tuple(sorted(show_result[0].items())), last_altered)
+
+
+def _fingerprint_schema(session: SnowflakeConnection, fqn: FQN) -> Optional[tuple]:
+    last_altered = _last_altered(session, fqn.database, "SCHEMATA", "SCHEMA_NAME")
+    return _fingerprint(
+        _show_resources(session, "SCHEMAS", fqn),
+        last_altered.get((ResourceName(fqn.name).normalized(),)),
+    )
+
+
+def _fingerprint_table(session: SnowflakeConnection, fqn: FQN) -> Optional[tuple]:
+    last_altered = _last_altered(session, fqn.database, "TABLES", "TABLE_SCHEMA", "TABLE_NAME")
+    return _fingerprint(
+        _show_tables(session, fqn),
+        last_altered.get((ResourceName(fqn.schema).normalized(), ResourceName(fqn.name).normalized())),
+    )
+
+
+def _fingerprint_view(session: SnowflakeConnection, fqn: FQN) -> Optional[tuple]:
+    last_altered = _last_altered(session, fqn.database, "VIEWS", "TABLE_SCHEMA", "TABLE_NAME")
+    return _fingerprint(
+        _show_resources(session, "VIEWS", fqn),
+        last_altered.get((ResourceName(fqn.schema).normalized(), ResourceName(fqn.name).normalized())),
+    )
+
+
+# Resource types with a cheap, reliable change signal: their SHOW row plus INFORMATION_SCHEMA's LAST_ALTERED,
+# which Snowflake bumps on any DDL. Everything else is always fetched.
+_FINGERPRINTERS = {
+    ResourceType.SCHEMA: _fingerprint_schema,
+    ResourceType.TABLE: _fingerprint_table,
+    ResourceType.VIEW: _fingerprint_view,
+}
+
+
+def start_incremental_refresh(previous_state: dict[str, tuple[tuple, dict]]) -> None:
+    """
+    Serve `fetch_resource` from `previous_state` for objects whose fingerprint hasn't changed since it was
+    recorded. Objects that changed, were dropped, or can't be fingerprinted are fetched as usual.
+    """
+    global _INCREMENTAL_REFRESH
+    _INCREMENTAL_REFRESH = True
+    _PREVIOUS_STATE.clear()
+    _PREVIOUS_STATE.update(previous_state)
+    _FETCHED_STATE.clear()
+
+
+def stop_incremental_refresh() -> dict[str, tuple[tuple, dict]]:
+    """
+    Stop serving from the previous state and return the fingerprinted resources fetched since
+    `start_incremental_refresh`, to be passed to it on the next run.
+    """
+    global _INCREMENTAL_REFRESH
+    _INCREMENTAL_REFRESH = False
+    fetched_state = dict(_FETCHED_STATE)
+    _PREVIOUS_STATE.clear()
+    _FETCHED_STATE.clear()
+    return fetched_state
+
+
+def _fetch_resource_incremental(session: SnowflakeConnection, urn: URN) -> Optional[dict]:
+    fingerprint = _FINGERPRINTERS[urn.resource_type](session, urn.fqn)
+    if fingerprint is None:
+        return getattr(__this__, f"fetch_{urn.resource_label}")(session, urn.fqn)
+
+    key = str(urn)
+    previous = _PREVIOUS_STATE.get(key)
+    if previous is not None and previous[0] == fingerprint:
+        data = previous[1]
+    else:
+        data = getattr(__this__, f"fetch_{urn.resource_label}")(session, urn.fqn)
+    if data is not None:
+        _FETCHED_STATE[key] = (fingerprint, data)
+    return deepcopy(data)
+
+
 def fetch_resource(session: SnowflakeConnection, urn: URN) -> Optional[dict]:
     try:
+        if _INCREMENTAL_REFRESH and urn.resource_type in _FINGERPRINTERS:
+            return _fetch_resource_incremental(session, urn)
         return getattr(__this__, f"fetch_{urn.resource_label}")(session, urn.fqn)
     except ProgrammingError as err:
         # This try/catch block fixes a cache-inconsistency issue where _show_resources returns the object as it existed at the start of the cache window,
@@ -677,12 +1197,12 @@ def fetch_role_privileges(
     session: SnowflakeConnection, roles: list[ResourceName], cacheable: bool = True
 ) -> dict[ResourceName, list[GrantedPrivilege]]:
     role_privileges: dict[ResourceName, list[GrantedPrivilege]] = {}
-    for role in roles:
-
-        # Adds 30+s of latency and we can infer what privs are available
-        if role == "ACCOUNTADMIN" or role.startswith("SNOWFLAKE."):
-            continue
+    # Adds 30+s of latency and we can infer what privs are available
+    roles = [role for role in roles if not (role == "ACCOUNTADMIN" or role.startswith("SNOWFLAKE."))]
+    if cacheable:
+        prefetch(session, [_show_grants_to_role_sql(role) for role in roles])
 
+    for role in roles:
         role_privileges[role] = []
 
         grants = _show_grants_to_role(session, role, cacheable=cacheable)
@@ -849,15 +1369,16 @@ def fetch_columns(session: SnowflakeConnection, resource_type: str, fqn: FQN):
     for col in desc_result:
         if col["kind"] != "COLUMN":
             raise Exception(f"Unexpected kind {col['kind']} in desc result")
+        data_type, collate = _split_collation(col["type"])
         columns.append(
             {
                 "name": col["name"],
-                "data_type": col["type"],
+                "data_type": data_type,
                 "not_null": col["null?"] == "N",
-                "default": col["default"],
+                "default": _column_default(col["default"]),
                 "comment": col["comment"] or None,
                 "constraint": None,
-                "collate": None,
+                "collate": collate,
             }
         )
     return columns
@@ -992,9 +1513,9 @@ def fetch_dynamic_table(session: SnowflakeConnection, fqn: FQN):
 
 
 def fetch_event_table(session: SnowflakeConnection, fqn: FQN):
-    show_result = execute(session, "SHOW EVENT TABLES IN ACCOUNT")
+    show_result = execute(session, "SHOW EVENT TABLES IN ACCOUNT", cacheable=True)
 
-    tables = _filter_result(show_result, name=fqn.name, database_name=fqn.database, schema_name=fqn.schema)
+    tables = _lookup(show_result, name=fqn.name, database_name=fqn.database, schema_name=fqn.schema)
 
     if len(tables) == 0:
         return None
@@ -1194,7 +1715,7 @@ def fetch_future_grant(session: SnowflakeConnection, fqn: FQN):
     to_type = resource_type_for_label(to_type)
 
     try:
-        show_result = execute(session, f"SHOW FUTURE GRANTS TO {to_type} {to}", cacheable=True)
+        show_result = execute(session, _show_future_grants_to_role_sql(to, to_type), cacheable=True)
         """
         {
             'created_on': datetime.datetime(2024, 2, 5, 19, 39, 50, 146000, tzinfo=<DstTzInfo 'America/Los_Angeles' PST-1 day, 16:00:00 STD>),
@@ -1227,7 +1748,7 @@ def fetch_future_grant(session: SnowflakeConnection, fqn: FQN):
 
     # 'STATIC_DATABASE.<TABLE>'
 
-    grants = _filter_result(
+    grants = _lookup(
         show_result,
         privilege=fqn.params["priv"],
         name=collection_str,
@@ -1271,7 +1792,7 @@ def fetch_grant(session: SnowflakeConnection, fqn: FQN):
             filters["name"] = on
 
         grants = _show_grants_to_role(session, to, role_type=to_type, cacheable=True)
-        grants = _filter_result(grants, **filters)
+        grants = _lookup(grants, **filters)
 
         if len(grants) == 0:
             return None
@@ -1644,7 +2165,7 @@ def fetch_role_grant(session: SnowflakeConnection, fqn: FQN):
     subject = ResourceName(subject)
     name = ResourceName(name)
     try:
-        show_result = execute(session, f"SHOW GRANTS OF ROLE {fqn.name}", cacheable=True)
+        show_result = execute(session, _show_grants_of_role_sql(fqn.name), cacheable=True)
     except ProgrammingError as err:
         if err.errno == DOES_NOT_EXIST_ERR:
             return None
@@ -1653,11 +2174,8 @@ def fetch_role_grant(session: SnowflakeConnection, fqn: FQN):
     if len(show_result) == 0:
         return None
 
-    for data in show_result:
-        if (
-            resource_name_from_snowflake_metadata(data["granted_to"]) == subject
-            and resource_name_from_snowflake_metadata(data["grantee_name"]) == name
-        ):
+    for data in _lookup(show_result, grantee_name=name):
+        if resource_name_from_snowflake_metadata(data["granted_to"]) == subject:
             if data["granted_to"] == "ROLE":
                 return {
                     "role": fqn.name,
@@ -1993,7 +2511,7 @@ def fetch_storage_integration(session: SnowflakeConnection, fqn: FQN):
 def fetch_stream(session: SnowflakeConnection, fqn: FQN):
     show_result = execute(session, "SHOW STREAMS IN ACCOUNT", cacheable=True)
 
-    streams = _filter_result(show_result, name=fqn.name, database_name=fqn.database, schema_name=fqn.schema)
+    streams = _lookup(show_result, name=fqn.name, database_name=fqn.database, schema_name=fqn.schema)
 
     if len(streams) == 0:
         return None
@@ -2035,7 +2553,7 @@ def fetch_tag(session: SnowflakeConnection, fqn: FQN):
         if err.errno == UNSUPPORTED_FEATURE:
             return None
         raise
-    tags = _filter_result(show_result, name=fqn.name, database_name=fqn.database, schema_name=fqn.schema)
+    tags = _lookup(show_result, name=fqn.name, database_name=fqn.database, schema_name=fqn.schema)
     if len(tags) == 0:
         return None
     if len(tags) > 1:
@@ -2157,16 +2675,11 @@ def fetch_resource_tags(session: SnowflakeConnection, resource_type: ResourceTyp
 
     """
 
-    database = f"{fqn.database}." if fqn.database else ""
-
-    tag_refs = execute(
-        session,
-        f"""
-            SELECT *
-            FROM table({database}information_schema.tag_references(
-                '{fqn}', '{str(resource_type)}'
-            ))""",
-    )
+    if fqn.database:
+        sql = _tag_references_sql(fqn.database, fqn, str(resource_type))
+    else:
+        sql = f"SELECT * FROM table(information_schema.tag_references('{fqn}', '{str(resource_type)}'))"
+    tag_refs = execute(session, sql)
 
     if len(tag_refs) == 0:
         return None
@@ -2186,21 +2699,14 @@ def fetch_resource_tags(session: SnowflakeConnection, resource_type: ResourceTyp
 
 
 def fetch_table(session: SnowflakeConnection, fqn: FQN):
-    show_result = execute(session, "SHOW TABLES IN ACCOUNT", cacheable=True)
-
-    tables = _filter_result(
-        show_result,
-        name=fqn.name,
-        database_name=fqn.database,
-        schema_name=fqn.schema,
-    )
+    tables = _show_tables(session, fqn)
 
     if len(tables) == 0:
         return None
     if len(tables) > 1:
         raise Exception(f"Found multiple tables matching {fqn}")
 
-    columns = fetch_columns(session, "TABLE", fqn)
+    columns = _fetch_columns_for_table(session, fqn)
 
     data = tables[0]
     show_params_result = execute(session, f"SHOW PARAMETERS FOR TABLE {fqn}")
@@ -2226,26 +2732,11 @@ def fetch_tag_reference(session: SnowflakeConnection, fqn: FQN):
     if session_ctx["account_edition"] == AccountEdition.STANDARD:
         return None
 
-    object_domain = fqn.params["domain"]
-    # TODO: this is a hacky fix
-    name = str(fqn).split("?")[0]
-    resource_fqn = parse_FQN(name, is_db_scoped=(object_domain == "SCHEMA"))
-
-    tag_db = resource_fqn.database if resource_fqn.database else resource_fqn
-
-    # Another hacky fix
-    if str(resource_fqn) == "DATABASE":
-        resource_fqn = '"DATABASE"'  # type: ignore[assignment]
+    name, object_domain, _, sql = _tag_reference_target(fqn)
 
     try:
-        tag_refs = execute(
-            session,
-            f"""
-                SELECT *
-                FROM table({tag_db}.information_schema.tag_references(
-                    '{resource_fqn}', '{object_domain}'
-                ))""",
-        )
+        # Served from the cache when the reference was prefetched with `prefetch_tag_references`
+        tag_refs = execute(session, sql, cacheable=True)
     except ProgrammingError as err:
         if err.errno == INVALID_IDENTIFIER:
             return None
@@ -2362,7 +2853,7 @@ def fetch_warehouse(session: SnowflakeConnection, fqn: FQN):
 
     data = show_result[0]
 
-    show_params_result = execute(session, f"SHOW PARAMETERS FOR WAREHOUSE {fqn}")
+    show_params_result = execute(session, f"SHOW PARAMETERS FOR WAREHOUSE {fqn}", cacheable=True)
     params = params_result_to_dict(show_params_result)
 
     resource_monitor = None if data["resource_monitor"] == "null" else data["resource_monitor"]
@@ -2414,9 +2905,8 @@ def list_account_scoped_resource(session: SnowflakeConnection, resource) -> list
 
 
 def list_schema_scoped_resource(session: SnowflakeConnection, resource) -> list[FQN]:
-    show_result = execute(session, f"SHOW {resource} IN ACCOUNT")
     resources = []
-    for row in show_result:
+    for row in execute_stream(session, f"SHOW {resource} IN ACCOUNT"):
         if row["database_name"] in SYSTEM_DATABASES:
             continue
         resources.append(
@@ -2603,7 +3093,11 @@ def list_grants(session: SnowflakeConnection) -> list[FQN]:
         role_name = resource_name_from_snowflake_metadata(role["name"])
         if role_name in SYSTEM_ROLES:
             continue
-        grant_data = _show_grants_to_role(session, role_name, role_type=ResourceType.ROLE, cacheable=False)
+        grant_data = execute_stream(
+            session,
+            _show_grants_to_role_sql(role_name, ResourceType.ROLE),
+            empty_response_codes=[DOES_NOT_EXIST_ERR],
+        )
         for data in grant_data:
             if data["granted_on"] == "ROLE":
                 continue
@@ -2784,10 +3278,9 @@ def list_streams(session: SnowflakeConnection) -> list[FQN]:
 
 
 def list_tables(session: SnowflakeConnection) -> list[FQN]:
-    show_result = execute(session, "SHOW TABLES IN ACCOUNT")
     user_databases = _list_databases(session)
     tables = []
-    for row in show_result:
+    for row in execute_stream(session, "SHOW TABLES IN ACCOUNT"):
         if row["database_name"] in SYSTEM_DATABASES:
             continue
         if row["schema_name"] == "INFORMATION_SCHEMA":
@@ -2891,9 +3384,8 @@ def list_users(session: SnowflakeConnection) -> list[FQN]:
 
 
 def list_views(session: SnowflakeConnection) -> list[FQN]:
-    show_result = execute(session, "SHOW VIEWS IN ACCOUNT")
     views = []
-    for row in show_result:
+    for row in execute_stream(session, "SHOW VIEWS IN ACCOUNT"):
         if row["database_name"] in SYSTEM_DATABASES or row["schema_name"] == "INFORMATION_SCHEMA":
             continue
         if row["is_materialized"] == "true":
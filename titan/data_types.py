@@ -1,3 +1,4 @@
+import re
 from typing import Optional, Union
 
 from .enums import DataType
@@ -5,6 +6,7 @@ from .enums import DataType
 NUMBER_TYPES = ("NUMBER", "DECIMAL", "DEC", "NUMERIC", "INT", "INTEGER", "BIGINT", "SMALLINT", "TINYINT", "BYTEINT")
 FLOAT_TYPES = ("FLOAT", "FLOAT4", "FLOAT8", "REAL", "DOUBLE", "DOUBLE PRECISION", "REAL")
 VARCHAR_TYPES = ("VARCHAR", "STRING", "TEXT", "NVARCHAR", "NVARCHAR2", "CHAR VARYING", "NCHAR VARYING")
+_PARAMETERIZED_TYPE = re.compile(r"^([A-Z_ ]+?) ?\( ?(\d+) ?(?:, ?(\d+) ?)?\)$")
 
 
 def convert_to_canonical_data_type(data_type: Union[str, DataType, None]) -> Optional[str]:
@@ -12,7 +14,10 @@ def convert_to_canonical_data_type(data_type: Union[str, DataType, None]) -> Opt
         return None
     if isinstance(data_type, DataType):
         data_type = str(data_type)
-    data_type = data_type.upper()
+    data_type = " ".join(data_type.upper().split())
+    parameterized = _PARAMETERIZED_TYPE.match(data_type)
+    if parameterized:
+        return _convert_parameterized_data_type(data_type, *parameterized.groups())
     if data_type in NUMBER_TYPES:
         return "NUMBER(38,0)"
     if data_type in FLOAT_TYPES:
@@ -27,10 +32,26 @@ def convert_to_canonical_data_type(data_type: Union[str, DataType, None]) -> Opt
         return "BINARY(8388608)"
     if data_type in ("DATETIME", "TIMESTAMP", "TIMESTAMP_NTZ"):
         return "TIMESTAMP_NTZ(9)"
-    if data_type in ("TIMESTAMP_LTZ", "TIMESTAMP_TZ"):
-        return "TIMESTAMP_LTZ(9)"
-    if data_type in ("TIME"):
-        return "TIME(9)"
+    if data_type in ("TIMESTAMP_LTZ", "TIMESTAMP_TZ", "TIME"):
+        return f"{data_type}(9)"
+    return data_type
+
+
+def _convert_parameterized_data_type(data_type: str, base: str, precision: str, scale: Optional[str]) -> str:
+    # Spell a type with a length, precision or scale the way Snowflake describes it, eg. DECIMAL(10, 2) as
+    # NUMBER(10,2)
+    if base in NUMBER_TYPES:
+        return f"NUMBER({precision},{scale or 0})"
+    if scale is not None:
+        return data_type
+    if base in VARCHAR_TYPES or base in ("CHAR", "CHARACTER", "NCHAR"):
+        return f"VARCHAR({precision})"
+    if base in ("BINARY", "VARBINARY"):
+        return f"BINARY({precision})"
+    if base in ("DATETIME", "TIMESTAMP", "TIMESTAMP_NTZ"):
+        return f"TIMESTAMP_NTZ({precision})"
+    if base in ("TIMESTAMP_LTZ", "TIMESTAMP_TZ", "TIME"):
+        return f"{base}({precision})"
     return data_type
 
 
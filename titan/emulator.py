@@ -0,0 +1,1049 @@
+import json
+import re
+import threading
+from dataclasses import MISSING, dataclass, fields
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from snowflake.connector.errors import ProgrammingError
+
+from .client import DOES_NOT_EXIST_ERR, OBJECT_ALREADY_EXISTS_ERR, SYNTAX_ERROR
+from .data_types import convert_to_canonical_data_type
+from .enums import AccountEdition, ResourceType
+from .identifiers import parse_FQN
+from .parse import _parse_create_header, _parse_props, _parse_table_schema
+from .privs import all_privs_for_resource_type
+from .resource_name import ResourceName
+from .resources import Database, Role, Schema, Table, Warehouse
+
+
+SYSTEM_ROLES = ("ACCOUNTADMIN", "SECURITYADMIN", "SYSADMIN", "USERADMIN", "PUBLIC")
+
+# Role grants every Snowflake account starts with
+_SYSTEM_ROLE_HIERARCHY = (
+    ("SECURITYADMIN", "ACCOUNTADMIN"),
+    ("SYSADMIN", "ACCOUNTADMIN"),
+    ("USERADMIN", "SECURITYADMIN"),
+)
+
+_RESOURCE_CLASSES = {
+    ResourceType.DATABASE: Database,
+    ResourceType.ROLE: Role,
+    ResourceType.SCHEMA: Schema,
+    ResourceType.TABLE: Table,
+    ResourceType.WAREHOUSE: Warehouse,
+}
+
+_SHOW_NOUNS = {
+    "DATABASES": ResourceType.DATABASE,
+    "ROLES": ResourceType.ROLE,
+    "SCHEMAS": ResourceType.SCHEMA,
+    "TABLES": ResourceType.TABLE,
+    "WAREHOUSES": ResourceType.WAREHOUSE,
+}
+
+# Object parameters returned by SHOW PARAMETERS, and their Snowflake types
+_PARAMETERS = {
+    ResourceType.DATABASE: {
+        "max_data_extension_time_in_days": "NUMBER",
+        "external_volume": "STRING",
+        "catalog": "STRING",
+        "default_ddl_collation": "STRING",
+    },
+    ResourceType.SCHEMA: {
+        "max_data_extension_time_in_days": "NUMBER",
+        "default_ddl_collation": "STRING",
+    },
+    ResourceType.TABLE: {
+        "default_ddl_collation": "STRING",
+    },
+    ResourceType.WAREHOUSE: {
+        "max_concurrency_level": "NUMBER",
+        "statement_queued_timeout_in_seconds": "NUMBER",
+        "statement_timeout_in_seconds": "NUMBER",
+    },
+}
+
+_IDENTIFIER = r'(?:"(?:[^"]|"")*"|[\w$]+)'
+_FQN = rf"{_IDENTIFIER}(?:\.{_IDENTIFIER}){{0,2}}"
+_TYPES = r"DATABASE|SCHEMA|TABLE|ROLE|WAREHOUSE"
+_GRANTEE = rf"(?:(?P<to_type>ROLE|USER)\s+)?(?P<to>{_IDENTIFIER})"
+
+_SESSION_SQL = re.compile(r"^SELECT\s+CURRENT_ACCOUNT_NAME\(\)", re.IGNORECASE)
+_USE = re.compile(r"^(USE\s+(ROLE|SECONDARY\s+ROLES|WAREHOUSE|DATABASE|SCHEMA)|ALTER\s+SESSION)\b", re.IGNORECASE)
+_SHOW_OBJECTS = re.compile(
+    rf"^SHOW\s+(?P<noun>DATABASES|ROLES|SCHEMAS|TABLES|WAREHOUSES)"
+    rf"(?:\s+LIKE\s+'(?P<like>[^']*)')?"
+    rf"(?:\s+IN\s+(?:ACCOUNT|DATABASE\s+(?P<database>{_IDENTIFIER})|SCHEMA\s+(?P<schema>{_FQN})))?$",
+    re.IGNORECASE,
+)
+_SHOW_PARAMETERS = re.compile(
+    rf"^SHOW\s+PARAMETERS\s+(?:IN|FOR)\s+(?P<type>{_TYPES})\s+(?P<fqn>{_FQN})$", re.IGNORECASE
+)
+_SHOW_GRANTS_TO = re.compile(rf"^SHOW\s+(?P<future>FUTURE\s+)?GRANTS\s+TO\s+{_GRANTEE}$", re.IGNORECASE)
+_SHOW_GRANTS_OF = re.compile(rf"^SHOW\s+GRANTS\s+OF\s+ROLE\s+(?P<role>{_IDENTIFIER})$", re.IGNORECASE)
+_SHOW_GRANTS_ON_ACCOUNT = re.compile(r"^SHOW\s+GRANTS\s+ON\s+ACCOUNT$", re.IGNORECASE)
+_DESC_TABLE = re.compile(rf"^DESC(?:RIBE)?\s+TABLE\s+(?P<fqn>{_FQN})$", re.IGNORECASE)
+_INFORMATION_SCHEMA_COLUMNS = re.compile(
+    rf"^SELECT\s+.+?\s+FROM\s+(?P<database>{_IDENTIFIER})\.INFORMATION_SCHEMA\.COLUMNS\b", re.IGNORECASE | re.DOTALL
+)
+_DATA_TYPE = re.compile(r"^(?P<base>\w+)(?:\((?P<size>\d+)(?:,\s*(?P<scale>\d+))?\))?$")
+_CREATE = re.compile(
+    rf"^CREATE\s+(?P<or_replace>OR\s+REPLACE\s+)?(?P<transient>TRANSIENT\s+)?(?P<type>{_TYPES})\s+"
+    rf"(?P<if_not_exists>IF\s+NOT\s+EXISTS\s+)?(?P<fqn>{_FQN})",
+    re.IGNORECASE,
+)
+_ALTER = re.compile(
+    rf"^ALTER\s+(?P<type>{_TYPES})\s+(?:IF\s+EXISTS\s+)?(?P<fqn>{_FQN})\s+"
+    r"(?P<action>SET|UNSET|RENAME\s+TO|ENABLE\s+MANAGED\s+ACCESS|DISABLE\s+MANAGED\s+ACCESS"
+    r"|ADD\s+COLUMN|DROP\s+COLUMN|RENAME\s+COLUMN|ALTER)\b\s*(?P<rest>.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+_RENAME_COLUMN = re.compile(rf"^(?P<name>{_IDENTIFIER})\s+TO\s+(?P<new_name>{_IDENTIFIER})$", re.IGNORECASE)
+_ALTER_COLUMN = re.compile(
+    rf"COLUMN\s+(?P<name>{_IDENTIFIER})\s+(?P<action>SET\s+DATA\s+TYPE\s+(?P<data_type>.+?)|SET\s+NOT\s+NULL"
+    r"|DROP\s+NOT\s+NULL|COMMENT\s+(?:'(?P<comment>(?:[^']|'')*)'|\$\$(?P<dollar_comment>.*?)\$\$)"
+    r"|UNSET\s+COMMENT|DROP\s+DEFAULT)"
+    r"\s*(?:,\s*(?=COLUMN\s)|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+_DROP = re.compile(
+    rf"^DROP\s+(?P<type>{_TYPES})\s+(?P<if_exists>IF\s+EXISTS\s+)?(?P<fqn>{_FQN})(?:\s+(?:RESTRICT|CASCADE))?$",
+    re.IGNORECASE,
+)
+_GRANT_OWNERSHIP = re.compile(
+    rf"^GRANT\s+OWNERSHIP\s+ON\s+(?P<type>{_TYPES})\s+(?P<fqn>{_FQN})\s+TO\s+{_GRANTEE}"
+    r"(?:\s+(?:COPY|REVOKE)\s+CURRENT\s+GRANTS)?$",
+    re.IGNORECASE,
+)
+_GRANT_ROLE = re.compile(
+    rf"^(?P<verb>GRANT|REVOKE)\s+ROLE\s+(?P<role>{_IDENTIFIER})\s+(?:TO|FROM)\s+(?P<to_type>ROLE|USER)\s+(?P<to>{_IDENTIFIER})$",
+    re.IGNORECASE,
+)
+_GRANT_PRIVILEGES = re.compile(
+    rf"^(?P<verb>GRANT|REVOKE)\s+(?P<privs>.+?)\s+ON\s+(?P<on>.+?)\s+(?:TO|FROM)\s+{_GRANTEE}"
+    r"(?P<grant_option>\s+WITH\s+GRANT\s+OPTION)?(?:\s+(?:CASCADE|RESTRICT))?$",
+    re.IGNORECASE | re.DOTALL,
+)
+_FUTURE_COLLECTION = re.compile(
+    rf"^FUTURE\s+(?P<plural>[A-Z ]+?)\s+IN\s+(?P<in_type>DATABASE|SCHEMA)\s+(?P<in_name>{_FQN})$", re.IGNORECASE
+)
+_OBJECT = re.compile(rf"^(?P<type>[A-Z_ ]+?)\s+(?P<fqn>{_FQN})$", re.IGNORECASE)
+
+
+def _normalize(identifier: str) -> str:
+    return ResourceName(identifier).normalized()
+
+
+def _display_name(parts: tuple) -> str:
+    # Metadata names: bare for a single part, dotted and quoted where needed otherwise
+    parts = tuple(part for part in parts if part is not None)
+    if len(parts) == 1:
+        return parts[0]
+    return ".".join(str(ResourceName(f'"{part}"')) if _needs_quotes(part) else part for part in parts)
+
+
+def _needs_quotes(name: str) -> bool:
+    return re.match(r"^[A-Z_][A-Z0-9_$]*$", name) is None
+
+
+def _metadata_value(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _error(msg: str, errno: int = DOES_NOT_EXIST_ERR) -> ProgrammingError:
+    return ProgrammingError(msg=msg, errno=errno)
+
+
+@dataclass
+class EmulatedObject:
+    resource_type: ResourceType
+    database: Optional[str]
+    schema: Optional[str]
+    name: str
+    data: dict
+    owner: str
+    created_on: datetime
+
+    @property
+    def key(self) -> tuple:
+        return (self.database, self.schema, self.name)
+
+    @property
+    def display_name(self) -> str:
+        return _display_name(self.key)
+
+
+@dataclass
+class EmulatedGrant:
+    privilege: str
+    granted_on: str
+    name: str
+    granted_to: str
+    grantee_name: str
+    grant_option: bool
+    granted_by: str
+    created_on: datetime
+
+
+class EmulatedAccount:
+    """
+    An in-memory model of a Snowflake account's metadata, for running plans and applies at scale without a
+    network. It holds databases, schemas, tables, roles, warehouses, privilege grants, future grants and role
+    grants, answers the SHOW and DESC statements the data provider runs for them, and applies the CREATE,
+    ALTER, DROP, GRANT and REVOKE statements Titan generates.
+
+    Access control isn't modeled: every statement runs as if the active role were allowed to run it.
+    Statements the emulator doesn't understand raise NotImplementedError.
+    """
+
+    def __init__(
+        self,
+        account: str = "EMULATED",
+        account_locator: str = "EMU00000",
+        edition: AccountEdition = AccountEdition.ENTERPRISE,
+        region: str = "AWS_US_WEST_2",
+        user: str = "TITAN",
+    ):
+        self.account = account
+        self.account_locator = account_locator
+        self.edition = AccountEdition(edition)
+        self.region = region
+        self.user = user
+        # resource type => (database, schema) => name => object
+        self._objects: dict[ResourceType, dict[tuple, dict[str, EmulatedObject]]] = {
+            resource_type: {} for resource_type in _RESOURCE_CLASSES
+        }
+        # (granted_to, grantee) => (privilege, granted_on, name) => grant
+        self._grants: dict[tuple[str, str], dict[tuple[str, str, str], EmulatedGrant]] = {}
+        # (granted_on, name) => (granted_to, grantee, privilege), so dropping an object doesn't scan every grant
+        self._grants_on: dict[tuple[str, str], set[tuple[str, str, str]]] = {}
+        # (grant_to, grantee) => (privilege, grant_on, name) => grant option
+        self._future_grants: dict[tuple[str, str], dict[tuple[str, str, str], bool]] = {}
+        # role => (granted_to, grantee) => granted_by
+        self._role_grants: dict[str, dict[tuple[str, str], str]] = {}
+        self._lock = threading.RLock()
+
+        for role in SYSTEM_ROLES:
+            self.add(ResourceType.ROLE, role, owner="" if role == "PUBLIC" else "ACCOUNTADMIN")
+        for role, parent in _SYSTEM_ROLE_HIERARCHY:
+            self._role_grants.setdefault(role, {})[("ROLE", parent)] = ""
+        self._role_grants.setdefault("ACCOUNTADMIN", {})[("USER", user)] = ""
+
+    def session(self, role: str = "SYSADMIN") -> "EmulatedSession":
+        return EmulatedSession(self, role=role)
+
+    def session_factory(self) -> "EmulatedSession":
+        return self.session()
+
+    def __len__(self) -> int:
+        return sum(len(names) for containers in self._objects.values() for names in containers.values())
+
+    # ------------------------------
+    # Objects
+    # ------------------------------
+
+    def add(
+        self,
+        resource_type: ResourceType,
+        name: str,
+        database: Optional[str] = None,
+        schema: Optional[str] = None,
+        owner: str = "SYSADMIN",
+        **data,
+    ) -> EmulatedObject:
+        """
+        Create an object directly, without parsing SQL, eg. to generate a large synthetic account. Fields that
+        aren't given take the resource's defaults.
+        """
+        resource_cls = _RESOURCE_CLASSES[resource_type]
+        defaults = _spec_defaults(resource_cls, self.edition)
+        obj = EmulatedObject(
+            resource_type=resource_type,
+            database=_normalize(database) if database else None,
+            schema=_normalize(schema) if schema else None,
+            name=_normalize(name),
+            data={**defaults, **data},
+            owner=owner,
+            created_on=datetime.now(timezone.utc),
+        )
+        self._store(obj)
+        return obj
+
+    def get(self, resource_type: ResourceType, fqn: str) -> Optional[EmulatedObject]:
+        return self._find(resource_type, *self._object_key(resource_type, fqn))
+
+    def _object_key(self, resource_type: ResourceType, fqn_str: str) -> tuple:
+        fqn = parse_FQN(fqn_str, is_db_scoped=resource_type == ResourceType.SCHEMA)
+        database = fqn.database.normalized() if fqn.database else None
+        schema = fqn.schema.normalized() if fqn.schema else None
+        return (database, schema, fqn.name.normalized())
+
+    def _find(self, resource_type: ResourceType, database, schema, name) -> Optional[EmulatedObject]:
+        return self._objects[resource_type].get((database, schema), {}).get(name)
+
+    def _require(self, resource_type: ResourceType, fqn: str) -> EmulatedObject:
+        obj = self.get(resource_type, fqn)
+        if obj is None:
+            raise _error(f"{resource_type} '{fqn}' does not exist or not authorized.")
+        return obj
+
+    def _store(self, obj: EmulatedObject) -> None:
+        self._objects[obj.resource_type].setdefault((obj.database, obj.schema), {})[obj.name] = obj
+        if obj.owner:
+            self._set_owner(obj, obj.owner)
+        if (
+            obj.resource_type == ResourceType.DATABASE
+            and self._find(ResourceType.SCHEMA, obj.name, None, "PUBLIC") is None
+        ):
+            self.add(ResourceType.SCHEMA, "PUBLIC", database=obj.name, owner=obj.owner)
+
+    def _remove(self, obj: EmulatedObject) -> None:
+        container = self._objects[obj.resource_type].get((obj.database, obj.schema), {})
+        container.pop(obj.name, None)
+        if not container:
+            self._objects[obj.resource_type].pop((obj.database, obj.schema), None)
+        self._revoke_all_on(obj)
+        if obj.resource_type == ResourceType.ROLE:
+            self._grants.pop(("ROLE", obj.name), None)
+            self._future_grants.pop(("ROLE", obj.name), None)
+            self._role_grants.pop(obj.name, None)
+            for grantees in self._role_grants.values():
+                grantees.pop(("ROLE", obj.name), None)
+        for child in self._children(obj):
+            self._remove(child)
+
+    def _children(self, obj: EmulatedObject) -> list[EmulatedObject]:
+        if obj.resource_type == ResourceType.DATABASE:
+            containers = [(ResourceType.SCHEMA, (obj.name, None))]
+        elif obj.resource_type == ResourceType.SCHEMA:
+            containers = [(ResourceType.TABLE, (obj.database, obj.name))]
+        else:
+            return []
+        return [
+            child
+            for resource_type, container in containers
+            for child in list(self._objects[resource_type].get(container, {}).values())
+        ]
+
+    def _rename(self, obj: EmulatedObject, new_fqn: str) -> None:
+        children = self._children(obj)
+        self._remove_entry(obj)
+        database, schema, name = self._object_key(obj.resource_type, new_fqn)
+        grants = self._revoke_all_on(obj)
+        obj.database = database or obj.database
+        obj.schema = schema or obj.schema
+        obj.name = name
+        obj.data["name"] = name
+        self._objects[obj.resource_type].setdefault((obj.database, obj.schema), {})[obj.name] = obj
+        for grant in grants:
+            grant.name = obj.display_name
+            self._put_grant(grant)
+        for child in children:
+            child_grants = self._revoke_all_on(child)
+            self._remove_entry(child)
+            if obj.resource_type == ResourceType.DATABASE:
+                child.database = obj.name
+            else:
+                child.schema = obj.name
+            self._objects[child.resource_type].setdefault((child.database, child.schema), {})[child.name] = child
+            for grant in child_grants:
+                grant.name = child.display_name
+                self._put_grant(grant)
+
+    def _remove_entry(self, obj: EmulatedObject) -> None:
+        container = self._objects[obj.resource_type][(obj.database, obj.schema)]
+        del container[obj.name]
+        if not container:
+            del self._objects[obj.resource_type][(obj.database, obj.schema)]
+
+    def _objects_of_type(self, resource_type: ResourceType, database=None, schema=None) -> list[EmulatedObject]:
+        containers = self._objects[resource_type]
+        if schema is not None:
+            return list(containers.get((database, schema), {}).values())
+        return [
+            obj
+            for (container_database, _), names in containers.items()
+            if database is None or container_database == database
+            for obj in names.values()
+        ]
+
+    # ------------------------------
+    # Grants
+    # ------------------------------
+
+    def _put_grant(self, grant: EmulatedGrant) -> None:
+        grants = self._grants.setdefault((grant.granted_to, grant.grantee_name), {})
+        grants[(grant.privilege, grant.granted_on, grant.name)] = grant
+        self._grants_on.setdefault((grant.granted_on, grant.name), set()).add(
+            (grant.granted_to, grant.grantee_name, grant.privilege)
+        )
+
+    def _grant(self, privilege, granted_on, name, grantee, grant_option=False, granted_to="ROLE", granted_by=""):
+        self._put_grant(
+            EmulatedGrant(
+                privilege=privilege,
+                granted_on=granted_on,
+                name=name,
+                granted_to=granted_to,
+                grantee_name=grantee,
+                grant_option=grant_option,
+                granted_by=granted_by,
+                created_on=datetime.now(timezone.utc),
+            )
+        )
+
+    def _revoke(self, privilege, granted_on, name, grantee, granted_to="ROLE") -> None:
+        self._grants.get((granted_to, grantee), {}).pop((privilege, granted_on, name), None)
+        self._grants_on.get((granted_on, name), set()).discard((granted_to, grantee, privilege))
+
+    def _revoke_all_on(self, obj: EmulatedObject) -> list[EmulatedGrant]:
+        granted_on, name = str(obj.resource_type).replace(" ", "_"), obj.display_name
+        revoked = []
+        for granted_to, grantee, privilege in self._grants_on.pop((granted_on, name), ()):
+            grant = self._grants.get((granted_to, grantee), {}).pop((privilege, granted_on, name), None)
+            if grant is not None:
+                revoked.append(grant)
+        return revoked
+
+    def _set_owner(self, obj: EmulatedObject, owner: str) -> None:
+        granted_on = str(obj.resource_type).replace(" ", "_")
+        if obj.owner:
+            self._revoke("OWNERSHIP", granted_on, obj.display_name, obj.owner)
+        obj.owner = owner
+        obj.data["owner"] = owner
+        self._grant("OWNERSHIP", granted_on, obj.display_name, owner, grant_option=True, granted_by=owner)
+
+    def _available_roles(self, user: str) -> list[str]:
+        roles = [role for role, grantees in self._role_grants.items() if ("USER", user) in grantees]
+        seen = set(roles) | {"PUBLIC"}
+        while roles:
+            role = roles.pop()
+            for granted_role, grantees in self._role_grants.items():
+                if ("ROLE", role) in grantees and granted_role not in seen:
+                    seen.add(granted_role)
+                    roles.append(granted_role)
+        return sorted(seen)
+
+    # ------------------------------
+    # Statements
+    # ------------------------------
+
+    def execute(self, session: "EmulatedSession", sql: str) -> list[dict]:
+        sql = sql.strip().rstrip(";").strip()
+        with self._lock:
+            if _SESSION_SQL.match(sql):
+                return [self._session_row(session)]
+            if _USE.match(sql):
+                return self._use(session, sql)
+            for pattern, handler in self._handlers():
+                match = pattern.match(sql)
+                if match:
+                    return handler(session, match, sql)
+        raise NotImplementedError(f"The emulator doesn't support: {sql}")
+
+    def _handlers(self):
+        return (
+            (_SHOW_OBJECTS, self._show_objects),
+            (_SHOW_PARAMETERS, self._show_parameters),
+            (_SHOW_GRANTS_ON_ACCOUNT, self._show_grants_on_account),
+            (_SHOW_GRANTS_TO, self._show_grants_to),
+            (_SHOW_GRANTS_OF, self._show_grants_of),
+            (_DESC_TABLE, self._desc_table),
+            (_INFORMATION_SCHEMA_COLUMNS, self._information_schema_columns),
+            (_CREATE, self._create),
+            (_ALTER, self._alter),
+            (_DROP, self._drop),
+            (_GRANT_OWNERSHIP, self._grant_ownership),
+            (_GRANT_ROLE, self._grant_role),
+            (_GRANT_PRIVILEGES, self._grant_privileges),
+        )
+
+    def _session_row(self, session: "EmulatedSession") -> dict:
+        return {
+            "ACCOUNT": self.account,
+            "ACCOUNT_LOCATOR": self.account_locator,
+            "USER": session.user,
+            "ROLE": session.role,
+            "AVAILABLE_ROLES": json.dumps(self._available_roles(session.user)),
+            "SECONDARY_ROLES": json.dumps({"roles": "", "value": ""}),
+            "DATABASE": None,
+            "SCHEMAS": "[]",
+            "WAREHOUSE": None,
+            "VERSION": "8.40.0",
+            "REGION": self.region,
+            "ACCOUNT_DATA": json.dumps({"accountInfo": {"serviceLevelName": str(self.edition)}}),
+        }
+
+    def _use(self, session: "EmulatedSession", sql: str) -> list[dict]:
+        words = sql.split()
+        if words[0].upper() == "USE" and words[1].upper() == "ROLE":
+            role = _normalize(sql.split(None, 2)[2])
+            if self._find(ResourceType.ROLE, None, None, role) is None:
+                raise _error(f"Role '{role}' does not exist or not authorized.")
+            session.role = role
+        return [{"status": "Statement executed successfully."}]
+
+    # SHOW and DESC
+
+    def _show_objects(self, session, match, sql) -> list[dict]:
+        resource_type = _SHOW_NOUNS[match.group("noun").upper()]
+        database = schema = None
+        if match.group("database"):
+            database = _normalize(match.group("database"))
+            if self._find(ResourceType.DATABASE, None, None, database) is None:
+                raise _error(f"Database '{database}' does not exist or not authorized.")
+        elif match.group("schema"):
+            database, _, schema = self._object_key(ResourceType.SCHEMA, match.group("schema"))
+            if self._find(ResourceType.SCHEMA, database, None, schema) is None:
+                raise _error(f"Schema '{match.group('schema')}' does not exist or not authorized.")
+        objects = self._objects_of_type(resource_type, database, schema)
+        like = match.group("like")
+        if like is not None:
+            pattern = re.compile(re.escape(like).replace("%", ".*").replace("_", "."), re.IGNORECASE)
+            objects = [obj for obj in objects if pattern.fullmatch(obj.name)]
+        render = getattr(self, f"_show_{resource_type.name.lower()}_row")
+        return [render(obj) for obj in sorted(objects, key=lambda obj: obj.key)]
+
+    def _show_database_row(self, obj: EmulatedObject) -> dict:
+        return {
+            "created_on": obj.created_on,
+            "name": obj.name,
+            "is_default": "N",
+            "is_current": "N",
+            "origin": "",
+            "owner": obj.owner,
+            "comment": obj.data["comment"] or "",
+            "options": "TRANSIENT" if obj.data["transient"] else "",
+            "retention_time": str(obj.data["data_retention_time_in_days"]),
+            "kind": "STANDARD",
+            "owner_role_type": "ROLE",
+        }
+
+    def _show_schema_row(self, obj: EmulatedObject) -> dict:
+        options = [
+            option
+            for option, on in (("TRANSIENT", obj.data["transient"]), ("MANAGED ACCESS", obj.data["managed_access"]))
+            if on
+        ]
+        return {
+            "created_on": obj.created_on,
+            "name": obj.name,
+            "is_default": "N",
+            "is_current": "N",
+            "database_name": obj.database,
+            "owner": obj.owner,
+            "comment": obj.data["comment"] or "",
+            "options": ", ".join(options),
+            "retention_time": str(obj.data["data_retention_time_in_days"]),
+            "owner_role_type": "ROLE",
+        }
+
+    def _show_table_row(self, obj: EmulatedObject) -> dict:
+        cluster_by = obj.data["cluster_by"]
+        return {
+            "created_on": obj.created_on,
+            "name": obj.name,
+            "database_name": obj.database,
+            "schema_name": obj.schema,
+            "kind": "TRANSIENT" if obj.data["transient"] else "TABLE",
+            "comment": obj.data["comment"] or "",
+            "cluster_by": f"LINEAR({', '.join(cluster_by)})" if cluster_by else "",
+            "rows": 0,
+            "bytes": 0,
+            "owner": obj.owner,
+            "retention_time": _metadata_value(obj.data["data_retention_time_in_days"] or 1),
+            "change_tracking": "ON" if obj.data["change_tracking"] else "OFF",
+            "enable_schema_evolution": "Y" if obj.data["enable_schema_evolution"] else "N",
+            "owner_role_type": "ROLE",
+            "is_external": "N",
+            "is_event": "N",
+            "is_hybrid": "N",
+            "is_iceberg": "N",
+            "is_dynamic": "N",
+        }
+
+    def _show_role_row(self, obj: EmulatedObject) -> dict:
+        return {
+            "created_on": obj.created_on,
+            "name": obj.name,
+            "is_default": "N",
+            "is_current": "N",
+            "is_inherited": "N",
+            "assigned_to_users": sum(1 for to_type, _ in self._role_grants.get(obj.name, {}) if to_type == "USER"),
+            "granted_to_roles": sum(1 for to_type, _ in self._role_grants.get(obj.name, {}) if to_type == "ROLE"),
+            "granted_roles": sum(1 for grantees in self._role_grants.values() if ("ROLE", obj.name) in grantees),
+            "owner": obj.owner,
+            "comment": obj.data["comment"] or "",
+        }
+
+    def _show_warehouse_row(self, obj: EmulatedObject) -> dict:
+        data = obj.data
+        return {
+            "name": obj.name,
+            "state": "SUSPENDED",
+            "type": data["warehouse_type"],
+            "size": data["warehouse_size"],
+            "min_cluster_count": data["min_cluster_count"],
+            "max_cluster_count": data["max_cluster_count"],
+            "scaling_policy": data["scaling_policy"],
+            "auto_suspend": data["auto_suspend"],
+            "auto_resume": _metadata_value(data["auto_resume"]),
+            "resource_monitor": data["resource_monitor"] or "null",
+            "comment": data["comment"] or "",
+            "enable_query_acceleration": _metadata_value(data["enable_query_acceleration"]),
+            "query_acceleration_max_scale_factor": data["query_acceleration_max_scale_factor"],
+            "owner": obj.owner,
+            "owner_role_type": "ROLE",
+            "created_on": obj.created_on,
+        }
+
+    def _show_parameters(self, session, match, sql) -> list[dict]:
+        resource_type = ResourceType(match.group("type").upper())
+        obj = self._require(resource_type, match.group("fqn"))
+        return [
+            {
+                "key": key.upper(),
+                "value": _metadata_value(obj.data.get(key)),
+                "default": "",
+                "level": str(resource_type),
+                "description": "",
+                "type": param_type,
+            }
+            for key, param_type in _PARAMETERS[resource_type].items()
+        ]
+
+    def _desc_table(self, session, match, sql) -> list[dict]:
+        obj = self._require(ResourceType.TABLE, match.group("fqn"))
+        return [
+            {
+                "name": column["name"],
+                "type": (
+                    f"{column['data_type']} COLLATE '{column['collate']}'" if column["collate"] else column["data_type"]
+                ),
+                "kind": "COLUMN",
+                "null?": "N" if column["not_null"] else "Y",
+                "default": _default_sql(column["default"]),
+                "primary key": "N",
+                "unique key": "N",
+                "check": None,
+                "expression": None,
+                "comment": column["comment"],
+                "policy name": None,
+            }
+            for column in obj.data["columns"] or []
+        ]
+
+    def _information_schema_columns(self, session, match, sql) -> list[dict]:
+        database = _normalize(match.group("database"))
+        if self._find(ResourceType.DATABASE, None, None, database) is None:
+            raise _error(f"Database '{database}' does not exist or not authorized.")
+        rows = []
+        for (table_database, schema), tables in sorted(self._objects[ResourceType.TABLE].items()):
+            if table_database != database:
+                continue
+            for name, obj in sorted(tables.items()):
+                for column in obj.data["columns"] or []:
+                    rows.append(_information_schema_column(schema, name, column))
+        return rows
+
+    def _grant_rows(self, grants) -> list[dict]:
+        return [
+            {
+                "created_on": grant.created_on,
+                "privilege": grant.privilege,
+                "granted_on": grant.granted_on,
+                "name": self.account if grant.granted_on == "ACCOUNT" else grant.name,
+                "granted_to": grant.granted_to,
+                "grantee_name": grant.grantee_name,
+                "grant_option": _metadata_value(grant.grant_option),
+                "granted_by": grant.granted_by,
+            }
+            for grant in grants
+        ]
+
+    def _show_grants_on_account(self, session, match, sql) -> list[dict]:
+        return self._grant_rows(
+            grant for grants in self._grants.values() for grant in grants.values() if grant.granted_on == "ACCOUNT"
+        )
+
+    def _show_grants_to(self, session, match, sql) -> list[dict]:
+        to_type = (match.group("to_type") or "ROLE").upper()
+        grantee = _normalize(match.group("to"))
+        if to_type == "ROLE" and self._find(ResourceType.ROLE, None, None, grantee) is None:
+            raise _error(f"Role '{grantee}' does not exist or not authorized.")
+        if match.group("future"):
+            return [
+                {
+                    "created_on": None,
+                    "privilege": privilege,
+                    "grant_on": grant_on,
+                    "name": name,
+                    "grant_to": to_type,
+                    "grantee_name": grantee,
+                    "grant_option": _metadata_value(grant_option),
+                }
+                for (privilege, grant_on, name), grant_option in self._future_grants.get((to_type, grantee), {}).items()
+            ]
+        grants = list(self._grants.get((to_type, grantee), {}).values())
+        if to_type == "ROLE":
+            for role, grantees in self._role_grants.items():
+                if ("ROLE", grantee) in grantees:
+                    grants.append(
+                        EmulatedGrant("USAGE", "ROLE", role, "ROLE", grantee, False, grantees[("ROLE", grantee)], None)
+                    )
+        return self._grant_rows(grants)
+
+    def _show_grants_of(self, session, match, sql) -> list[dict]:
+        role = _normalize(match.group("role"))
+        if self._find(ResourceType.ROLE, None, None, role) is None:
+            raise _error(f"Role '{role}' does not exist or not authorized.")
+        return [
+            {"created_on": None, "role": role, "granted_to": to_type, "grantee_name": grantee, "granted_by": granted_by}
+            for (to_type, grantee), granted_by in self._role_grants.get(role, {}).items()
+        ]
+
+    # DDL
+
+    def _create(self, session, match, sql) -> list[dict]:
+        resource_type = ResourceType(match.group("type").upper())
+        resource_cls = _RESOURCE_CLASSES[resource_type]
+        database, schema, name = self._object_key(resource_type, match.group("fqn"))
+        existing = self._find(resource_type, database, schema, name)
+        if existing and match.group("if_not_exists"):
+            return [{"status": f"{name} already exists, statement succeeded."}]
+        if existing and not match.group("or_replace"):
+            raise _error(f"Object '{name}' already exists.", errno=OBJECT_ALREADY_EXISTS_ERR)
+        if resource_type == ResourceType.SCHEMA and self._find(ResourceType.DATABASE, None, None, database) is None:
+            raise _error(f"Database '{database}' does not exist or not authorized.")
+        if resource_type == ResourceType.TABLE and self._find(ResourceType.SCHEMA, database, None, schema) is None:
+            raise _error(f"Schema '{database}.{schema}' does not exist or not authorized.")
+
+        header_sql = sql if not match.group("transient") else sql.replace(match.group("transient"), "", 1)
+        identifier, remainder = _parse_create_header(header_sql, resource_type, resource_cls.scope)
+        if resource_type == ResourceType.TABLE:
+            table_schema, remainder = _parse_table_schema(remainder)
+            identifier.update(table_schema)
+        props = _parse_props(resource_cls.props, remainder) if remainder.strip() else {}
+        data = resource_cls(**identifier, **props).to_dict(self.edition)
+        data["name"] = name
+        if resource_type in (ResourceType.DATABASE, ResourceType.SCHEMA, ResourceType.TABLE):
+            data["transient"] = bool(match.group("transient"))
+        if existing:
+            self._remove(existing)
+        self._store(
+            EmulatedObject(
+                resource_type=resource_type,
+                database=database,
+                schema=schema,
+                name=name,
+                data=data,
+                owner=session.role,
+                created_on=datetime.now(timezone.utc),
+            )
+        )
+        return [{"status": f"{resource_type} {name} successfully created."}]
+
+    def _alter(self, session, match, sql) -> list[dict]:
+        resource_type = ResourceType(match.group("type").upper())
+        resource_cls = _RESOURCE_CLASSES[resource_type]
+        obj = self._require(resource_type, match.group("fqn"))
+        action = " ".join(match.group("action").upper().split())
+        rest = match.group("rest").strip()
+        if action == "SET":
+            props = _parse_props(resource_cls.props, rest)
+            if not props:
+                raise _error(f"SQL compilation error: {sql}", errno=SYNTAX_ERROR)
+            obj.data.update(props)
+        elif action == "UNSET":
+            defaults = _spec_defaults(resource_cls, self.edition)
+            for attr in rest.split(","):
+                attr = attr.strip().lower()
+                obj.data[attr] = defaults.get(attr)
+        elif action == "RENAME TO":
+            self._rename(obj, rest)
+        elif action == "ENABLE MANAGED ACCESS":
+            obj.data["managed_access"] = True
+        elif action == "DISABLE MANAGED ACCESS":
+            obj.data["managed_access"] = False
+        else:
+            self._alter_columns(obj, action, rest, sql)
+        return [{"status": "Statement executed successfully."}]
+
+    def _alter_columns(self, obj: EmulatedObject, action: str, rest: str, sql: str) -> None:
+        columns = obj.data["columns"]
+        positions = {_normalize(column["name"]): position for position, column in enumerate(columns)}
+
+        def _position(name: str) -> int:
+            if _normalize(name) not in positions:
+                raise _error(f"SQL compilation error: column '{name}' does not exist", errno=SYNTAX_ERROR)
+            return positions[_normalize(name)]
+
+        if action == "ADD COLUMN":
+            table_schema, _ = _parse_table_schema(f"({rest})")
+            columns.extend(Table(name=obj.name, **table_schema).to_dict(self.edition)["columns"])
+        elif action == "DROP COLUMN":
+            dropped = {_position(name.strip()) for name in rest.split(",")}
+            obj.data["columns"] = [column for position, column in enumerate(columns) if position not in dropped]
+        elif action == "RENAME COLUMN":
+            match = _RENAME_COLUMN.match(rest)
+            if match is None:
+                raise _error(f"SQL compilation error: {sql}", errno=SYNTAX_ERROR)
+            columns[_position(match.group("name"))]["name"] = _normalize(match.group("new_name"))
+        else:
+            alterations = list(_ALTER_COLUMN.finditer(rest))
+            if not alterations or alterations[-1].end() != len(rest):
+                raise NotImplementedError(f"The emulator doesn't support: {sql}")
+            for alteration in alterations:
+                column = columns[_position(alteration.group("name"))]
+                verb = " ".join(alteration.group("action").upper().split()[:2])
+                if verb == "SET DATA":
+                    column["data_type"] = convert_to_canonical_data_type(alteration.group("data_type").strip())
+                elif verb in ("SET NOT", "DROP NOT"):
+                    column["not_null"] = verb == "SET NOT"
+                elif verb.startswith("COMMENT"):
+                    if alteration.group("dollar_comment") is not None:
+                        column["comment"] = alteration.group("dollar_comment")
+                    else:
+                        column["comment"] = alteration.group("comment").replace("''", "'")
+                elif verb == "UNSET COMMENT":
+                    column["comment"] = None
+                elif verb == "DROP DEFAULT":
+                    column["default"] = None
+
+    def _drop(self, session, match, sql) -> list[dict]:
+        resource_type = ResourceType(match.group("type").upper())
+        obj = self.get(resource_type, match.group("fqn"))
+        if obj is None:
+            if match.group("if_exists"):
+                return [{"status": "Drop statement executed successfully (object already dropped)."}]
+            raise _error(f"{resource_type} '{match.group('fqn')}' does not exist or not authorized.")
+        self._remove(obj)
+        return [{"status": f"{obj.name} successfully dropped."}]
+
+    # Grants
+
+    def _grant_ownership(self, session, match, sql) -> list[dict]:
+        obj = self._require(ResourceType(match.group("type").upper()), match.group("fqn"))
+        role = self._require(ResourceType.ROLE, match.group("to"))
+        self._set_owner(obj, role.name)
+        return [{"status": "Statement executed successfully."}]
+
+    def _grant_role(self, session, match, sql) -> list[dict]:
+        role = self._require(ResourceType.ROLE, match.group("role"))
+        to_type = match.group("to_type").upper()
+        grantee = _normalize(match.group("to"))
+        if to_type == "ROLE":
+            self._require(ResourceType.ROLE, match.group("to"))
+        grantees = self._role_grants.setdefault(role.name, {})
+        if match.group("verb").upper() == "GRANT":
+            grantees[(to_type, grantee)] = session.role
+        else:
+            grantees.pop((to_type, grantee), None)
+        return [{"status": "Statement executed successfully."}]
+
+    def _grant_privileges(self, session, match, sql) -> list[dict]:
+        is_grant = match.group("verb").upper() == "GRANT"
+        to_type = (match.group("to_type") or "ROLE").upper()
+        grantee = _normalize(match.group("to"))
+        if to_type == "ROLE":
+            self._require(ResourceType.ROLE, match.group("to"))
+        privileges = [" ".join(priv.upper().split()) for priv in match.group("privs").split(",")]
+        on = " ".join(match.group("on").split())
+
+        future = _FUTURE_COLLECTION.match(on)
+        if future:
+            grant_on = _singular(future.group("plural"))
+            in_key = self._object_key(ResourceType(future.group("in_type").upper()), future.group("in_name"))
+            name = f"{_display_name(in_key)}.<{grant_on}>"
+            future_grants = self._future_grants.setdefault((to_type, grantee), {})
+            for privilege in privileges:
+                if is_grant:
+                    future_grants[(privilege, grant_on, name)] = bool(match.group("grant_option"))
+                else:
+                    future_grants.pop((privilege, grant_on, name), None)
+            return [{"status": "Statement executed successfully."}]
+
+        if on.upper() == "ACCOUNT":
+            granted_on, name, resource_type = "ACCOUNT", self.account, ResourceType.ACCOUNT
+        else:
+            target = _OBJECT.match(on)
+            if target is None:
+                raise NotImplementedError(f"The emulator doesn't support: {sql}")
+            resource_type = ResourceType(" ".join(target.group("type").upper().split()))
+            granted_on = str(resource_type).replace(" ", "_")
+            if resource_type in _RESOURCE_CLASSES:
+                name = self._require(resource_type, target.group("fqn")).display_name
+            else:
+                name = _display_name(self._object_key(resource_type, target.group("fqn")))
+
+        if privileges == ["ALL"] or privileges == ["ALL PRIVILEGES"]:
+            privileges = all_privs_for_resource_type(resource_type)
+        for privilege in privileges:
+            if is_grant:
+                self._grant(
+                    privilege, granted_on, name, grantee, bool(match.group("grant_option")), to_type, session.role
+                )
+            else:
+                self._revoke(privilege, granted_on, name, grantee, to_type)
+        return [{"status": "Statement executed successfully."}]
+
+
+def _singular(plural: str) -> str:
+    plural = " ".join(plural.upper().split())
+    if plural.endswith("IES"):
+        return plural[:-3] + "Y"
+    if plural.endswith("SES"):
+        return plural[:-2]
+    return plural[:-1] if plural.endswith("S") else plural
+
+
+_DEFAULTS: dict[tuple[type, AccountEdition], dict] = {}
+
+
+def _default_sql(default: Optional[str]) -> Optional[str]:
+    # Snowflake describes a column default as the SQL expression it evaluates
+    return None if default is None else "'" + default.replace("'", "''") + "'"
+
+
+def _information_schema_column(schema: str, table: str, column: dict) -> dict:
+    data_type = _DATA_TYPE.match(column["data_type"])
+    base, size, scale = data_type.group("base", "size", "scale") if data_type else (column["data_type"], None, None)
+    row = {
+        "TABLE_SCHEMA": schema,
+        "TABLE_NAME": table,
+        "COLUMN_NAME": column["name"],
+        "DATA_TYPE": "TEXT" if base == "VARCHAR" else base,
+        "NUMERIC_PRECISION": None,
+        "NUMERIC_SCALE": None,
+        "CHARACTER_MAXIMUM_LENGTH": None,
+        "DATETIME_PRECISION": None,
+        "COLLATION_NAME": column.get("collate"),
+        "COLUMN_DEFAULT": _default_sql(column["default"]),
+        "IS_NULLABLE": "NO" if column["not_null"] else "YES",
+        "COMMENT": column["comment"],
+    }
+    if size is None:
+        pass
+    elif base == "NUMBER":
+        row["NUMERIC_PRECISION"], row["NUMERIC_SCALE"] = int(size), int(scale or 0)
+    elif base in ("VARCHAR", "BINARY"):
+        row["CHARACTER_MAXIMUM_LENGTH"] = int(size)
+    elif base in ("TIME", "TIMESTAMP_LTZ", "TIMESTAMP_NTZ", "TIMESTAMP_TZ"):
+        row["DATETIME_PRECISION"] = int(size)
+    return row
+
+
+def _spec_defaults(resource_cls: type, edition: AccountEdition) -> dict:
+    key = (resource_cls, edition)
+    if key not in _DEFAULTS:
+        defaults = {}
+        for field in fields(resource_cls.spec):
+            if field.default is not MISSING:
+                defaults[field.name] = field.default
+            elif field.default_factory is not MISSING:
+                defaults[field.name] = field.default_factory()
+        _DEFAULTS[key] = defaults
+    return {key: value.copy() if isinstance(value, (list, dict)) else value for key, value in _DEFAULTS[key].items()}
+
+
+class _EmulatedCursor:
+    def __init__(self, session: "EmulatedSession"):
+        self.session = session
+        self.sfqid = None
+        self._results: list[list] = []
+
+    def execute(self, sql: str, num_statements: Optional[int] = None):
+        # titan.client.execute_batch joins statements with ";\n"
+        statements = sql.split(";\n") if num_statements else [sql]
+        self._results = [self.session.account.execute(self.session, statement) for statement in statements]
+        return self
+
+    def nextset(self):
+        self._results.pop(0)
+        return self if self._results else None
+
+    def fetchall(self) -> list:
+        rows, self._results[0] = self._results[0], []
+        return rows
+
+    def fetchmany(self, size: int) -> list:
+        rows, self._results[0] = self._results[0][:size], self._results[0][size:]
+        return rows
+
+    def close(self) -> None:
+        self._results = []
+
+
+class EmulatedSession:
+    """
+    Stands in for a SnowflakeConnection to an `EmulatedAccount`.
+    """
+
+    def __init__(self, account: EmulatedAccount, role: str = "SYSADMIN"):
+        self.account = account
+        self.user = account.user
+        self.role = _normalize(role)
+        self.closed = False
+
+    def cursor(self, *args) -> _EmulatedCursor:
+        return _EmulatedCursor(self)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def generate_account(
+    databases: int = 10,
+    schemas_per_database: int = 10,
+    tables_per_schema: int = 100,
+    roles: int = 100,
+    warehouses: int = 10,
+    edition: AccountEdition = AccountEdition.ENTERPRISE,
+) -> EmulatedAccount:
+    """
+    Generate a synthetic account, eg. `generate_account(databases=10, schemas_per_database=10,
+    tables_per_schema=1000)` for 100k tables. Every role is granted usage on one database and its warehouse.
+    """
+    account = EmulatedAccount(edition=edition)
+    columns = [
+        {
+            "name": "ID",
+            "data_type": "NUMBER(38,0)",
+            "collate": None,
+            "comment": None,
+            "not_null": False,
+            "constraint": None,
+            "default": None,
+            "tags": None,
+        }
+    ]
+    for warehouse in range(warehouses):
+        account.add(ResourceType.WAREHOUSE, f"WH_{warehouse}")
+    for database in range(databases):
+        database_name = f"DB_{database}"
+        account.add(ResourceType.DATABASE, database_name)
+        for schema in range(schemas_per_database):
+            schema_name = f"SCH_{schema}"
+            account.add(ResourceType.SCHEMA, schema_name, database=database_name)
+            for table in range(tables_per_schema):
+                account.add(
+                    ResourceType.TABLE,
+                    f"T_{table}",
+                    database=database_name,
+                    schema=schema_name,
+                    columns=[column.copy() for column in columns],
+                )
+    for role in range(roles):
+        role_name = f"ROLE_{role}"
+        account.add(ResourceType.ROLE, role_name, owner="USERADMIN")
+        account._role_grants.setdefault(role_name, {})[("ROLE", "SYSADMIN")] = "USERADMIN"
+        if databases:
+            account._grant("USAGE", "DATABASE", f"DB_{role % databases}", role_name, granted_by="SYSADMIN")
+        if warehouses:
+            account._grant("USAGE", "WAREHOUSE", f"WH_{role % warehouses}", role_name, granted_by="SYSADMIN")
+    return account
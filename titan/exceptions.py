@@ -1,3 +1,6 @@
+from typing import Optional
+
+
 class MissingVarException(Exception):
     pass
 
@@ -51,4 +54,6 @@ class ResourceHasContainerException(Exception):
 
 
 class NotADAGException(Exception):
-    pass
+    def __init__(self, message: str, cycle: Optional[list] = None):
+        super().__init__(message)
+        self.cycle = cycle
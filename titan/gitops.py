@@ -19,6 +19,7 @@ from .resources import (
     User,
 )
 from .resources.resource import ResourcePointer
+from .state_cache import parse_duration
 from .var import string_contains_var, process_for_each
 
 logger = logging.getLogger("titan")
@@ -214,17 +215,35 @@ def collect_blueprint_config(yaml_config: dict, cli_config: Optional[dict[str, A
     cli_config_ = cli_config.copy() if cli_config else {}
     blueprint_args: dict[str, Any] = {}
 
-    for key in ["allowlist", "dry_run", "name", "run_mode"]:
+    for key in [
+        "allowlist",
+        "dry_run",
+        "incremental",
+        "max_qps",
+        "name",
+        "parallelism",
+        "query_tag",
+        "run_mode",
+        "state_cache",
+        "state_cache_max_age",
+    ]:
         if key in yaml_config_ and key in cli_config_:
             raise ValueError(f"Cannot specify `{key}` in both yaml config and cli")
 
     allowlist = yaml_config_.pop("allowlist", None) or cli_config_.pop("allowlist", None)
     database = yaml_config_.pop("database", None) or cli_config_.pop("database", None)
     dry_run = yaml_config_.pop("dry_run", None) or cli_config_.pop("dry_run", None)
+    incremental = yaml_config_.pop("incremental", None) or cli_config_.pop("incremental", None)
+    max_qps = yaml_config_.pop("max_qps", None) or cli_config_.pop("max_qps", None)
     name = yaml_config_.pop("name", None) or cli_config_.pop("name", None)
+    parallelism = yaml_config_.pop("parallelism", None) or cli_config_.pop("parallelism", None)
+    query_tag = yaml_config_.pop("query_tag", None) or cli_config_.pop("query_tag", None)
     run_mode = yaml_config_.pop("run_mode", None) or cli_config_.pop("run_mode", None)
     scope = yaml_config_.pop("scope", None) or cli_config_.pop("scope", None)
     schema = yaml_config_.pop("schema", None) or cli_config_.pop("schema", None)
+    state_cache = yaml_config_.pop("state_cache", None) or cli_config_.pop("state_cache", None)
+    state_cache_max_age = yaml_config_.pop("state_cache_max_age", None) or cli_config_.pop("state_cache_max_age", None)
+    state_cache_ttls = yaml_config_.pop("state_cache_ttls", None)
     input_vars = cli_config_.pop("vars", {}) or {}
     vars_spec = yaml_config_.pop("vars", [])
 
@@ -237,9 +256,21 @@ def collect_blueprint_config(yaml_config: dict, cli_config: Optional[dict[str, A
     if dry_run:
         blueprint_args["dry_run"] = dry_run
 
+    if incremental:
+        blueprint_args["incremental"] = incremental
+
+    if max_qps:
+        blueprint_args["max_qps"] = max_qps
+
     if name:
         blueprint_args["name"] = name
 
+    if parallelism:
+        blueprint_args["parallelism"] = parallelism
+
+    if query_tag:
+        blueprint_args["query_tag"] = query_tag
+
     if run_mode:
         blueprint_args["run_mode"] = RunMode(run_mode)
 
@@ -249,6 +280,19 @@ def collect_blueprint_config(yaml_config: dict, cli_config: Optional[dict[str, A
     if schema:
         blueprint_args["schema"] = schema
 
+    if state_cache:
+        blueprint_args["state_cache"] = state_cache
+
+    if state_cache_max_age is not None:
+        blueprint_args["state_cache_max_age"] = parse_duration(state_cache_max_age)
+
+    if state_cache_ttls:
+        if not isinstance(state_cache_ttls, dict):
+            raise ValueError("state_cache_ttls config entry must be a mapping of resource type to duration")
+        blueprint_args["state_cache_ttls"] = {
+            resource_type_for_label(label): parse_duration(ttl) for label, ttl in state_cache_ttls.items()
+        }
+
     blueprint_args["vars"] = input_vars
 
     if vars_spec:
@@ -1,11 +1,12 @@
 import sys
+from typing import Optional
 
 from inflection import pluralize
 
 from .builder import tidy_sql
 from .enums import ResourceType
 from .identifiers import URN, FQN
-from .props import Props
+from .props import Props, quote_value, render_column
 from .resource_name import ResourceName
 
 __this__ = sys.modules[__name__]
@@ -266,97 +267,129 @@ def create_view(urn: URN, data: dict, props: Props, if_not_exists: bool = False)
 ################ Update functions
 
 
-def update_resource(urn: URN, data: dict, props: Props) -> str:
-    return getattr(__this__, f"update_{urn.resource_label}", update__default)(urn, data, props)
+def update_resource(urn: URN, data: dict, props: Props, before: Optional[dict] = None) -> list[str]:
+    """
+    The statements that apply every attribute in `data`, as few as the resource type allows. Some updates, like
+    a table's columns, need the state of the resource `before` the change.
+    """
+    statements = getattr(__this__, f"update_{urn.resource_label}", update__default)(urn, data, props, before=before)
+    return [statements] if isinstance(statements, str) else statements
+
+
+def update__default(urn: URN, data: dict, props: Props, **kwargs) -> list[str]:
+    set_values = {}
+    unset_attrs = []
+    new_name = None
+    for attr, new_value in data.items():
+        attr = attr.lower()
+        if attr == "name":
+            new_name = new_value
+        elif attr == "owner":
+            raise NotImplementedError
+        elif new_value is None:
+            unset_attrs.append(attr)
+        else:
+            set_values[attr] = new_value
 
+    statements = []
+    if set_values:
+        statements.append(tidy_sql("ALTER", urn.resource_type, urn.fqn, "SET", props.render(set_values)))
+    if unset_attrs:
+        statements.append(tidy_sql("ALTER", urn.resource_type, urn.fqn, "UNSET", ", ".join(unset_attrs)))
+    # Renaming goes last, since the statements before it use the old name
+    if new_name is not None:
+        statements.append(tidy_sql("ALTER", urn.resource_type, urn.fqn, "RENAME TO", new_name))
+    return statements
 
-def update__default(urn: URN, data: dict, props: Props) -> str:
-    attr, new_value = data.popitem()
-    attr = attr.lower()
-    if new_value is None:
-        return tidy_sql("ALTER", urn.resource_type, urn.fqn, "UNSET", attr)
-    elif attr == "name":
-        return tidy_sql("ALTER", urn.resource_type, urn.fqn, "RENAME TO", new_value)
-    elif attr == "owner":
-        raise NotImplementedError
-    else:
-        return tidy_sql(
-            "ALTER",
-            urn.resource_type,
-            urn.fqn,
-            "SET",
-            props.render({attr: new_value}),
-        )
 
-
-def update_account_parameter(urn: URN, data: dict, props: Props) -> str:
+def update_account_parameter(urn: URN, data: dict, props: Props, **kwargs) -> str:
     return create_account_parameter(urn, data, props)
 
 
-def update_event_table(urn: URN, data: dict, props: Props) -> str:
+def update_event_table(urn: URN, data: dict, props: Props, **kwargs) -> list[str]:
     new_urn = URN(ResourceType.TABLE, urn.fqn, urn.account_locator)
     return update__default(new_urn, data, props)
 
 
-def update_procedure(urn: URN, data: dict, props: Props) -> str:
+def update_procedure(urn: URN, data: dict, props: Props, **kwargs) -> list[str]:
+    data = data.copy()
+    statements = []
     if "execute_as" in data:
-        return tidy_sql(
-            "ALTER",
-            urn.resource_type,
-            urn.fqn,
-            "EXECUTE AS",
-            data["execute_as"],
+        statements.append(
+            tidy_sql(
+                "ALTER",
+                urn.resource_type,
+                urn.fqn,
+                "EXECUTE AS",
+                data.pop("execute_as"),
+            )
         )
-    else:
-        return update__default(urn, data, props)
+    return statements + update__default(urn, data, props)
 
 
-def update_role_grant(urn: URN, data: dict, props: Props) -> str:
+def update_role_grant(urn: URN, data: dict, props: Props, **kwargs) -> str:
     raise NotImplementedError
 
 
-def update_scanner_package(urn: URN, data: dict, props: Props) -> str:
+def update_scanner_package(urn: URN, data: dict, props: Props, **kwargs) -> list[str]:
     package_name = f"'{urn.fqn.name}'"
-    attr, new_value = data.popitem()
-    if attr == "schedule":
-        new_value = f"'USING CRON {new_value}'"
-    else:
-        new_value = f"'{new_value}'"
-    return tidy_sql(
-        "CALL SNOWFLAKE.TRUST_CENTER.SET_CONFIGURATION(",
-        f"'{attr}',",
-        new_value,
-        ",",
-        package_name,
-        ")",
-    )
+    statements = []
+    for attr, new_value in data.items():
+        if attr == "schedule":
+            new_value = f"'USING CRON {new_value}'"
+        else:
+            new_value = f"'{new_value}'"
+        statements.append(
+            tidy_sql(
+                "CALL SNOWFLAKE.TRUST_CENTER.SET_CONFIGURATION(",
+                f"'{attr}',",
+                new_value,
+                ",",
+                package_name,
+                ")",
+            )
+        )
+    return statements
+
+
+def update_schema(urn: URN, data: dict, props: Props, **kwargs) -> list[str]:
+    set_values = []
+    unset_attrs = []
+    statements = []
+    new_name = None
+    for attr, new_value in data.items():
+        attr = attr.lower()
+        if attr == "name":
+            new_name = new_value
+        elif attr == "owner":
+            raise NotImplementedError
+        elif attr == "transient":
+            raise Exception("Cannot change transient property of schema")
+        elif attr == "managed_access":
+            statements.append(tidy_sql("ALTER SCHEMA", urn.fqn, "ENABLE" if new_value else "DISABLE", "MANAGED ACCESS"))
+        elif new_value is None:
+            unset_attrs.append(attr)
+        else:
+            new_value = f"'{new_value}'" if isinstance(new_value, str) else new_value
+            set_values.append(tidy_sql(attr, "=", new_value))
 
-
-def update_schema(urn: URN, data: dict, props: Props) -> str:
-    attr, new_value = data.popitem()
-    attr = attr.lower()
-    if new_value is None:
-        return tidy_sql("ALTER SCHEMA", urn.fqn, "UNSET", attr)
-    elif attr == "name":
-        return tidy_sql("ALTER SCHEMA", urn.fqn, "RENAME TO", new_value)
-    elif attr == "owner":
-        raise NotImplementedError
-    elif attr == "transient":
-        raise Exception("Cannot change transient property of schema")
-    elif attr == "managed_access":
-        return tidy_sql("ALTER SCHEMA", urn.fqn, "ENABLE" if new_value else "DISABLE", "MANAGED ACCESS")
-    else:
-        new_value = f"'{new_value}'" if isinstance(new_value, str) else new_value
-        return tidy_sql("ALTER SCHEMA", urn.fqn, "SET", attr, "=", new_value)
+    if set_values:
+        statements.append(tidy_sql("ALTER SCHEMA", urn.fqn, "SET", ", ".join(set_values)))
+    if unset_attrs:
+        statements.append(tidy_sql("ALTER SCHEMA", urn.fqn, "UNSET", ", ".join(unset_attrs)))
+    if new_name is not None:
+        statements.append(tidy_sql("ALTER SCHEMA", urn.fqn, "RENAME TO", new_name))
+    return statements
 
 
-def update_table(urn: URN, data: dict, props: Props) -> str:
-    attr, new_value = data.popitem()
-    attr = attr.lower()
-    if attr == "columns":
-        raise NotImplementedError(data)
-    else:
-        return update__default(urn, {attr: new_value}, props)
+def update_table(urn: URN, data: dict, props: Props, before: Optional[dict] = None) -> list[str]:
+    data = data.copy()
+    statements = []
+    if "columns" in data:
+        if before is None:
+            raise NotImplementedError(data)
+        statements.extend(update_columns(urn, before["columns"], data.pop("columns")))
+    return statements + update__default(urn, data, props)
 
 
 # FIXME
@@ -364,35 +397,111 @@ def update_table(urn: URN, data: dict, props: Props) -> str:
 # which means that you need to know the current value in order to modify it.
 # This is a problem because we don't have a concept of "current value" for lifecycle updates
 # and so we can't know what value to set.
-def update_task(urn: URN, data: dict, props: Props) -> str:
-    attr, new_value = data.popitem()
-    attr = attr.lower()
-    if attr == "as_":
-        return tidy_sql("ALTER TASK", urn.fqn, "MODIFY", "AS", new_value)
-    # elif attr == "after":
+def update_task(urn: URN, data: dict, props: Props, before: Optional[dict] = None) -> list[str]:
+    data = {attr.lower(): new_value for attr, new_value in data.items()}
+    statements = []
+    # A started task has to be suspended before it can be modified, and is resumed last
+    state = data.pop("state", None)
+    started = before is not None and before.get("state") == "STARTED"
+    if state is None and started and data:
+        state = "STARTED"
+    if (state is not None and state != "STARTED") or (started and data):
+        statements.append(tidy_sql("ALTER TASK", urn.fqn, "SUSPEND"))
+    if "as_" in data:
+        statements.append(tidy_sql("ALTER TASK", urn.fqn, "MODIFY", "AS", data.pop("as_")))
+    # if "after" in data:
+    #     new_value = data.pop("after")
     #     if new_value is None:
-    #         return tidy_sql("ALTER TASK", urn.fqn, "MODIFY", "AFTER", "NONE")
+    #         statements.append(tidy_sql("ALTER TASK", urn.fqn, "MODIFY", "AFTER", "NONE"))
     #     else:
-    #         return tidy_sql("ALTER TASK", urn.fqn, "MODIFY", "AFTER", ",".join([f"'{name}'" for name in new_value]))
-    elif attr == "when":
+    #         statements.append(tidy_sql("ALTER TASK", urn.fqn, "MODIFY", "AFTER", ",".join([f"'{name}'" for name in new_value])))
+    if "when" in data:
+        new_value = data.pop("when")
         if new_value is None:
-            return tidy_sql("ALTER TASK", urn.fqn, "REMOVE", "WHEN")
+            statements.append(tidy_sql("ALTER TASK", urn.fqn, "REMOVE", "WHEN"))
         else:
-            return tidy_sql("ALTER TASK", urn.fqn, "MODIFY", "WHEN", new_value)
-    elif attr == "state":
-        change_verb = "RESUME" if new_value == "STARTED" else "SUSPEND"
-        return tidy_sql("ALTER TASK", urn.fqn, change_verb)
-    else:
-        return update__default(urn, {attr: new_value}, props)
-
-
-def update_iceberg_table(urn: URN, data: dict, props: Props) -> str:
-    attr, new_value = data.popitem()
-    attr = attr.lower()
-    if attr == "columns":
-        raise NotImplementedError(data)
-    else:
-        return update__default(urn, {attr: new_value}, props)
+            statements.append(tidy_sql("ALTER TASK", urn.fqn, "MODIFY", "WHEN", new_value))
+    statements.extend(update__default(urn, data, props))
+    if state == "STARTED":
+        statements.append(tidy_sql("ALTER TASK", urn.fqn, "RESUME"))
+    return statements
+
+
+def update_iceberg_table(urn: URN, data: dict, props: Props, before: Optional[dict] = None) -> list[str]:
+    return update_table(urn, data, props, before=before)
+
+
+def update_columns(urn: URN, before: list[dict], after: list[dict]) -> list[str]:
+    """
+    Evolve a table's columns in place instead of recreating the table.
+
+    Columns are matched by name, so a column whose name changes is dropped and added again. New columns are
+    added at the end of the table, since Snowflake can't reorder columns.
+    """
+    old, new = _columns_by_name(before), _columns_by_name(after)
+
+    statements = []
+    dropped = dropped_columns(before, after)
+    if dropped:
+        statements.append(tidy_sql("ALTER", urn.resource_type, urn.fqn, "DROP COLUMN", ", ".join(dropped)))
+    added = [render_column(column) for name, column in new.items() if name not in old]
+    if added:
+        statements.append(tidy_sql("ALTER", urn.resource_type, urn.fqn, "ADD COLUMN", ", ".join(added)))
+    alterations = []
+    for name, column in new.items():
+        if name in old:
+            alterations.extend(_column_alterations(old[name], column))
+    if alterations:
+        statements.append(tidy_sql("ALTER", urn.resource_type, urn.fqn, "ALTER", ", ".join(alterations)))
+    return statements
+
+
+def dropped_columns(before: list[dict], after: list[dict]) -> list[str]:
+    new = _columns_by_name(after)
+    return [column["name"] for name, column in _columns_by_name(before).items() if name not in new]
+
+
+def unsupported_column_changes(before: list[dict], after: list[dict]) -> list[str]:
+    """
+    The column changes `update_columns` can't make, because Snowflake has no ALTER for them.
+    """
+    old, new = _columns_by_name(before), _columns_by_name(after)
+    changes = []
+    for name, column in new.items():
+        previous = old.get(name)
+        if previous is None:
+            continue
+        if previous.get("default") != column.get("default") and column.get("default") is not None:
+            changes.append(f"Snowflake can't change the default of column {column['name']}")
+        if previous.get("collate") != column.get("collate"):
+            changes.append(f"Snowflake can't change the collation of column {column['name']}")
+    # Existing columns keep their order and new columns can only go after them
+    kept = [name for name in old if name in new]
+    if list(new) != kept + [name for name in new if name not in old]:
+        changes.append("Snowflake can't reorder columns")
+    return changes
+
+
+def _columns_by_name(columns: list[dict]) -> dict[str, dict]:
+    return {ResourceName(column["name"]).normalized(): column for column in columns}
+
+
+def _column_alterations(before: dict, after: dict) -> list[str]:
+    # Changes to a default or collation are left out, see unsupported_column_changes
+    column = f"COLUMN {after['name']}"
+    alterations = []
+    if before["data_type"] != after["data_type"]:
+        alterations.append(tidy_sql(column, "SET DATA TYPE", after["data_type"]))
+    if bool(before["not_null"]) != bool(after["not_null"]):
+        alterations.append(tidy_sql(column, "SET NOT NULL" if after["not_null"] else "DROP NOT NULL"))
+    if (before.get("comment") or None) != (after.get("comment") or None):
+        if after.get("comment"):
+            alterations.append(tidy_sql(column, "COMMENT", quote_value(after["comment"])))
+        else:
+            alterations.append(tidy_sql(column, "UNSET COMMENT"))
+    if before.get("default") is not None and after.get("default") is None:
+        alterations.append(tidy_sql(column, "DROP DEFAULT"))
+    return alterations
 
 
 ################ Drop functions
@@ -0,0 +1,237 @@
+import bisect
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional, TypeVar, Union
+
+# Upper bounds, in seconds, of the latency histogram buckets. The last bucket is open-ended.
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_QUOTED_IDENTIFIER = re.compile(r'"(?:[^"]|"")*"')
+_DOTTED_IDENTIFIER = re.compile(r"\b[\w$]+(?:\.(?:[\w$]+|\?))+")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_OBJECT_STATEMENT = re.compile(r"^(SHOW|DESC|DESCRIBE|USE)\b", re.IGNORECASE)
+_STATEMENT_KEYWORDS = {"ACCOUNT", "ALL", "NONE", "USERS", "ROLES", "DATABASES", "WAREHOUSES"}
+
+T = TypeVar("T")
+
+
+@dataclass
+class QueryEvent:
+    template: str
+    role: Optional[str]
+    rows: int
+    bytes: int
+    latency: float
+    cached: bool
+    fetcher: Optional[str]
+    phase: Optional[str]
+    errno: Optional[int] = None
+
+
+class MetricsRegistry:
+    """
+    Collects query events into per-template latency histograms, plus totals per fetcher, per phase and per role.
+    Safe to record into from several threads.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._templates: dict[str, dict[str, Any]] = {}
+        self._fetchers: dict[str, dict[str, Any]] = {}
+        self._phases: dict[str, dict[str, Any]] = {}
+        self._roles: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, event: QueryEvent) -> None:
+        with self._lock:
+            stats = self._templates.setdefault(event.template, _empty_template_stats())
+            _add(stats, event)
+            if event.cached:
+                stats["cache_hits"] += 1
+            else:
+                stats["cache_misses"] += 1
+                stats["latency_histogram"][bisect.bisect_left(LATENCY_BUCKETS, event.latency)] += 1
+                stats["max_seconds"] = max(stats["max_seconds"], event.latency)
+            if event.errno is not None:
+                stats["errors"] += 1
+            if event.fetcher:
+                _add(self._fetchers.setdefault(event.fetcher, _empty_totals()), event)
+            if event.phase:
+                _add(self._phases.setdefault(event.phase, _empty_totals()), event)
+            if event.role:
+                _add(self._roles.setdefault(event.role, _empty_totals()), event)
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            templates = {
+                template: {**stats, "latency_histogram": dict(zip(_bucket_labels(), stats["latency_histogram"]))}
+                for template, stats in sorted(self._templates.items(), key=lambda item: -item[1]["total_seconds"])
+            }
+            return {
+                "elapsed_seconds": time.time() - self.started_at,
+                "queries": templates,
+                "fetchers": dict(sorted(self._fetchers.items(), key=lambda item: -item[1]["total_seconds"])),
+                "phases": dict(self._phases),
+                "roles": dict(sorted(self._roles.items(), key=lambda item: -item[1]["total_seconds"])),
+            }
+
+
+def _empty_totals() -> dict[str, Any]:
+    return {"count": 0, "rows": 0, "bytes": 0, "total_seconds": 0.0}
+
+
+def _empty_template_stats() -> dict[str, Any]:
+    return {
+        **_empty_totals(),
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "errors": 0,
+        "max_seconds": 0.0,
+        "latency_histogram": [0] * (len(LATENCY_BUCKETS) + 1),
+    }
+
+
+def _add(totals: dict[str, Any], event: QueryEvent) -> None:
+    totals["count"] += 1
+    totals["rows"] += event.rows
+    totals["bytes"] += event.bytes
+    totals["total_seconds"] += event.latency
+
+
+def _bucket_labels() -> list[str]:
+    return [f"<={bound}s" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+
+
+_REGISTRY: Optional[MetricsRegistry] = None
+# A context variable rather than a global, so worker threads don't see the phases other threads enter
+_PHASE: ContextVar[Optional[str]] = ContextVar("titan_phase", default=None)
+
+
+@contextmanager
+def collect_metrics(registry: Optional[MetricsRegistry] = None) -> Iterator[MetricsRegistry]:
+    """
+    Record every query Titan runs into `registry` (a new one by default) until the block exits.
+    """
+    global _REGISTRY
+    registry = registry or MetricsRegistry()
+    previous, _REGISTRY = _REGISTRY, registry
+    try:
+        yield registry
+    finally:
+        _REGISTRY = previous
+
+
+@contextmanager
+def phase(name: Optional[str]) -> Iterator[None]:
+    """
+    Attribute queries run inside the block to the Titan phase `name`, eg. "plan:fetch".
+    """
+    token = _PHASE.set(name)
+    try:
+        yield
+    finally:
+        _PHASE.reset(token)
+
+
+def metrics_enabled() -> bool:
+    return _REGISTRY is not None
+
+
+def current_phase() -> Optional[str]:
+    return _PHASE.get()
+
+
+def in_current_phase(fn: Callable[..., T]) -> Callable[..., T]:
+    """
+    Wrap `fn` to run in the calling thread's current phase, for handing work to other threads.
+    """
+    name = current_phase()
+
+    def _run(*args, **kwargs) -> T:
+        with phase(name):
+            return fn(*args, **kwargs)
+
+    return _run
+
+
+def query_template(sql: str) -> str:
+    """
+    Reduce a statement to its shape by replacing literals and object names with `?`, eg.
+        SHOW GRANTS TO ROLE SOMEROLE => SHOW GRANTS TO ROLE ?
+        DESC VIEW DB.PUBLIC.V1 => DESC VIEW ?
+    """
+    template = _STRING_LITERAL.sub("?", sql)
+    template = _QUOTED_IDENTIFIER.sub("?", template)
+    template = _DOTTED_IDENTIFIER.sub("?", template)
+    template = _NUMBER.sub("?", template)
+    template = " ".join(template.split())
+    if _OBJECT_STATEMENT.match(template):
+        words = template.split(" ")
+        if len(words) > 2 and words[-1].upper() not in _STATEMENT_KEYWORDS:
+            words[-1] = "?"
+        template = " ".join(words)
+    return template
+
+
+def _result_bytes(result: list) -> int:
+    # Approximate: the length of every value's text representation
+    size = 0
+    for row in result:
+        if hasattr(row, "values"):
+            size += sum(len(str(value)) for value in row.values())
+    return size
+
+
+def _calling_fetcher() -> Optional[str]:
+    # The innermost fetch_* or list_* function in the data provider, else its innermost function of any kind
+    frame = sys._getframe(2)
+    nearest = None
+    while frame is not None:
+        if frame.f_globals.get("__name__") == "titan.data_provider":
+            name = frame.f_code.co_name
+            if name.startswith(("fetch_", "list_")) and name not in ("fetch_resource", "list_resource"):
+                return name
+            nearest = nearest or name
+        frame = frame.f_back
+    return nearest
+
+
+def record_query(
+    role: Optional[str],
+    sql: str,
+    result: Union[list, int, None],
+    latency: float,
+    cached: bool = False,
+    errno: Optional[int] = None,
+) -> None:
+    """
+    Record one query with the active registry. `result` is the query's rows, or just their count when the rows
+    weren't kept. Does nothing unless metrics are being collected.
+    """
+    registry = _REGISTRY
+    if registry is None:
+        return
+    if isinstance(result, int):
+        rows, size = result, 0
+    else:
+        rows = len(result) if result is not None else 0
+        size = _result_bytes(result) if result and not cached else 0
+    registry.record(
+        QueryEvent(
+            template=query_template(sql),
+            role=role,
+            rows=rows,
+            bytes=size,
+            latency=latency,
+            cached=cached,
+            fetcher=_calling_fetcher(),
+            phase=_PHASE.get(),
+            errno=errno,
+        )
+    )
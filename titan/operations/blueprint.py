@@ -8,11 +8,16 @@ from titan.gitops import collect_blueprint_config
 from titan.operations.connector import connect
 
 
+def _session_factory(blueprint_config: BlueprintConfig):
+    # Extra connections are only worth opening when work can actually run in parallel
+    return connect if blueprint_config.parallelism > 1 else None
+
+
 def blueprint_plan(yaml_config: dict, cli_config: dict[str, Any]):
     blueprint_config = collect_blueprint_config(yaml_config, cli_config)
     blueprint = Blueprint.from_config(blueprint_config)
     session = connect()
-    plan_obj = blueprint.plan(session)
+    plan_obj = blueprint.plan(session, session_factory=_session_factory(blueprint_config))
     return plan_obj
 
 
@@ -20,7 +25,7 @@ def blueprint_apply(yaml_config: dict, cli_config: dict):
     blueprint_config = collect_blueprint_config(yaml_config, cli_config)
     blueprint = Blueprint.from_config(blueprint_config)
     session = connect()
-    blueprint.apply(session)
+    blueprint.apply(session, session_factory=_session_factory(blueprint_config))
 
 
 def blueprint_apply_plan(plan_dict: dict, cli_config: dict):
@@ -28,4 +33,4 @@ def blueprint_apply_plan(plan_dict: dict, cli_config: dict):
     blueprint = Blueprint.from_config(blueprint_config)
     plan = plan_from_dict(plan_dict)
     session = connect()
-    blueprint.apply(session, plan)
+    blueprint.apply(session, plan, session_factory=_session_factory(blueprint_config))
@@ -518,6 +518,7 @@ def _parse_column(sql):
     collate = Keyword("COLLATE").suppress() + ANY("collate")
     comment = Keyword("COMMENT").suppress() + ANY("comment")
     not_null = Keywords("NOT NULL").set_parse_action(lambda _: True)("not_null")
+    default = Keyword("DEFAULT").suppress() + pp.QuotedString("'", esc_quote="''")("default")
     constraint = Keyword("UNIQUE") ^ Keywords("PRIMARY KEY") ^ (Keyword("CONSTRAINT").suppress() + ANY())
     # TODO: rest of column properties
     constraint = constraint.set_parse_action(lambda toks: toks[0])("constraint")
@@ -527,9 +528,7 @@ def _parse_column(sql):
     column = (
         Identifier("name")
         + data_type
-        + pp.Opt(collate)
-        + pp.Opt(comment)
-        + pp.Opt(not_null)
+        + (pp.Opt(collate) & pp.Opt(comment) & pp.Opt(not_null) & pp.Opt(default))
         + pp.Opt(constraint)
         + REST_OF_STRING("remainder")
     )
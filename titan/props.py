@@ -637,20 +637,22 @@ class SchemaProp(Prop):
     def render(self, values):
         if values is None or len(values) == 0:
             return "()"
-        columns = []
-        for column in values:
-            name = column["name"]
-            data_type = str(column["data_type"])
-            not_null = " NOT NULL" if column["not_null"] else ""
+        return f"({', '.join(render_column(column) for column in values)})"
 
-            if isinstance(column["default"], str):
-                default = f" DEFAULT '{column['default']}'"
-            elif column["default"] is not None:
-                default = f" DEFAULT {column['default']}"
-            else:
-                default = ""
 
-            comment = f" COMMENT '{column['comment']}'" if "comment" in column and column["comment"] else ""
-            column_str = f"{name} {data_type}{not_null}{default}{comment}"
-            columns.append(column_str)
-        return f"({', '.join(columns)})"
+def render_column(column: dict) -> str:
+    name = column["name"]
+    data_type = str(column["data_type"])
+    if column.get("collate"):
+        data_type = f"{data_type} COLLATE '{column['collate']}'"
+    not_null = " NOT NULL" if column["not_null"] else ""
+
+    if isinstance(column["default"], str):
+        default = " DEFAULT '" + column["default"].replace("'", "''") + "'"
+    elif column["default"] is not None:
+        default = f" DEFAULT {column['default']}"
+    else:
+        default = ""
+
+    comment = f" COMMENT {quote_value(column['comment'])}" if "comment" in column and column["comment"] else ""
+    return f"{name} {data_type}{not_null}{default}{comment}"
@@ -82,6 +82,13 @@ class ResourceName:
     def upper(self):
         return self
 
+    def normalized(self) -> str:
+        """
+        The name as Snowflake stores it in metadata. Two ResourceNames are equal if and only if their
+        normalized forms are equal.
+        """
+        return self._name if self._quoted else self._name.upper()
+
     def startswith(self, prefix: str) -> bool:
         return self._name.startswith(prefix)
 
@@ -2,11 +2,12 @@ import difflib
 import logging
 import sys
 import types
-from dataclasses import dataclass, field, fields
+from dataclasses import Field, dataclass, field, fields
 from enum import Enum
+from functools import lru_cache
 from inspect import isclass
 from itertools import chain
-from typing import Any, Optional, Type, TypedDict, Union, get_args, get_origin
+from typing import Any, Callable, Optional, Type, TypedDict, Union, get_args, get_origin
 
 import pyparsing as pp
 
@@ -68,95 +69,149 @@ class ResourceLifecycleConfig:
 
 
 def _coerce_resource_field(field_value, field_type):
+    return _field_coercer(field_type)(field_value)
+
+
+def _raise_unexpected_field_type(field_type):
+    def coerce(field_value):
+        raise RuntimeError(f"Unexpected field type {field_type}")
+
+    return coerce
+
+
+@lru_cache(maxsize=None)
+def _field_coercer(field_type):
+    """
+    Build the function that typechecks and coerces a value of `field_type`. The type is inspected once here,
+    rather than every time a spec is constructed.
+    """
 
     # No type checking or coercion for Any
     if field_type == Any:
-        return field_value
+        return lambda field_value: field_value
 
     # Recursively traverse lists and dicts
     elif get_origin(field_type) is list:
-        if not isinstance(field_value, list):
-            raise TypeError
-        list_element_type = get_args(field_type) or (str,)
-        return [_coerce_resource_field(v, field_type=list_element_type[0]) for v in field_value]
+        coerce_element = _field_coercer((get_args(field_type) or (str,))[0])
+
+        def coerce_list(field_value):
+            if not isinstance(field_value, list):
+                raise TypeError
+            return [coerce_element(v) for v in field_value]
+
+        return coerce_list
 
     elif get_origin(field_type) is dict:
-        if not isinstance(field_value, dict):
-            raise TypeError
         dict_types = get_args(field_type)
         if len(dict_types) < 2:
-            raise RuntimeError(f"Unexpected field type {field_type}")
-        return {k: _coerce_resource_field(v, field_type=dict_types[1]) for k, v in field_value.items()}
+            return _raise_unexpected_field_type(field_type)
+        coerce_value = _field_coercer(dict_types[1])
+
+        def coerce_dict(field_value):
+            if not isinstance(field_value, dict):
+                raise TypeError
+            return {k: coerce_value(v) for k, v in field_value.items()}
+
+        return coerce_dict
 
     elif field_type is RoleRef:
-        if isinstance(field_value, str) and string_contains_var(field_value):
-            return VarString(field_value)
-        elif isinstance(field_value, (Resource, VarString, str)):
-            return convert_role_ref(field_value)
-        else:
-            raise TypeError
+
+        def coerce_role_ref(field_value):
+            if isinstance(field_value, str) and string_contains_var(field_value):
+                return VarString(field_value)
+            elif isinstance(field_value, (Resource, VarString, str)):
+                return convert_role_ref(field_value)
+            else:
+                raise TypeError
+
+        return coerce_role_ref
 
     # Check for field_value's type in a Union
     elif get_origin(field_type) == Union:
-        union_types = get_args(field_type)
-        for union_type in union_types:
+        union_coercers = []
+        for union_type in get_args(field_type):
             expected_type = get_origin(union_type) or union_type
-            if isinstance(field_value, expected_type):
-                return _coerce_resource_field(field_value, field_type=expected_type)
-        raise RuntimeError(f"Unexpected field type {field_type}")
+            union_coercers.append((expected_type, _field_coercer(expected_type)))
+
+        def coerce_union(field_value):
+            for expected_type, coerce in union_coercers:
+                if isinstance(field_value, expected_type):
+                    return coerce(field_value)
+            raise RuntimeError(f"Unexpected field type {field_type}")
+
+        return coerce_union
 
     elif not isclass(field_type):
-        raise RuntimeError(f"Unexpected field type {field_type}")
+        return _raise_unexpected_field_type(field_type)
 
     # Coerce enums
     elif issubclass(field_type, ParseableEnum):
-        try:
-            new_value = field_type(field_value)
-        except ValueError:
-            raise TypeError
-        return new_value
+
+        def coerce_enum(field_value):
+            try:
+                new_value = field_type(field_value)
+            except ValueError:
+                raise TypeError
+            return new_value
+
+        return coerce_enum
 
     # Coerce args
     elif field_type is Arg:
-        arg_dict = {
-            "name": field_value["name"].upper(),
-            "data_type": convert_to_simple_data_type(field_value["data_type"]),
-        }
-        if "default" in field_value:
-            arg_dict["default"] = field_value["default"]
-        return arg_dict
+
+        def coerce_arg(field_value):
+            arg_dict = {
+                "name": field_value["name"].upper(),
+                "data_type": convert_to_simple_data_type(field_value["data_type"]),
+            }
+            if "default" in field_value:
+                arg_dict["default"] = field_value["default"]
+            return arg_dict
+
+        return coerce_arg
 
     # Coerce returns
     elif field_type is Returns:
-        returns_dict = {
-            "data_type": DataType(field_value["data_type"]),
-            "metadata": field_value["metadata"],
-        }
-        if "returns_null" in field_value:
-            returns_dict["returns_null"] = field_value["returns_null"]
-        return returns_dict
+
+        def coerce_returns(field_value):
+            returns_dict = {
+                "data_type": DataType(field_value["data_type"]),
+                "metadata": field_value["metadata"],
+            }
+            if "returns_null" in field_value:
+                returns_dict["returns_null"] = field_value["returns_null"]
+            return returns_dict
+
+        return coerce_returns
 
     # Coerce resources
     elif issubclass(field_type, Resource):
-        return convert_to_resource(field_type, field_value)
+        return lambda field_value: convert_to_resource(field_type, field_value)
     elif field_type is ResourceName:
-        return field_value if isinstance(field_value, VarString) else ResourceName(field_value)
+        return lambda field_value: field_value if isinstance(field_value, VarString) else ResourceName(field_value)
     elif field_type is ResourceTags:
-        return ResourceTags(field_value)
+        return ResourceTags
     elif field_type is str:
-        return convert_to_varstring(field_value)
+        return convert_to_varstring
     elif field_type is float:
-        if isinstance(field_value, float):
-            return field_value
-        elif isinstance(field_value, int):
-            return float(field_value)
-        else:
-            raise TypeError
+
+        def coerce_float(field_value):
+            if isinstance(field_value, float):
+                return field_value
+            elif isinstance(field_value, int):
+                return float(field_value)
+            else:
+                raise TypeError
+
+        return coerce_float
     else:
         # Typecheck all other field types (str, int, etc.)
-        if not isinstance(field_value, field_type):
-            raise TypeError
-        return field_value
+        def coerce_instance(field_value):
+            if not isinstance(field_value, field_type):
+                raise TypeError
+            return field_value
+
+        return coerce_instance
 
 
 @dataclass
@@ -202,9 +257,8 @@ class ResourceSpec:
             else:
                 return value
 
-        for f in fields(self):
+        for f, field_metadata in self.fields_with_metadata():
             value = getattr(self, f.name)
-            field_metadata = ResourceSpecMetadata(**f.metadata)
             if account_edition not in field_metadata.edition:
                 if value != f.default and value is not None:
                     raise WrongEditionException(
@@ -217,13 +271,13 @@ class ResourceSpec:
         return dict_
 
     def __post_init__(self):
-        for f in fields(self):
+        for f, coerce in self.field_coercers():
             field_value = getattr(self, f.name)
             if field_value is None:
                 continue
             else:
                 try:
-                    new_value = _coerce_resource_field(field_value, f.type)
+                    new_value = coerce(field_value)
                     setattr(self, f.name, new_value)
                 except TypeError as err:
                     human_readable_classname = self.__class__.__name__[1:]
@@ -236,12 +290,26 @@ class ResourceSpec:
                             f"Expected {human_readable_classname}.{f.name} to be {f.type}, got {repr(field_value)} instead"
                         ) from err
 
+    @classmethod
+    def fields_with_metadata(cls) -> list[tuple[Field, ResourceSpecMetadata]]:
+        # Computed once per spec class, usually when its resource class is created
+        if "_fields_with_metadata" not in cls.__dict__:
+            cls._fields_with_metadata = [(f, ResourceSpecMetadata(**f.metadata)) for f in fields(cls)]
+            cls._metadata = {f.name: metadata for f, metadata in cls._fields_with_metadata}
+        return cls._fields_with_metadata
+
+    @classmethod
+    def field_coercers(cls) -> list[tuple[Field, Callable[[Any], Any]]]:
+        if "_field_coercers" not in cls.__dict__:
+            cls._field_coercers = [(f, _field_coercer(f.type)) for f in fields(cls)]
+        return cls._field_coercers
+
     @classmethod
     def get_metadata(cls, field_name: str) -> ResourceSpecMetadata:
-        for f in fields(cls):
-            if f.name == field_name:
-                return ResourceSpecMetadata(**f.metadata)
-        raise ValueError(f"Field {field_name} not found in {cls.__name__}")
+        cls.fields_with_metadata()
+        if field_name not in cls._metadata:
+            raise ValueError(f"Field {field_name} not found in {cls.__name__}")
+        return cls._metadata[field_name]
 
 
 RESOURCE_SCOPES = {
@@ -264,6 +332,9 @@ class _Resource(type):
         cls.__types__[cls_.resource_type].append(cls_)
         if cls_.resource_type not in RESOURCE_SCOPES:
             RESOURCE_SCOPES[cls_.resource_type] = cls_.scope
+        if "spec" in attrs:
+            cls_.spec.fields_with_metadata()
+            cls_.spec.field_coercers()
         return cls_
 
 
@@ -727,7 +798,7 @@ def convert_role_ref(role_ref: RoleRef) -> Resource:
 def infer_role_type_from_name(name: Union[str, ResourceName]) -> ResourceType:
     if isinstance(name, ResourceName):
         name = str(name)
-    if name == "":
+    if name == "" or "." not in name:
         return ResourceType.ROLE
     identifier = parse_identifier(name, is_db_scoped=True)
     if "database" in identifier:
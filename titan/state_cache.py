@@ -0,0 +1,176 @@
+import logging
+import os
+import pickle
+import re
+import tempfile
+import time
+from typing import Optional, Union
+
+from inflection import singularize
+
+from .client import cache_snapshot, restore_cache
+from .enums import ResourceType
+
+logger = logging.getLogger("titan")
+
+DEFAULT_MAX_AGE = 600
+SNAPSHOT_VERSION = 1
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(value: Union[str, int, float]) -> int:
+    """
+    Parse a duration like `90`, `90s`, `10m`, `2h` or `1d` into seconds.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = int(value)
+    elif isinstance(value, str):
+        match = re.fullmatch(r"\s*(\d+)\s*([smhd]?)\s*", value.lower())
+        if match is None:
+            raise ValueError(f"Invalid duration: {value!r}, expected a number followed by s, m, h or d")
+        seconds = int(match.group(1)) * _DURATION_UNITS[match.group(2) or "s"]
+    else:
+        raise ValueError(f"Invalid duration: {value!r}")
+    if seconds < 0:
+        raise ValueError(f"Duration must not be negative, got: {value!r}")
+    return seconds
+
+
+def resource_type_for_query(sql: str) -> Optional[ResourceType]:
+    """
+    Best-effort guess of the resource type a SHOW or DESC statement reads, eg.
+        SHOW USER FUNCTIONS IN ACCOUNT => FUNCTION
+        SHOW PARAMETERS FOR WAREHOUSE WH => WAREHOUSE
+        DESC EXTERNAL ACCESS INTEGRATION EAI => EXTERNAL ACCESS INTEGRATION
+    """
+    words = sql.upper().split()
+    if len(words) < 2 or words[0] not in ("SHOW", "DESC", "DESCRIBE"):
+        return None
+    words = words[1:6]
+    if words[0] == "PARAMETERS" and len(words) > 2 and words[1] in ("IN", "FOR"):
+        words = words[2:]
+    if words[0] == "USER" and len(words) > 1 and words[1] == "FUNCTIONS":
+        words = words[1:]
+    for length in range(len(words), 0, -1):
+        noun = singularize(" ".join(words[:length]).lower()).upper()
+        try:
+            return ResourceType(noun)
+        except ValueError:
+            continue
+    return None
+
+
+class StateCache:
+    """
+    An on-disk snapshot of cached query results, so back-to-back plans against the same account don't
+    repeat every SHOW statement.
+
+    Snapshots are stored per account locator and keyed by role and query text. An entry is reused while it
+    is younger than the TTL for its resource type (`ttls`), falling back to `max_age`. Only queries
+    that are cacheable within a plan are snapshotted.
+
+    A snapshot also carries `resources`, the fingerprinted resources used for incremental refresh. These
+    don't expire, since every run checks their fingerprints against Snowflake.
+
+    Snapshots are pickled, and loading a pickle can run arbitrary code. `path` must be a directory that only
+    trusted users can write to. Snapshots are created readable by their owner only.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_age: int = DEFAULT_MAX_AGE,
+        ttls: Optional[dict[ResourceType, int]] = None,
+    ):
+        self.path = path
+        self.max_age = max_age
+        self.ttls = ttls or {}
+        # (role, sql) => (fetched_at, result) for every entry loaded from disk
+        self._loaded: dict[tuple[str, str], tuple[float, list]] = {}
+        self.resources: dict[str, tuple[tuple, dict]] = {}
+
+    def _snapshot_path(self, account_locator: str) -> str:
+        return os.path.join(self.path, f"{account_locator}.pickle")
+
+    def ttl_for_query(self, sql: str) -> int:
+        resource_type = resource_type_for_query(sql)
+        return self.ttls.get(resource_type, self.max_age) if resource_type else self.max_age
+
+    def _read(self, account_locator: str) -> dict:
+        try:
+            with open(self._snapshot_path(account_locator), "rb") as f:
+                snapshot = pickle.load(f)
+        except FileNotFoundError:
+            return {}
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as err:
+            logger.warning(f"Ignoring unreadable state cache for {account_locator}: {err}")
+            return {}
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+            return {}
+        return snapshot
+
+    def _write(self, account_locator: str, entries: dict[str, dict[str, tuple[float, list]]]) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                snapshot = {"version": SNAPSHOT_VERSION, "entries": entries, "resources": self.resources}
+                pickle.dump(snapshot, f)
+            os.replace(tmp_path, self._snapshot_path(account_locator))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self, account_locator: str) -> int:
+        """
+        Seed the execution cache with the fresh entries from the account's snapshot. Returns the number of
+        entries reused.
+        """
+        now = time.time()
+        snapshot = self._read(account_locator)
+        self._loaded = {}
+        self.resources = snapshot.get("resources", {})
+        fetched: dict[tuple[str, str], float] = {}
+        fresh: dict[str, dict[str, list]] = {}
+        for role, queries in snapshot.get("entries", {}).items():
+            for sql, (fetched_at, result) in queries.items():
+                if now - fetched_at <= self.ttl_for_query(sql):
+                    fetched[(role, sql)] = fetched_at
+                    fresh.setdefault(role, {})[sql] = result
+        for role, queries in restore_cache(fresh).items():
+            for sql, result in queries.items():
+                self._loaded[(role, sql)] = (fetched[(role, sql)], result)
+        logger.debug(f"Reusing {len(self._loaded)} cached queries for {account_locator}")
+        return len(self._loaded)
+
+    def save(self, account_locator: str) -> None:
+        """
+        Write the execution cache to the account's snapshot. Entries reused from the last snapshot keep their
+        original fetch time, so they still expire on schedule.
+        """
+        now = time.time()
+        entries: dict[str, dict[str, tuple[float, list]]] = {}
+        for (role, sql), entry in self._loaded.items():
+            entries.setdefault(role, {})[sql] = entry
+        for role, queries in cache_snapshot().items():
+            for sql, result in queries.items():
+                loaded = self._loaded.get((role, sql))
+                fetched_at = loaded[0] if loaded and loaded[1] is result else now
+                entries.setdefault(role, {})[sql] = (fetched_at, result)
+        self._write(account_locator, entries)
+
+    def invalidate(self, account_locator: str) -> None:
+        """
+        Drop the account's cached query results, eg. after apply has changed the account. Fingerprinted
+        resources are kept, since changed objects no longer match their fingerprints.
+        """
+        self._loaded = {}
+        snapshot = self._read(account_locator)
+        if not snapshot:
+            return
+        self.resources = snapshot.get("resources", {})
+        if self.resources:
+            self._write(account_locator, {})
+        else:
+            os.remove(self._snapshot_path(account_locator))
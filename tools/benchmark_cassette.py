@@ -0,0 +1,110 @@
+import logging
+import os
+import statistics
+import time
+from collections import defaultdict
+from typing import Callable
+
+import click
+import snowflake.connector
+
+from titan.blueprint import Blueprint, compile_plan_to_sql
+from titan.cassette import Cassette, ReplaySession, record_session
+from titan.client import reset_cache
+from titan.data_provider import fetch_session
+from titan.gitops import collect_blueprint_config, collect_configs_from_path, merge_configs
+
+PHASES = ("session", "finalize", "manifest", "fetch", "diff", "compile")
+
+
+def read_blueprint_config(config_path: str, parallelism: int):
+    yaml_config: dict = {}
+    for _, config in collect_configs_from_path(config_path):
+        yaml_config = merge_configs(yaml_config, config)
+    return collect_blueprint_config(yaml_config, {"parallelism": parallelism})
+
+
+def _timed(timings: dict[str, float], name: str, fn: Callable) -> Callable:
+    def _run(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[name] += time.perf_counter() - start
+
+    return _run
+
+
+def time_plan(config_path: str, session: ReplaySession, parallelism: int) -> dict[str, float]:
+    """
+    Plan the config at `config_path` against a replayed account and return the seconds spent in each phase.
+    """
+    timings: dict[str, float] = defaultdict(float)
+    blueprint = Blueprint.from_config(read_blueprint_config(config_path, parallelism))
+    # generate_manifest finalizes the blueprint first, so finalizing is timed on its own and taken out of it
+    blueprint._finalize = _timed(timings, "finalize", blueprint._finalize)
+    session_factory = session.session_factory if parallelism > 1 else None
+
+    session_ctx = _timed(timings, "session", fetch_session)(session)
+    manifest = _timed(timings, "manifest", blueprint.generate_manifest)(session_ctx)
+    timings["manifest"] -= timings["finalize"]
+    remote_state = _timed(timings, "fetch", blueprint.fetch_remote_state)(
+        session, manifest, session_factory=session_factory
+    )
+    plan = _timed(timings, "diff", blueprint._plan)(remote_state, manifest)
+    _timed(timings, "compile", compile_plan_to_sql)(session_ctx, plan)
+    return timings
+
+
+@click.group()
+def main():
+    """Benchmark planning a config against an account recorded to a cassette"""
+
+
+@main.command()
+@click.option("--config", "config_path", required=True, help="Path to a Titan config file or directory")
+@click.option("--cassette", "cassette_path", required=True, help="Path to write the cassette to")
+@click.option("--parallelism", type=int, default=1, help="Number of sessions to fetch with")
+def record(config_path, cassette_path, parallelism):
+    """Plan a config against a live account and record every query to a cassette"""
+
+    def _connect():
+        return snowflake.connector.connect(
+            account=os.environ["SNOWFLAKE_ACCOUNT"],
+            user=os.environ["SNOWFLAKE_USER"],
+            password=os.environ["SNOWFLAKE_PASSWORD"],
+            role=os.environ["SNOWFLAKE_ROLE"],
+        )
+
+    blueprint = Blueprint.from_config(read_blueprint_config(config_path, parallelism))
+    with record_session(_connect(), cassette_path) as session:
+        blueprint.plan(session, session_factory=session.session_factory(_connect) if parallelism > 1 else None)
+
+
+@main.command()
+@click.option("--config", "config_path", required=True, help="Path to a Titan config file or directory")
+@click.option("--cassette", "cassette_path", required=True, help="Path to a cassette recorded with `record`")
+@click.option("--repeat", type=int, default=5, help="Number of times to plan")
+@click.option("--parallelism", type=int, default=1, help="Number of sessions to fetch with")
+def replay(config_path, cassette_path, repeat, parallelism):
+    """Plan a config against a cassette several times and report the time spent in each phase"""
+    # Logging every replayed query would dominate the timings
+    logging.getLogger("titan").setLevel(logging.ERROR)
+    cassette = Cassette.load(cassette_path)
+    runs = []
+    for _ in range(repeat):
+        reset_cache()
+        cassette.rewind()
+        runs.append(time_plan(config_path, ReplaySession(cassette), parallelism))
+
+    print(f"{'phase':<10} {'min':>10} {'median':>10} {'max':>10}")
+    for name in PHASES + ("total",):
+        if name == "total":
+            seconds = [sum(run.values()) for run in runs]
+        else:
+            seconds = [run[name] for run in runs]
+        print(f"{name:<10} {min(seconds):>9.3f}s {statistics.median(seconds):>9.3f}s {max(seconds):>9.3f}s")
+
+
+if __name__ == "__main__":
+    main()